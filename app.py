@@ -1,170 +1,250 @@
 # app.py
+import base64
+import csv
+import json
+import mimetypes
 import os
+import queue
+import tempfile
+import time
+import uuid
 from datetime import datetime, date, time as dtime, timedelta
-from flask import Flask, render_template, request, jsonify
+from io import StringIO
+
+from flask import Flask, render_template, request, jsonify, Response, send_file
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from sqlalchemy import select, insert, func, and_, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.utils import secure_filename
+
 from db import (
     engine, SessionLocal, Persona, Invitacion, Notificacion
 )
-import os, uuid, mimetypes
-from werkzeug.utils import secure_filename
-from flask import send_from_directory
-from io import BytesIO
-from flask import send_file
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill
-import re
-from typing import Optional
+from cache import cached_json, bump_data_version, current_data_version
+from feed import publish_changes
+import feed
+import outbox
+import rollups
+import storage
+import search
+import suggest
+import history
+import importer
+import profiling
+import metrics
+from serializers import (
+    fmt_date, fmt_time, iso, dumps, stream_json_array,
+    parse_fields, parse_version, needed_columns, row_serializer,
+)
+from parsing import parse_date_flexible, parse_time_flexible, parse_dates, parse_times
+from conflicts import ESTATUS_ACTIVOS, Entry as ConflictEntry, check_conflict, check_many, load_index
+
 # -----------------------------------------------------------------------------
 # Helpers de formato
 # ----------------------------------------------------------------------------
 
-UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads"))
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# adjuntos: almacén por contenido (storage.py); disco local o S3 según UPLOAD_BACKEND
+upload_store = storage.from_env()
 ALLOWED_EXTS = {"pdf", "jpg", "jpeg", "png"}
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTS
 
-# ---------- PARSEOS (1 sola fuente de verdad) ----------
+def save_upload(fs, db) -> dict:
+    """Guarda el adjunto (hash en streaming, dedup) y regresa las columnas archivo_*.
 
-def parse_date_iso(s: Optional[str]) -> Optional[date]:
-    """Estricto: solo ISO YYYY-MM-DD."""
-    if not s:
-        return None
+    Toma el lock del objeto en la transacción de `db` (storage.lock_key): un release()
+    concurrente no lo borra antes de que el commit deje la referencia en archivo_url."""
+    ext = fs.filename.rsplit(".", 1)[1].lower()
+    safe_orig = secure_filename(fs.filename)
+    stored = upload_store.put(fs.stream, ext, lock=lambda key: storage.lock_key(db, key))
+    metrics.UPLOAD_BYTES.inc(stored.size)
+    return {
+        "archivo_url": stored.url,
+        "archivo_nombre": safe_orig,
+        "archivo_mime": mimetypes.guess_type(safe_orig)[0] or fs.mimetype or "application/octet-stream",
+        "archivo_tamano": stored.size,
+        "archivo_ts": datetime.utcnow(),
+    }
+
+def release_uploads(urls) -> None:
+    """Después del commit: borra los adjuntos que ya nadie referencia (el resto lo barre gc_uploads.py)."""
+    urls = {u for u in urls if u}
+    if not urls:
+        return
+    db = SessionLocal()
     try:
-        return date.fromisoformat(s.strip())
-    except ValueError:
-        return None
+        for u in urls:
+            storage.release(upload_store, db, u)
+    except Exception:
+        app.logger.exception("No se pudo liberar adjunto %s", urls)
+    finally:
+        db.close()
 
-def parse_date_flexible(s: Optional[str]) -> Optional[date]:
-    """Tolerante: ISO (YYYY-MM-DD) o dd/mm/aaaa o dd/mm/aa."""
-    if not s:
-        return None
-    s = s.strip()
-    # 1) ISO
-    d = parse_date_iso(s)
-    if d:
-        return d
-    # 2) dd/mm/aaaa o dd/mm/aa
-    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return None
+# ---------- Conflictos (motor en conflicts.py) ----------
 
-def parse_time_flexible(s: Optional[str]) -> Optional[dtime]:
-    """
-    Acepta:
-      - HH:MM
-      - HH:MM:SS
-      - 'h:mm am/pm' / 'hh am' (ej. '3 pm', '3:05 PM')
-    """
-    if not s:
-        return None
-    v = s.strip().lower()
-
-    # 12h con am/pm (permite '3 pm', '03:05 pm', '12:30am', etc.)
-    m = re.match(r"^(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?\s*(am|pm)$", v)
-    if m:
-        hh = int(m.group(1))
-        mm = int(m.group(2) or 0)
-        ss = int(m.group(3) or 0)
-        ampm = m.group(4)
-        if hh == 12:
-            hh = 0
-        if ampm == "pm":
-            hh += 12
-        return dtime(hh, mm, ss)
-
-    # 24h HH:MM(:SS)
-    parts = v.split(":")
-    try:
-        if len(parts) == 2:
-            return dtime(int(parts[0]), int(parts[1]))
-        if len(parts) >= 3:
-            return dtime(int(parts[0]), int(parts[1]), int(parts[2]))
-    except ValueError:
-        return None
-    return None
+def conflict_to_dict(e) -> dict:
+    return {
+        "ID": e.id,
+        "Evento": e.evento or "",
+        "FechaFmt": fmt_date(e.fecha),
+        "HoraFmt": fmt_time(e.hora),
+        "Estatus": e.estatus or "",
+        "Lugar": e.lugar or "",
+    }
+
+def conflict_response(c):
+    return jsonify({
+        "ok": False, "conflict": True,
+        "level": c.level, "conflicts": [conflict_to_dict(e) for e in c.entries]
+    }), 409
 
-# ---------- FORMATOS (puedes dejarlos igual) ----------
+# Índice único parcial (migrations/m0004_hot_indexes.py): una persona no puede tener
+# dos eventos activos a la misma fecha y hora, ni con force ni entre requests concurrentes.
+DOBLE_BOOKING = "uq_inv_persona_fecha_hora"
 
-def fmt_date(d: Optional[date]) -> str:
-    return d.strftime("%d/%m/%y") if d else ""
+def is_double_booking(e: IntegrityError) -> bool:
+    diag = getattr(getattr(e, "orig", None), "diag", None)
+    return DOBLE_BOOKING in (getattr(diag, "constraint_name", None) or str(e))
 
-def fmt_time(t: Optional[dtime]) -> str:
-    return t.strftime("%H:%M") if t else ""
+DOBLE_BOOKING_MSG = "Conflicto: la persona ya tiene un evento activo a esa misma fecha y hora"
 
-def fmt_dt(dtobj: Optional[datetime]) -> str:
-    return dtobj.strftime("%d/%m/%y %H:%M") if dtobj else ""
+def same_slot(c, hora) -> bool:
+    """¿Alguna coincidencia a la misma hora exacta? Esa la rechaza el índice aun con force."""
+    return any(e.hora == hora for e in c.entries)
 
-# ---------- Utilidad ----------
+def double_booking_response():
+    # sin "conflict": la UI no ofrece reintentar con force (tampoco pasaría)
+    return jsonify({"ok": False, "duplicate": True, "error": DOBLE_BOOKING_MSG}), 409
 
-def minutes_diff(t1: Optional[dtime], t2: Optional[dtime]) -> int:
-    """Diferencia absoluta en minutos entre dos times; 'infinito' si falta alguno."""
-    if not (t1 and t2):
-        return 10**6
-    dt1 = datetime.combine(date(2000, 1, 1), t1)
-    dt2 = datetime.combine(date(2000, 1, 1), t2)
-    return int(abs((dt1 - dt2).total_seconds()) // 60)
 # -----------------------------------------------------------------------------
-# Serializador de invitaciones
+# Concurrencia optimista: Invitacion.version (version_id_col en db.py)
 # -----------------------------------------------------------------------------
-def inv_to_dict(inv: Invitacion) -> dict:
-    # días hacia el evento (para highlight en UI)
-    dias = (inv.fecha - date.today()).days if inv.fecha else None
-    # nombre vivo desde la relación (si existe), si no, cae al texto desnormalizado:
-    asignado_nombre = (inv.persona.nombre if getattr(inv, "persona", None) and inv.persona else None) \
-                      or (inv.asignado_a or "")
+STALE_MSG = "Otra persona modificó esta invitación; revisa los datos actuales y vuelve a intentar"
 
-    return {
-        "ID": inv.id,
-        "PersonaID": inv.persona_id,
-        "Evento": inv.evento or "",
-        "Convoca Cargo": inv.convoca_cargo or "",
-        "Convoca": inv.convoca or "",
-        "Partido Político": inv.partido_politico or "",
-        # Inputs/queries
-        "Fecha": inv.fecha.isoformat() if inv.fecha else None,
-        "Hora": inv.hora.strftime("%H:%M") if inv.hora else None,
-        # Alias explícitos (por si en front usas getFecha/getHora)
-        "FechaISO": inv.fecha.isoformat() if inv.fecha else None,
-        "HoraISO": inv.hora.strftime("%H:%M") if inv.hora else None,
-        # UI formateada
-        "FechaFmt": fmt_date(inv.fecha),
-        "HoraFmt": fmt_time(inv.hora),
-        "Municipio/Dependencia": inv.municipio or "",
-        "Lugar": inv.lugar or "",
-        "Estatus": inv.estatus or "Pendiente",
-        "Asignado A": asignado_nombre,         # <— AQUÍ
-        "PersonaNombre": (inv.persona.nombre if inv.persona else None),  # opcional, por claridad        "Rol": inv.rol or "",
-        "Observaciones": inv.observaciones or "",
-        "Fecha Asignación": fmt_dt(inv.fecha_asignacion),
-        "Última Modificación": fmt_dt(inv.ultima_modificacion),
-        "Modificado Por": inv.modificado_por or "",
-        # Archivo
-        "ArchivoURL": inv.archivo_url or "",
-        "ArchivoNombre": inv.archivo_nombre or "",
-        "ArchivoMime": inv.archivo_mime or "",
-        "ArchivoTamano": inv.archivo_tamano or 0,
-        "ArchivoTS": fmt_dt(inv.archivo_ts),
-        # Nuevo: días hacia el evento para el highlight
-        "DiasParaEvento": dias,
-    }
-    
+def inv_etag(version: int) -> str:
+    return f"v{version}"
+
+def expected_version(raw=None) -> int | None:
+    """
+    Versión que el cliente leyó: If-Match (ETag de /api/invitation/<id>) o el campo
+    `version` del body/form. None si no manda ninguna (clientes viejos, el bot): se
+    escribe sin comparar, pero el UPDATE sigue condicionado a la versión recién leída.
+    ValueError si viene mal formada.
+    """
+    if request.if_match and not request.if_match.star_tag:
+        tag = next(iter(request.if_match.as_set(include_weak=True)), "")
+        if not (tag.startswith("v") and tag[1:].isdigit()):
+            raise ValueError("If-Match inválido")
+        return int(tag[1:])
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise ValueError("version inválida")
 
+def stale_response(db: Session, inv_id: int):
+    """409 con el estado actual (mismo payload que /api/invitation/<id>?v=2) y su versión."""
+    db.rollback()
+    current = fetch_invitations(db, [inv_id], 2).get(inv_id)
+    return jsonify({
+        "ok": False, "stale": True, "error": STALE_MSG,
+        "version": current["Version"] if current else None, "current": current,
+    }), 409
+
+# -----------------------------------------------------------------------------
+# Serializador de invitaciones: campos y formato en serializers.py; aquí el SELECT
+# -----------------------------------------------------------------------------
+# columnas del orden (fecha DESC, hora DESC, id DESC): siempre se seleccionan para el cursor
+KEYSET_COLS = ("fecha", "hora", "id")
+
+def inv_select(fields: list[str]):
+    """SELECT solo con las columnas que piden los campos (+ las del keyset)."""
+    needed = set(KEYSET_COLS) | needed_columns(fields)
+    cols = [getattr(Invitacion, c).label(c) for c in Invitacion.__table__.columns.keys() if c in needed]
+    stmt = select(*cols)
+    if "persona_nombre" in needed:
+        stmt = (stmt.add_columns(Persona.nombre.label("persona_nombre"))
+                    .outerjoin(Persona, Persona.id == Invitacion.persona_id))
+    return stmt
+
+# ---------- Cursor keyset ----------
+
+def encode_cursor(r) -> str:
+    raw = json.dumps([iso(r.fecha), r.hora.isoformat() if r.hora else None, r.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(s: str) -> tuple:
+    """ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+        f, h, i = json.loads(raw)
+        return (date.fromisoformat(f) if f else None,
+                dtime.fromisoformat(h) if h else None,
+                int(i))
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+def keyset_after(cursor: tuple):
+    """Filas posteriores a `cursor` en el orden fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC."""
+    f, h, i = cursor
+    if h is None:
+        tail = and_(Invitacion.hora.is_(None), Invitacion.id < i)
+    else:
+        tail = or_(Invitacion.hora < h, Invitacion.hora.is_(None),
+                   and_(Invitacion.hora == h, Invitacion.id < i))
+    if f is None:
+        return and_(Invitacion.fecha.is_(None), tail)
+    return or_(Invitacion.fecha < f, Invitacion.fecha.is_(None),
+               and_(Invitacion.fecha == f, tail))
+
+def invitation_filters(args) -> list:
+    """Filtros comunes de listados/reportes: ?status=...&date_from=...&date_to=..."""
+    status    = (args.get("status") or "").strip()
+    date_from = parse_date_flexible(args.get("date_from"))
+    date_to   = parse_date_flexible(args.get("date_to"))
+
+    # Si el usuario invirtió el rango, lo corregimos
+    if date_from and date_to and date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    filters = []
+    if status:
+        filters.append(Invitacion.estatus == status)
+    if date_from:
+        filters.append(Invitacion.fecha >= date_from)
+    if date_to:
+        filters.append(Invitacion.fecha <= date_to)
+    return filters
+
+def invitations_stmt(fields: list[str], args, cursor: tuple | None, limit: int | None):
+    """SELECT de /api/invitations (también lo usa asgi.py): filtros, keyset y orden del tablero."""
+    stmt = inv_select(fields).where(*invitation_filters(args))
+    if cursor:
+        stmt = stmt.where(keyset_after(cursor))
+    stmt = stmt.order_by(Invitacion.fecha.desc().nullslast(),
+                         Invitacion.hora.desc().nullslast(),
+                         Invitacion.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)   # +1 para saber si hay otra página
+    return stmt
 
 # -----------------------------------------------------------------------------
 # Notificaciones: snapshot en tabla notificaciones
 # -----------------------------------------------------------------------------
-def add_notif(db: Session, inv: Invitacion, campo: str, old_val: str | None, new_val: str | None, comentario: str = ""):
-    n = Notificacion(
-        ts = datetime.now(),
-        invitacion_id = str(inv.id),
+def notif_values(inv: Invitacion, campo: str, old_val: str | None, new_val: str | None,
+                 comentario: str = "", ts: datetime | None = None) -> dict:
+    """Columnas de una fila de notificaciones (snapshot de la invitación)."""
+    return dict(
+        ts = ts or datetime.now(),
+        invitacion_ref = inv.id,
+        invitacion_id = str(inv.id),      # texto para el bot, hasta que lea invitacion_ref
 
         # snapshot textual principal
         evento = inv.evento or "",
@@ -186,13 +266,61 @@ def add_notif(db: Session, inv: Invitacion, campo: str, old_val: str | None, new
         enviado = False,
         enviado_ts = None
     )
-    db.add(n)
+
+def add_notif(db: Session, inv: Invitacion, campo: str, old_val: str | None, new_val: str | None,
+              comentario: str = "", ts: datetime | None = None):
+    # mismo `ts` para todas las filas de una acción: el historial compacto las agrupa así
+    db.add(Notificacion(**notif_values(inv, campo, old_val, new_val, comentario, ts)))
+
+# El historial (history.py) ya guarda cada comentario; OBS_TRAIL=0 deja de concatenarlos
+# en observaciones, que crecía sin límite con cada acción.
+OBS_TRAIL = os.getenv("OBS_TRAIL", "1") != "0"
+
+def append_obs(inv: Invitacion, texto: str) -> None:
+    if OBS_TRAIL and texto:
+        inv.observaciones = ((inv.observaciones or "")
+                             + (" | " if inv.observaciones else "")
+                             + texto)
+
+# -----------------------------------------------------------------------------
+# Asignación (compartida por /api/assign y /api/assign/bulk)
+# -----------------------------------------------------------------------------
+def apply_assignment(inv: Invitacion, p: Persona, rol_in: str, comentario: str,
+                     ts: datetime | None = None) -> list[dict]:
+    """Confirma `inv` con la persona `p`; regresa las notificaciones a insertar."""
+    ts = ts or datetime.now()
+    prev_estatus = inv.estatus
+    prev_asig    = inv.asignado_a
+    prev_rol     = inv.rol
+
+    inv.persona_id = p.id
+    inv.asignado_a = p.nombre
+    inv.rol        = (rol_in if rol_in else (p.cargo or ""))
+    inv.estatus    = "Confirmado"
+    append_obs(inv, comentario)
+    inv.fecha_asignacion    = ts
+    inv.ultima_modificacion = ts
+    inv.modificado_por      = "atiapp"
+
+    notifs = [notif_values(inv, "Asignado A", prev_asig or "", inv.asignado_a or "", comentario, ts)]
+    if prev_rol != inv.rol:
+        notifs.append(notif_values(inv, "Rol", prev_rol or "", inv.rol or "", comentario, ts))
+    if prev_estatus != inv.estatus:
+        notifs.append(notif_values(inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario, ts))
+    return notifs
 
 # -----------------------------------------------------------------------------
 # Flask app
 # -----------------------------------------------------------------------------
 app = Flask(__name__)
 
+# consultas/tiempo en BD por request: Server-Timing + línea de log (profiling.py)
+profiling.install(engine)
+profiling.init_app(app)
+# /metrics (Prometheus, multiproceso con gunicorn.conf.py): rutas, latencias y pool
+metrics.install_pool(engine)
+metrics.init_app(app)
+
 @app.get("/")
 def home():
     return render_template("index.html")
@@ -205,26 +333,61 @@ def health():
 # PERSONAS (Catálogo)
 # -----------------------------------------------------------------------------
 @app.get("/api/catalog")
+@cached_json("catalog")
 def api_catalog():
-    """Lista personas activas para el combo de selección."""
+    """
+    Lista personas activas para el combo de selección (solo las 6 columnas que se envían).
+    Con ?summary=1 agrega por persona, en la misma consulta (LEFT JOIN + GROUP BY):
+      "Confirmadas Próximas" (Confirmado/Sustituido desde hoy) y "Próximo Evento" (ISO).
+    """
+    summary = (request.args.get("summary") or "").lower() in ("1", "true")
+    cols = (Persona.id, Persona.nombre, Persona.cargo, Persona.telefono,
+            Persona.correo, Persona.unidad_region)
+
     db = SessionLocal()
     try:
-        personas = (db.query(Persona)
-                      .filter(Persona.activo == True)
-                      .order_by(Persona.nombre.asc())
-                      .all())
-        rows = [{
-            "ID": p.id,
-            "Nombre": p.nombre or "",
-            "Cargo": p.cargo or "",
-            "Teléfono": p.telefono or "",
-            "Correo": p.correo or "",
-            "Unidad/Región": p.unidad_region or "",
-        } for p in personas]
+        stmt = select(*cols).where(Persona.activo == True)
+        if summary:
+            upcoming = and_(Invitacion.persona_id == Persona.id,
+                            Invitacion.estatus.in_(ESTATUS_ACTIVOS),
+                            Invitacion.fecha >= date.today())
+            stmt = (stmt.add_columns(func.count(Invitacion.id).label("proximas"),
+                                     func.min(Invitacion.fecha).label("siguiente"))
+                        .outerjoin(Invitacion, upcoming)
+                        .group_by(Persona.id))
+        stmt = stmt.order_by(Persona.nombre.asc())
+
+        rows = []
+        for p in db.execute(stmt):
+            row = {
+                "ID": p.id,
+                "Nombre": p.nombre or "",
+                "Cargo": p.cargo or "",
+                "Teléfono": p.telefono or "",
+                "Correo": p.correo or "",
+                "Unidad/Región": p.unidad_region or "",
+            }
+            if summary:
+                row["Confirmadas Próximas"] = p.proximas
+                row["Próximo Evento"] = iso(p.siguiente)
+            rows.append(row)
         return jsonify(rows)
     finally:
         db.close()
 
+person_suggester = suggest.Suggester()
+
+@app.get("/api/persons/suggest")
+def api_persons_suggest():
+    """Typeahead: ?q=texto&limit=N -> personas activas por coincidencia y frecuencia (suggest.py)."""
+    q = (request.args.get("q") or "").strip()
+    limit = request.args.get("limit", default=suggest.SUGGEST_LIMIT, type=int)
+    db = SessionLocal()
+    try:
+        return jsonify(person_suggester.suggest(db, q, limit))
+    finally:
+        db.close()
+
 @app.post("/api/person/create")
 def api_person_create():
     data = request.get_json() or {}
@@ -245,6 +408,8 @@ def api_person_create():
             activo=True
         )
         db.add(p)
+        bump_data_version(db)
+        bump_data_version(db, suggest.PERSONAS)
         db.commit()
         return jsonify({"ok": True, "id": p.id})
     except Exception as e:
@@ -277,6 +442,10 @@ def api_person_update():
             if val is not None:
                 setattr(p, attr, val.strip() if isinstance(val, str) else val)
 
+        # el nombre vivo de la persona sale en "Asignado A" de sus invitaciones
+        ids = db.scalars(select(Invitacion.id).where(Invitacion.persona_id == p.id)).all()
+        publish_changes(db, "updated", ids)
+        bump_data_version(db, suggest.PERSONAS)
         db.commit()
         return jsonify({"ok": True, "persona": {"ID": p.id, "Nombre": p.nombre}})
     except Exception as e:
@@ -315,9 +484,7 @@ def api_person_delete():
             inv.persona_id = None                     # se rompe el vínculo
             inv.estatus = "Pendiente"                 # vuelve a pendiente
             # mantenemos inv.asignado_a (nombre) y inv.rol tal cual
-            inv.observaciones = ((inv.observaciones or "") +
-                                 (" | " if inv.observaciones else "") +
-                                 "Auto-desasignación: persona eliminada")
+            append_obs(inv, "Auto-desasignación: persona eliminada")
             inv.ultima_modificacion = datetime.now()
             inv.modificado_por = "ATIapp"
 
@@ -332,9 +499,15 @@ def api_person_delete():
 
         # 2) Ahora sí eliminamos la persona
         db.delete(p)
+        publish_changes(db, "updated", [inv.id for inv in invs])
+        bump_data_version(db, suggest.PERSONAS)
         db.commit()
         return jsonify({"ok": True, "invitaciones_actualizadas": len(invs)})
 
+    except StaleDataError:
+        # una de sus invitaciones cambió mientras tanto: nada se aplica, reintentar
+        db.rollback()
+        return jsonify({"ok": False, "stale": True, "error": STALE_MSG}), 409
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -346,42 +519,163 @@ def api_person_delete():
 # -----------------------------------------------------------------------------
 @app.get("/api/invitations")
 def api_invitations():
-    """Lista invitaciones. Soporta ?status=... y ?date_from=YYYY-MM-DD|dd/mm/aaaa & ?date_to=..."""
-    status    = (request.args.get("status") or "").strip()
-    date_from = parse_date_flexible(request.args.get("date_from"))
-    date_to   = parse_date_flexible(request.args.get("date_to"))
+    """
+    Lista invitaciones. Soporta ?status=... y ?date_from=YYYY-MM-DD|dd/mm/aaaa & ?date_to=...
+      - ?fields=ID,Evento,...  solo esas llaves (y solo esas columnas en el SELECT)
+      - ?limit=N&cursor=...    paginación keyset; responde {items, next_cursor, version}
+      - ?v=2                   compacta: sin alias FechaISO/HoraISO (serializers.py)
+    Sin limit responde el arreglo completo (formato original), generado en streaming.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"), parse_version(request.args.get("v")))
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        limit  = request.args.get("limit", type=int)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+
+    stmt = invitations_stmt(fields, request.args, cursor, limit)
+    to_dict = row_serializer(fields)
+
+    def generate():
+        db = SessionLocal()
+        try:
+            # versión de datos leída ANTES de la página (cada sentencia ve su propio snapshot):
+            # el feed SSE reanuda desde aquí y a lo más repite un cambio que ya venía en la página
+            version = current_data_version(db) if limit is not None else None
+            rows = db.execute(stmt.execution_options(yield_per=500))
+            if limit is None:
+                yield from stream_json_array(to_dict(r) for r in rows)
+                return
+
+            state = {"last": None, "more": False}
+            def page():
+                for n, r in enumerate(rows):
+                    if n == limit:
+                        state["more"] = True
+                        break
+                    state["last"] = r
+                    yield to_dict(r)
+            def tail():
+                nxt = encode_cursor(state["last"]) if state["more"] else None
+                return "]," + dumps({"next_cursor": nxt, "version": version})[1:]
+            yield from stream_json_array(page(), head='{"items":[', tail=tail)
+        finally:
+            db.close()
+
+    return Response(generate(), mimetype="application/json")
+
+@app.get("/api/invitations/search")
+def api_invitations_search():
+    """
+    Búsqueda por relevancia en evento/convoca/municipio/lugar/observaciones (search.py).
+      ?q=texto (mín. 2 letras)  ?limit=N&cursor=...  ?fields=...&v=  ?status=&date_from=&date_to=
+    Responde {items, next_cursor, backend}; items en orden de relevancia.
+    """
+    q = (request.args.get("q") or "").strip()
+    if len(q) < 2:
+        return jsonify({"ok": False, "error": "Escribe al menos 2 caracteres"}), 400
+    try:
+        fields = parse_fields(request.args.get("fields"), parse_version(request.args.get("v")))
+        cursor = search.decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        limit  = request.args.get("limit", default=50, type=int)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
-    # Si el usuario invirtió el rango, lo corregimos
-    if date_from and date_to and date_from > date_to:
-        date_from, date_to = date_to, date_from
+    db = SessionLocal()
+    try:
+        hits, next_cursor, backend = search.search(db, q, invitation_filters(request.args), limit, cursor)
+        ids = [i for i, _ in hits]
+        rows = {r.id: r for r in db.execute(inv_select(fields).where(Invitacion.id.in_(ids)))} if ids else {}
+        to_dict = row_serializer(fields)
+        items = [to_dict(rows[i]) for i in ids if i in rows]
+        return Response(dumps({"items": items, "next_cursor": next_cursor, "backend": backend}),
+                        mimetype="application/json")
+    finally:
+        db.close()
+
+@app.post("/api/invitations/import")
+def api_invitations_import():
+    """
+    Alta masiva desde XLSX/CSV (campo `archivo`), ver importer.py.
+      ?dry_run=1   solo valida y reporta, no inserta
+    Responde {ok, total, insertadas, duplicadas, errores: [{fila, error}], errores_total}.
+    """
+    fs = request.files.get("archivo")
+    if not fs or not fs.filename:
+        return jsonify({"ok": False, "error": "Falta el archivo"}), 400
+    dry_run = (request.args.get("dry_run") or request.form.get("dry_run") or "") in ("1", "true")
 
     db = SessionLocal()
     try:
-        q = db.query(Invitacion)
-        if status:
-            q = q.filter(Invitacion.estatus == status)
-        if date_from:
-            q = q.filter(Invitacion.fecha >= date_from)
-        if date_to:
-            q = q.filter(Invitacion.fecha <= date_to)
-
-        invs = (q.order_by(Invitacion.fecha.desc().nullslast(),
-                           Invitacion.hora.desc().nullslast(),
-                           Invitacion.id.desc())
-                  .all())
-        return jsonify([inv_to_dict(i) for i in invs])
+        res = importer.run(db, fs.stream, fs.filename, dry_run=dry_run)
+        if dry_run:
+            db.rollback()
+        else:
+            if res.ids:
+                publish_changes(db, "created", res.ids)
+            db.commit()
+        return jsonify({
+            "ok": True, "dry_run": dry_run,
+            "total": res.total, "insertadas": res.insertadas, "duplicadas": res.duplicadas,
+            "errores": [e._asdict() for e in res.errores], "errores_total": res.errores_total,
+        })
+    except importer.ImportFormatError as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 500
     finally:
         db.close()
 
 @app.get("/api/invitation/<int:inv_id>")
 def api_inv_get(inv_id: int):
-    """Detalle de una invitación."""
+    """Detalle de una invitación (todos los campos; ?v=2 compacta). ETag "v<Version>"."""
+    try:
+        version = parse_version(request.args.get("v"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     db = SessionLocal()
     try:
-        inv = db.get(Invitacion, inv_id)
+        inv = fetch_invitations(db, [inv_id], version).get(inv_id)
         if not inv:
             return jsonify({"ok": False, "error": "Invitación no encontrada"}), 404
-        return jsonify(inv_to_dict(inv))
+        # ETag = versión de la fila: el cliente la regresa en If-Match al escribir
+        etag = inv_etag(inv["Version"])
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(dumps(inv), mimetype="application/json")
+        resp.set_etag(etag)
+        return resp
+    finally:
+        db.close()
+
+@app.get("/api/invitation/<int:inv_id>/history")
+def api_inv_history(inv_id: int):
+    """
+    Historial de cambios de una invitación (history.py), del más reciente al más viejo.
+      ?limit=N&cursor=...   paginación keyset; responde {items, next_cursor}
+      ?compact=1            una entrada por acción con su línea de texto
+    """
+    compact = request.args.get("compact") in ("1", "true")
+    try:
+        cursor = history.decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        limit  = request.args.get("limit", default=history.HISTORY_LIMIT, type=int)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if cursor and not compact and cursor[1] is None:
+        return jsonify({"ok": False, "error": "Cursor inválido"}), 400
+
+    db = SessionLocal()
+    try:
+        if db.execute(select(Invitacion.id).where(Invitacion.id == inv_id)).first() is None:
+            return jsonify({"ok": False, "error": "Invitación no encontrada"}), 404
+        read = history.timeline_compact if compact else history.timeline
+        items, next_cursor = read(db, inv_id, limit, cursor)
+        return jsonify({"items": items, "next_cursor": next_cursor})
     finally:
         db.close()
 
@@ -401,47 +695,30 @@ def api_invitation_create():
     if not (f_fecha and f_hora and f_evento and f_ccargo and f_convoca and f_muni and f_lugar):
         return jsonify({"ok": False, "error": "Faltan campos obligatorios"}), 400
 
-    archivo = request.files.get("archivo")
-    archivo_url = archivo_nombre = archivo_mime = None
-    archivo_tamano = None
-    archivo_ts = None
-
-    if archivo and archivo.filename and allowed_file(archivo.filename):
-        ext = archivo.filename.rsplit(".", 1)[1].lower()
-        safe_orig = secure_filename(archivo.filename)
-        unique = f"{uuid.uuid4().hex}.{ext}"
-        save_path = os.path.join(UPLOAD_FOLDER, unique)
-        archivo.save(save_path)
-
-        archivo_url = f"/uploads/{unique}"
-        archivo_nombre = safe_orig
-        archivo_mime = mimetypes.guess_type(safe_orig)[0] or archivo.mimetype or "application/octet-stream"
-        archivo_tamano = os.path.getsize(save_path)
-        archivo_ts = datetime.utcnow()
-
-    inv = Invitacion(
-    fecha=parse_date_flexible(f_fecha),
-    hora=parse_time_flexible(f_hora),
-    evento=f_evento,
-    convoca_cargo=f_ccargo,
-    convoca=f_convoca,
-    partido_politico=f_partido,
-    municipio=f_muni,
-    lugar=f_lugar,
-    observaciones=f_obs or "",
-    archivo_url=archivo_url,
-    archivo_nombre=archivo_nombre,
-    archivo_mime=archivo_mime,
-    archivo_tamano=archivo_tamano,
-    archivo_ts=archivo_ts,
-    ultima_modificacion=datetime.utcnow(),
-    modificado_por="atiapp",
-)
-
-
     db = SessionLocal()
     try:
+        archivo = request.files.get("archivo")
+        adjunto = {}
+        if archivo and archivo.filename and allowed_file(archivo.filename):
+            adjunto = save_upload(archivo, db)
+
+        inv = Invitacion(
+            fecha=parse_date_flexible(f_fecha),
+            hora=parse_time_flexible(f_hora),
+            evento=f_evento,
+            convoca_cargo=f_ccargo,
+            convoca=f_convoca,
+            partido_politico=f_partido,
+            municipio=f_muni,
+            lugar=f_lugar,
+            observaciones=f_obs or "",
+            **adjunto,
+            ultima_modificacion=datetime.utcnow(),
+            modificado_por="atiapp",
+        )
         db.add(inv)
+        db.flush()
+        publish_changes(db, "created", [inv.id])
         db.commit()
         return jsonify({"ok": True, "id": inv.id})
     except Exception as e:
@@ -455,12 +732,19 @@ def api_invitation_update():
     inv_id = request.form.get("id") or request.form.get("ID")
     if not inv_id:
         return jsonify({"ok": False, "error": "Falta ID"}), 400
+    try:
+        expected = expected_version(request.form.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
         inv = db.get(Invitacion, int(inv_id))
         if not inv:
             return jsonify({"ok": False, "error": "Invitación no encontrada"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
+        old_url = inv.archivo_url
 
         # Campos (permitimos que falten)
         f_fecha   = request.form.get("fecha") or request.form.get("Fecha")
@@ -490,23 +774,24 @@ def api_invitation_update():
             inv.archivo_ts = None
 
         if file and file.filename and allowed_file(file.filename):
-            ext = file.filename.rsplit(".", 1)[1].lower()
-            safe_orig = secure_filename(file.filename)
-            unique = f"{uuid.uuid4().hex}.{ext}"
-            save_path = os.path.join(UPLOAD_FOLDER, unique)
-            file.save(save_path)
-
-            inv.archivo_url = f"/uploads/{unique}"
-            inv.archivo_nombre = safe_orig
-            inv.archivo_mime = mimetypes.guess_type(safe_orig)[0] or file.mimetype or "application/octet-stream"
-            inv.archivo_tamano = os.path.getsize(save_path)
-            inv.archivo_ts = datetime.utcnow()
+            for k, v in save_upload(file, db).items():
+                setattr(inv, k, v)
 
         inv.ultima_modificacion = datetime.utcnow()
         inv.modificado_por = "atiapp"
 
+        publish_changes(db, "updated", [inv.id])
         db.commit()
-        return jsonify({"ok": True})
+        if old_url != inv.archivo_url:
+            release_uploads([old_url])
+        return jsonify({"ok": True, "version": inv.version})
+    except StaleDataError:
+        return stale_response(db, int(inv_id))
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -520,15 +805,26 @@ def api_inv_delete():
     inv_id = data.get("ID") or data.get("id")
     if not inv_id:
         return jsonify({"ok": False, "error": "Falta ID"}), 400
+    try:
+        expected = expected_version(data.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
         inv = db.get(Invitacion, int(inv_id))
         if not inv:
             return jsonify({"ok": False, "error": "Invitación no encontrada"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
+        old_url = inv.archivo_url
         db.delete(inv)
+        publish_changes(db, "deleted", [inv.id])
         db.commit()
+        release_uploads([old_url])
         return jsonify({"ok": True})
+    except StaleDataError:
+        return stale_response(db, int(inv_id))
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -536,6 +832,7 @@ def api_inv_delete():
         db.close()
         
 @app.get("/api/stats")
+@cached_json("stats")
 def api_stats():
     date_from = parse_date_flexible(request.args.get("date_from"))
     date_to   = parse_date_flexible(request.args.get("date_to"))
@@ -544,21 +841,8 @@ def api_stats():
 
     db = SessionLocal()
     try:
-        filters = []
-        if date_from:
-            filters.append(Invitacion.fecha >= date_from)
-        if date_to:
-            filters.append(Invitacion.fecha <= date_to)
-
-        rows = (db.query(Invitacion.estatus, func.count(Invitacion.id))
-                  .filter(*filters)
-                  .group_by(Invitacion.estatus)
-                  .all())
-
-        counts = {"Pendiente": 0, "Confirmado": 0, "Sustituido": 0, "Cancelado": 0}
-        for est, c in rows:
-            counts[est or "Pendiente"] = c
-        return jsonify(counts)
+        # suma del rollup diario (rollups.py), no un GROUP BY sobre invitaciones
+        return jsonify(rollups.status_counts(db, date_from, date_to))
     finally:
         db.close()
 # -----------------------------------------------------------------------------
@@ -580,6 +864,10 @@ def api_assign():
         persona_id = int(persona_id_raw)
     except (TypeError, ValueError):
         return jsonify({"ok": False, "error": "id/persona_id inválidos"}), 400
+    try:
+        expected = expected_version(data.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
@@ -587,76 +875,135 @@ def api_assign():
         p   = db.get(Persona, persona_id)
         if not inv or not p:
             return jsonify({"ok": False, "error": "Invitación o persona no encontrada"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
 
         # === Chequeo de conflicto (si hay fecha/hora) salvo force ===
-        if inv.fecha and inv.hora and not force:
-            q = (db.query(Invitacion)
-                    .filter(Invitacion.persona_id == p.id)
-                    .filter(Invitacion.fecha == inv.fecha)
-                    .filter(Invitacion.estatus.in_(["Confirmado","Sustituido"]))
-                    .filter(Invitacion.id != inv.id))
-            matches = q.all()
-
-            level = "none"
-            conflicts = []
-            order = {"none":0, "tight2h":1, "tight1h":2, "hard":3}
-
-            for m in matches:
-                # si alguna hora es None, la tratamos como no comparable (sin conflicto)
-                dm = minutes_diff(m.hora, inv.hora) if (m.hora and inv.hora) else 10**6
-                if dm == 0:
-                    lev = "hard"
-                elif dm <= 60:
-                    lev = "tight1h"
-                elif dm <= 60:
-                    lev = "tight2h"
-                else:
-                    lev = "none"
-
-                if lev != "none":
-                    conflicts.append({
-                        "ID": m.id,
-                        "Evento": m.evento or "",
-                        "FechaFmt": fmt_date(m.fecha),
-                        "HoraFmt": fmt_time(m.hora),
-                        "Estatus": m.estatus or "",
-                        "Lugar": m.lugar or ""
-                    })
-                    if order[lev] > order[level]:
-                        level = lev
-
-            if level != "none":
-                return jsonify({
-                    "ok": False, "conflict": True,
-                    "level": level, "conflicts": conflicts
-                }), 409
+        if not force:
+            c = check_conflict(db, p.id, inv.fecha, inv.hora, exclude_id=inv.id)
+            if c.level != "none":
+                return conflict_response(c)
 
         # === Aplicar asignación ===
-        prev_estatus = inv.estatus
-        prev_asig    = inv.asignado_a
-        prev_rol     = inv.rol
+        for n in apply_assignment(inv, p, rol_in, comentario):
+            db.add(Notificacion(**n))
 
-        inv.persona_id = p.id
-        inv.asignado_a = p.nombre
-        inv.rol        = (rol_in if rol_in else (p.cargo or ""))
-        inv.estatus    = "Confirmado"
-        if comentario:
-            inv.observaciones = ((inv.observaciones or "")
-                                 + (" | " if inv.observaciones else "")
-                                 + comentario)
-        inv.fecha_asignacion    = datetime.now()
-        inv.ultima_modificacion = datetime.now()
-        inv.modificado_por      = "atiapp"
+        publish_changes(db, "updated", [inv.id])
+        db.commit()
+        return jsonify({"ok": True, "version": inv.version})
 
-        add_notif(db, inv, "Asignado A", prev_asig or "", inv.asignado_a or "", comentario)
-        if prev_rol != inv.rol:
-            add_notif(db, inv, "Rol", prev_rol or "", inv.rol or "", comentario)
-        if prev_estatus != inv.estatus:
-            add_notif(db, inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario)
+    except StaleDataError:
+        return stale_response(db, inv_id)
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 500
+    finally:
+        db.close()
 
-        db.commit()
-        return jsonify({"ok": True})
+BULK_MAX_ITEMS = 500
+
+@app.post("/api/assign/bulk")
+def api_assign_bulk():
+    """
+    Asignación en lote (misma regla que /api/assign, una sola transacción).
+    Body JSON: { items: [ {id, persona_id, rol?, comentario?, version?}, ... ], comentario?, force? }
+    Cada item se valida contra lo ya confirmado en BD y contra los items previos del lote.
+    Devuelve: { ok, aplicadas, results: [ {id, ok, error?|conflict|duplicate|stale, level, conflicts}, ... ] }
+    La misma persona a la misma fecha y hora sale como duplicate en su item, también con force.
+    """
+    data = request.get_json() or {}
+    items = data.get("items")
+    force = bool(data.get("force", False))
+    comentario_lote = (data.get("comentario") or "").strip()
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"ok": False, "error": "Faltan items"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"ok": False, "error": f"Máximo {BULK_MAX_ITEMS} items por lote"}), 400
+
+    # Cast seguro de IDs; los inválidos se reportan sin tocar la BD
+    results: list[dict] = []
+    pending = []   # (posición, inv_id, persona_id, rol, comentario, versión esperada)
+    for n, it in enumerate(items):
+        it = it if isinstance(it, dict) else {}
+        try:
+            inv_id, persona_id = int(it.get("id")), int(it.get("persona_id"))
+            expected = int(it["version"]) if it.get("version") not in (None, "") else None
+        except (TypeError, ValueError):
+            results.append({"id": it.get("id"), "ok": False, "error": "id/persona_id/version inválidos"})
+            continue
+        results.append({"id": inv_id, "ok": False})
+        pending.append((n, inv_id, persona_id,
+                        (it.get("rol") or "").strip(),
+                        (it.get("comentario") or comentario_lote).strip(), expected))
 
+    db = SessionLocal()
+    try:
+        inv_ids = {x[1] for x in pending}
+        pids    = {x[2] for x in pending}
+        invs     = {i.id: i for i in db.scalars(select(Invitacion).where(Invitacion.id.in_(inv_ids)))}
+        personas = {p.id: p for p in db.scalars(select(Persona).where(Persona.id.in_(pids)))}
+
+        # agenda de todos los (persona, fecha) del lote en una sola consulta
+        idx = load_index(db, [(pid, invs[i].fecha) for _, i, pid, _, _, _ in pending if i in invs])
+
+        ts = datetime.now()
+        notifs, seen = [], set()
+        for n, inv_id, persona_id, rol_in, cmt, expected in pending:
+            res = results[n]
+            inv, p = invs.get(inv_id), personas.get(persona_id)
+            if not inv or not p:
+                res["error"] = "Invitación o persona no encontrada"
+                continue
+            if inv_id in seen:
+                res["error"] = "Invitación repetida en el lote"
+                continue
+            seen.add(inv_id)
+            if expected is not None and inv.version != expected:
+                res.update(stale=True, error=STALE_MSG, version=inv.version)
+                continue
+
+            c = idx.check(p.id, inv.fecha, inv.hora, exclude_id=inv.id)
+            if c.level != "none":
+                res.update(level=c.level, conflicts=[conflict_to_dict(e) for e in c.entries])
+                if same_slot(c, inv.hora):
+                    # force solo pasa por encima de los conflictos suaves: este haría fallar
+                    # el commit (uq_inv_persona_fecha_hora) y con él todo el lote
+                    res.update(duplicate=True, error=DOBLE_BOOKING_MSG)
+                    continue
+                if not force:
+                    res["conflict"] = True
+                    continue
+
+            notifs.extend(apply_assignment(inv, p, rol_in, cmt, ts))
+            # la agenda refleja la asignación para los siguientes items del lote
+            idx.add(ConflictEntry(inv.id, p.id, inv.fecha, inv.hora, inv.evento, inv.estatus, inv.lugar))
+            res["ok"] = True
+
+        aplicadas = sum(1 for r in results if r["ok"])
+        if aplicadas:
+            db.execute(insert(Notificacion), notifs)
+            publish_changes(db, "updated", [r["id"] for r in results if r["ok"]])
+            db.commit()
+            for r in results:
+                if r["ok"]:
+                    r["version"] = invs[r["id"]].version
+        return jsonify({"ok": True, "aplicadas": aplicadas, "results": results})
+
+    except StaleDataError:
+        # otra escritura se coló entre la lectura y el UPDATE: el lote entero se revierte
+        db.rollback()
+        return jsonify({"ok": False, "stale": True, "error": STALE_MSG}), 409
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -675,6 +1022,10 @@ def api_reassign():
 
     if not inv_id or not persona_id:
         return jsonify({"ok": False, "error": "Faltan campos: id, persona_id"}), 400
+    try:
+        expected = expected_version(data.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
@@ -682,35 +1033,14 @@ def api_reassign():
         p = db.get(Persona, int(persona_id))
         if not inv or not p:
             return jsonify({"ok": False, "error": "Invitación o persona no encontrada"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
         
         # === Chequeo de conflicto, salvo que venga force ===
-        if inv.fecha and inv.hora and not force:
-            # Llamamos internamente la lógica del endpoint
-            q = (db.query(Invitacion)
-                    .filter(Invitacion.persona_id == p.id)
-                    .filter(Invitacion.fecha == inv.fecha)
-                    .filter(Invitacion.estatus.in_(["Confirmado","Sustituido"]))
-                    .filter(Invitacion.id != inv.id))
-            matches = q.all()
-
-            level = "none"; conflicts=[]
-            for m in matches:
-                dm = minutes_diff(m.hora, inv.hora)
-                if dm == 0: lev="hard"
-                elif dm <= 60: lev="tight1h"
-                elif dm <= 60: lev="tight2h"
-                else: lev="none"
-                if lev!="none":
-                    conflicts.append({
-                        "ID": m.id, "Evento": m.evento or "",
-                        "FechaFmt": fmt_date(m.fecha), "HoraFmt": fmt_time(m.hora),
-                        "Estatus": m.estatus or "", "Lugar": m.lugar or ""
-                    })
-                    order={"none":0,"tight2h":1,"tight1h":2,"hard":3}
-                    if order[lev]>order[level]: level=lev
-
-            if level != "none":
-                return jsonify({"ok": False, "conflict": True, "level": level, "conflicts": conflicts}), 409
+        if not force:
+            c = check_conflict(db, p.id, inv.fecha, inv.hora, exclude_id=inv.id)
+            if c.level != "none":
+                return conflict_response(c)
 
         prev_estatus = inv.estatus
         prev_asig = inv.asignado_a
@@ -720,19 +1050,26 @@ def api_reassign():
         inv.asignado_a = p.nombre
         inv.rol = (rol_in if rol_in else (p.cargo or ""))
         inv.estatus = "Sustituido"
-        if comentario:
-            inv.observaciones = ((inv.observaciones or "") + (" | " if inv.observaciones else "") + comentario)
-        inv.ultima_modificacion = datetime.now()
+        append_obs(inv, comentario)
+        ts = inv.ultima_modificacion = datetime.now()
         inv.modificado_por = "atiapp"
 
-        add_notif(db, inv, "Asignado A", prev_asig or "", inv.asignado_a or "", comentario)
+        add_notif(db, inv, "Asignado A", prev_asig or "", inv.asignado_a or "", comentario, ts)
         if prev_rol != inv.rol:
-            add_notif(db, inv, "Rol", prev_rol or "", inv.rol or "", comentario)
+            add_notif(db, inv, "Rol", prev_rol or "", inv.rol or "", comentario, ts)
         if prev_estatus != inv.estatus:
-            add_notif(db, inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario)
+            add_notif(db, inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario, ts)
 
+        publish_changes(db, "updated", [inv.id])
         db.commit()
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "version": inv.version})
+    except StaleDataError:
+        return stale_response(db, int(inv_id))
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -747,12 +1084,18 @@ def api_status():
     comentario = (data.get("comentario") or "Cambio de estatus").strip()
     if not (inv_id and nuevo):
         return jsonify({"ok": False, "error": "Faltan campos"}), 400
+    try:
+        expected = expected_version(data.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
         inv = db.get(Invitacion, int(inv_id))
         if not inv:
             return jsonify({"ok": False, "error": "ID no encontrado"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
 
         prev_estatus = inv.estatus
         prev_asig    = inv.asignado_a or ""
@@ -772,19 +1115,27 @@ def api_status():
             # inv.observaciones = ""
 
         # Agrega comentario a observaciones (opcional)
-        if comentario:
-            inv.observaciones = ((inv.observaciones or "") + (" | " if inv.observaciones else "") + comentario)
+        append_obs(inv, comentario)
 
         # Notificaciones (snapshots)
-        add_notif(db, inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario)
+        ts = datetime.now()
+        add_notif(db, inv, "Estatus", prev_estatus or "", inv.estatus or "", comentario, ts)
         if nuevo == "Pendiente":
             if prev_asig:
-                add_notif(db, inv, "Asignado A", prev_asig, "", "Se limpió la asignación")
+                add_notif(db, inv, "Asignado A", prev_asig, "", "Se limpió la asignación", ts)
             if prev_rol:
-                add_notif(db, inv, "Rol", prev_rol, "", "Se limpió la asignación")
+                add_notif(db, inv, "Rol", prev_rol, "", "Se limpió la asignación", ts)
 
+        publish_changes(db, "updated", [inv.id])
         db.commit()
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "version": inv.version})
+    except StaleDataError:
+        return stale_response(db, int(inv_id))
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -800,25 +1151,38 @@ def api_cancel():
 
     if not inv_id:
         return jsonify({"ok": False, "error": "Falta id"}), 400
+    try:
+        expected = expected_version(data.get("version"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     db = SessionLocal()
     try:
         inv = db.get(Invitacion, int(inv_id))
         if not inv:
             return jsonify({"ok": False, "error": "Invitación no encontrada"}), 404
+        if expected is not None and inv.version != expected:
+            return stale_response(db, inv.id)
 
         prev_estatus = inv.estatus
-        prev_obs = inv.observaciones or ""
 
         inv.estatus = "Cancelado"
-        inv.observaciones = (prev_obs + (" | " if prev_obs else "") + f"Motivo cancelación: {motivo}")
+        append_obs(inv, f"Motivo cancelación: {motivo}")
         inv.ultima_modificacion = datetime.now()
         inv.modificado_por = "atiapp"
 
         add_notif(db, inv, "Estatus", prev_estatus or "", "Cancelado", motivo)
 
+        publish_changes(db, "updated", [inv.id])
         db.commit()
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "version": inv.version})
+    except StaleDataError:
+        return stale_response(db, int(inv_id))
+    except IntegrityError as e:
+        db.rollback()
+        if is_double_booking(e):
+            return double_booking_response()
+        return jsonify({"ok": False, "error": str(e)}), 500
     except Exception as e:
         db.rollback()
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -829,157 +1193,321 @@ def api_cancel():
 def api_check_conflict():
     """
     Checa si persona_id tiene otra invitación Confirmada/Sustituida el mismo día.
-    Body JSON: { persona_id, fecha (YYYY-MM-DD), hora (HH:MM), exclude_id? }
+    Body JSON: { persona_id, fecha (YYYY-MM-DD|dd/mm/aaaa), hora (HH:MM), exclude_id? }
+           o  { items: [ {persona_id, fecha, hora, exclude_id?}, ... ] }  (lote, 1 consulta)
     Devuelve:
       { level: 'none'|'hard'|'tight1h'|'tight2h',
         conflicts: [ {ID, Evento, FechaFmt, HoraFmt, Estatus, Lugar} ] }
+      en lote: { results: [ {level, conflicts}, ... ] } en el mismo orden
     """
     data = request.get_json() or {}
-    persona_id = data.get("persona_id", type=int)
-    fecha_str  = data.get("fecha") or data.get("Fecha") or data.get("FechaISO")
-    hora_str   = data.get("hora")  or data.get("Hora")  or data.get("HoraISO")
-    exclude_id = data.get("exclude_id", type=int)
-
-    if not (persona_id and fecha_str and hora_str):
-        return jsonify({"ok": False, "error": "Faltan persona_id/fecha/hora"}), 400
+    batch = isinstance(data.get("items"), list)
+    items = data["items"] if batch else [data]
 
-    try:
-        fecha = date.fromisoformat(fecha_str)
-        hh, mm = hora_str.split(":")[0:2]
-        hora  = dtime(int(hh), int(mm))
-    except Exception:
+    ids, fechas, horas = [], [], []
+    for it in items:
+        it = it if isinstance(it, dict) else {}
+        try:
+            persona_id = int(it.get("persona_id"))
+            exclude_id = int(it["exclude_id"]) if it.get("exclude_id") else None
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "persona_id/exclude_id inválidos"}), 400
+        fecha_str = it.get("fecha") or it.get("Fecha") or it.get("FechaISO")
+        hora_str  = it.get("hora")  or it.get("Hora")  or it.get("HoraISO")
+        if not (fecha_str and hora_str):
+            return jsonify({"ok": False, "error": "Faltan persona_id/fecha/hora"}), 400
+        ids.append((persona_id, exclude_id))
+        fechas.append(fecha_str)
+        horas.append(hora_str)
+
+    # la columna completa de una vez (p.ej. '13 pm' -> error)
+    fechas, err_f = parse_dates(fechas)
+    horas, err_h = parse_times(horas)
+    if any(err_f) or any(err_h):
         return jsonify({"ok": False, "error": "Formato inválido de fecha/hora"}), 400
+    candidates = [(p, f, h, x) for (p, x), f, h in zip(ids, fechas, horas)]
 
     db = SessionLocal()
     try:
-        q = (db.query(Invitacion)
-                .filter(Invitacion.persona_id == persona_id)
-                .filter(Invitacion.fecha == fecha)
-                .filter(Invitacion.estatus.in_(["Confirmado","Sustituido"])))
-        if exclude_id:
-            q = q.filter(Invitacion.id != exclude_id)
-
-        matches = q.all()
-
-        conflicts = []
-        level = "none"
-        for inv in matches:
-            dm = minutes_diff(inv.hora, hora)
-            # Clasificamos la severidad
-            if dm == 0:
-                lev = "hard"
-            elif dm <= 60:
-                lev = "tight1h"
-            elif dm <= 60:
-                lev = "tight2h"
-            else:
-                lev = "none"
-
-            if lev != "none":
-                conflicts.append({
-                    "ID": inv.id,
-                    "Evento": inv.evento or "",
-                    "FechaFmt": fmt_date(inv.fecha),
-                    "HoraFmt": fmt_time(inv.hora),
-                    "Estatus": inv.estatus or "",
-                    "Lugar": inv.lugar or ""
-                })
-                # Escala el nivel global (hard > tight1h > tight2h)
-                order = {"none":0,"tight2h":1,"tight1h":2,"hard":3}
-                if order[lev] > order[level]:
-                    level = lev
-
-        return jsonify({"ok": True, "level": level, "conflicts": conflicts})
+        results = [{"level": c.level, "conflicts": [conflict_to_dict(e) for e in c.entries]}
+                   for c in check_many(db, candidates)]
+        if batch:
+            return jsonify({"ok": True, "results": results})
+        return jsonify({"ok": True, **results[0]})
     finally:
         db.close()
         
+# -----------------------------------------------------------------------------
+# FEED DE CAMBIOS (SSE): el tablero parcha tarjetas en lugar de recargar todo
+# -----------------------------------------------------------------------------
+def fetch_invitations(db, ids, version: int = 1) -> dict:
+    """{id: payload} con el mismo contrato que /api/invitations (todos los campos)."""
+    if not ids:
+        return {}
+    fields = parse_fields(None, version)
+    to_dict = row_serializer(fields)
+    return {r.id: to_dict(r) for r in db.execute(inv_select(fields).where(Invitacion.id.in_(ids)))}
+
+change_hub = feed.ChangeHub(fetch_invitations)
+
+@app.get("/api/changes")
+def api_changes():
+    """
+    text/event-stream con eventos created/updated/deleted: {v, op, id, inv}.
+    Reanuda desde ?since=<version> o Last-Event-ID; evento 'reset' = recargar todo.
+    La conexión se cierra sola tras SSE_MAX_SECONDS (el navegador se reconecta).
+    """
+    raw = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(raw) if raw else None
+    except ValueError:
+        return jsonify({"ok": False, "error": "since inválido"}), 400
+
+    q = change_hub.subscribe()
+    if q is None:
+        return jsonify({"ok": False, "error": "Demasiados clientes en vivo"}), 503, {"Retry-After": "30"}
+
+    def generate():
+        try:
+            deadline = time.monotonic() + feed.SSE_MAX_SECONDS
+            yield f"retry: {feed.SSE_RETRY_MS}\n\n"
+            seen = since
+            if since is not None:
+                db = SessionLocal()
+                try:
+                    backlog = change_hub.replay(db, since)
+                finally:
+                    db.close()
+                if backlog is None:
+                    yield f"event: {feed.RESET}\ndata: {{}}\n\n"
+                    return
+                if backlog:
+                    seen = backlog[-1]["v"]
+                    yield feed.format_events(backlog)
+
+            while time.monotonic() < deadline:
+                try:
+                    events = q.get(timeout=feed.HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if events == feed.RESET:
+                    yield f"event: {feed.RESET}\ndata: {{}}\n\n"
+                    return
+                # lo que ya salió en el replay (misma versión = mismo commit completo)
+                events = [ev for ev in events if seen is None or ev["v"] > seen]
+                if events:
+                    yield feed.format_events(events)
+        finally:
+            change_hub.unsubscribe(q)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",   # que un proxy nginx no acumule el stream
+    })
+
+# -----------------------------------------------------------------------------
+# OUTBOX (bot de notificaciones): reclamar lote con lease + confirmar envío
+# -----------------------------------------------------------------------------
+OUTBOX_TOKEN = os.getenv("OUTBOX_TOKEN", "")
+
+def outbox_auth_error():
+    """Si OUTBOX_TOKEN está definido, exige 'Authorization: Bearer <token>'."""
+    if OUTBOX_TOKEN and request.headers.get("Authorization") != f"Bearer {OUTBOX_TOKEN}":
+        return jsonify({"ok": False, "error": "No autorizado"}), 401
+    return None
+
+@app.post("/api/outbox/claim")
+def api_outbox_claim():
+    """
+    Body JSON: { limit?: 50, lease_seconds?: 120, coalesce?: false, owner?: str }
+    Devuelve: { ok, lease, messages: [ {...snapshot, ids: [...], cambios?: [...]} ] }
+    """
+    err = outbox_auth_error()
+    if err:
+        return err
+    data = request.get_json(silent=True) or {}
+    try:
+        limit = int(data.get("limit") or 50)
+        lease_seconds = max(5, int(data.get("lease_seconds") or 120))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "limit/lease_seconds inválidos"}), 400
+    owner = (data.get("owner") or "").strip() or uuid.uuid4().hex
+
+    db = SessionLocal()
+    try:
+        rows = outbox.claim(db, owner, limit, lease_seconds)
+        db.commit()
+        msgs = outbox.coalesce(rows) if data.get("coalesce") else outbox.as_messages(rows)
+        return jsonify({"ok": True, "lease": owner, "messages": msgs})
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 500
+    finally:
+        db.close()
+
+@app.post("/api/outbox/ack")
+def api_outbox_ack():
+    """Body JSON: { ids: [..], lease?: str }  -> { ok, acked }"""
+    err = outbox_auth_error()
+    if err:
+        return err
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = [int(i) for i in (data.get("ids") or [])]
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "ids inválidos"}), 400
+
+    db = SessionLocal()
+    try:
+        n = outbox.ack(db, ids, (data.get("lease") or "").strip() or None)
+        db.commit()
+        return jsonify({"ok": True, "acked": n})
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 500
+    finally:
+        db.close()
+
 @app.get("/uploads/<path:fname>")
 def uploads_serve(fname):
-    return send_from_directory(UPLOAD_FOLDER, fname, as_attachment=False)
+    """Adjuntos: ETag/immutable, Range y offload al proxy (storage.py). ?w= = miniatura."""
+    w = storage.thumb_width(request.args.get("w"))
+    if w:
+        fname = storage.thumbnail(upload_store, fname, w)
+    return upload_store.serve(fname)
+
+# -----------------------------------------------------------------------------
+# REPORTES: Confirmados (XLSX write-only en temporal / CSV en streaming)
+# -----------------------------------------------------------------------------
+REPORT_HEADERS = [
+    "Municipio/Dependencia",
+    "Partido Político",
+    "Quien Convoca",
+    "Asignado",
+    "Cargo del Asignado",
+    "Fecha",
+    "Lugar",
+    "Hora",
+    "Convoca Cargo",
+]
+
+def report_stmt(args: dict):
+    """SELECT de las 9 columnas del reporte (también lo usa asgi.py)."""
+    # mismos filtros que /api/invitations; sin ?status= (o vacío) el reporte es de Confirmados
+    args = {**args, "status": args.get("status") or "Confirmado"}
+    return (select(Invitacion.municipio, Invitacion.partido_politico, Invitacion.convoca,
+                   Invitacion.asignado_a, Invitacion.rol, Invitacion.fecha, Invitacion.lugar,
+                   Invitacion.hora, Invitacion.convoca_cargo)
+            .where(*invitation_filters(args))
+            .order_by(Invitacion.fecha.asc(), Invitacion.hora.asc()))
+
+def report_row(r) -> list:
+    return [
+        r.municipio or "",
+        r.partido_politico or "",
+        r.convoca or "",
+        r.asignado_a or "",
+        r.rol or "",
+        fmt_date(r.fecha),
+        r.lugar or "",
+        fmt_time(r.hora),
+        r.convoca_cargo or "",
+    ]
+
+def report_rows(db, args):
+    """Las 9 columnas del reporte, con cursor del lado del servidor (yield_per)."""
+    for r in db.execute(report_stmt(args.to_dict()).execution_options(yield_per=1000)):
+        yield report_row(r)
+
+def report_workbook():
+    """(Workbook write-only, hoja) con el formato y el encabezado ya puestos."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Confirmados")
+
+    # En write-only el formato va antes de las filas: ancho, freeze panes, encabezado bonito
+    for c in range(1, len(REPORT_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(c)].width = 24
+    ws.freeze_panes = "A2"
+    bold = Font(bold=True)
+    fill = PatternFill("solid", fgColor="E9ECEF")
+    header = []
+    for h in REPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = bold
+        cell.fill = fill
+        header.append(cell)
+    ws.append(header)
+    return wb, ws
+
+def report_filename(ext: str) -> str:
+    return f"reporte_confirmados_{datetime.utcnow().date().isoformat()}.{ext}"
 
 @app.get("/api/report/confirmados.xlsx")
 def report_confirmados_xlsx():
-    """Descarga un XLSX con las invitaciones Confirmadas."""
+    """
+    Descarga un XLSX con las invitaciones Confirmadas (acepta status/date_from/date_to).
+    Workbook en modo write-only: las filas van a disco conforme salen del cursor y el
+    archivo final se envía desde un temporal, sin tener libro y resultado en RAM.
+    No es streaming: openpyxl arma el zip hasta save(), así que el cliente no recibe
+    nada hasta que se generó la última fila. Para rangos grandes, confirmados.csv.
+    """
+    wb, ws = report_workbook()
+    n = 1
     db = SessionLocal()
     try:
-        rows = (
-            db.query(Invitacion)
-              .filter(Invitacion.estatus == "Confirmado")
-              .order_by(Invitacion.fecha.asc(), Invitacion.hora.asc())
-              .all()
-        )
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Confirmados"
-
-        headers = [
-            "Municipio/Dependencia",
-            "Partido Político",
-            "Quien Convoca",
-            "Asignado",
-            "Cargo del Asignado",
-            "Fecha",
-            "Lugar",
-            "Hora",
-            "Convoca Cargo",
-        ]
-        ws.append(headers)
-
-        def _fmt_date(d): return d.strftime("%d/%m/%y") if d else ""
-        def _fmt_time(t): return t.strftime("%H:%M") if t else ""
-
-        for inv in rows:
-            ws.append([
-                inv.municipio or "",
-                inv.partido_politico or "",
-                inv.convoca or "",
-                inv.asignado_a or "",
-                inv.rol or "",
-                _fmt_date(inv.fecha),
-                inv.lugar or "",
-                _fmt_time(inv.hora),
-                inv.convoca_cargo or "",
-            ])
-
-        # Encabezado bonito, autofiltro, freeze panes y ancho de columnas
-        bold = Font(bold=True)
-        fill = PatternFill("solid", fgColor="E9ECEF")
-        for c in range(1, len(headers) + 1):
-            cell = ws.cell(row=1, column=c)
-            cell.font = bold
-            cell.fill = fill
-            ws.column_dimensions[get_column_letter(c)].width = 24
-
-        ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{ws.max_row}"
-        ws.freeze_panes = "A2"
-
-        bio = BytesIO()
-        wb.save(bio)
-        bio.seek(0)
-        fname = f"reporte_confirmados_{datetime.utcnow().date().isoformat()}.xlsx"
-        return send_file(
-            bio,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=fname,
-        )
+        for row in report_rows(db, request.args):
+            ws.append(row)
+            n += 1
     finally:
         db.close()
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(REPORT_HEADERS))}{n}"
+
+    tmp = tempfile.TemporaryFile()   # se borra al cerrarse, cuando termina la descarga
+    wb.save(tmp)
+    tmp.seek(0)
+    return send_file(
+        tmp,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        as_attachment=True,
+        download_name=report_filename("xlsx"),
+    )
+
+@app.get("/api/report/confirmados.csv")
+def report_confirmados_csv():
+    """Mismo reporte en CSV (UTF-8 con BOM para Excel), generado fila a fila: para rangos grandes."""
+    args = request.args.copy()
+
+    def generate():
+        buf = StringIO()
+        w = csv.writer(buf)
+        buf.write("\ufeff")
+        w.writerow(REPORT_HEADERS)
+        db = SessionLocal()
+        try:
+            for n, row in enumerate(report_rows(db, args), 1):
+                w.writerow(row)
+                if n % 500 == 0:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+        finally:
+            db.close()
+        yield buf.getvalue()
+
+    return Response(generate(), mimetype="text/csv", headers={
+        "Content-Disposition": f'attachment; filename="{report_filename("csv")}"',
+    })
 # -----------------------------------------------------------------------------
 # CONTADORES (para dashboard)
 # -----------------------------------------------------------------------------
 @app.get("/api/counters")
+@cached_json("counters")
 def api_counters():
     """Regresa conteos por estatus para pintar los KPIs del header."""
     db = SessionLocal()
     try:
-        rows = (db.query(Invitacion.estatus, func.count(Invitacion.id))
-                  .group_by(Invitacion.estatus)
-                  .all())
-        counts = {"Pendiente": 0, "Confirmado": 0, "Sustituido": 0, "Cancelado": 0}
-        for est, c in rows:
-            counts[est or "Pendiente"] = c
+        counts = rollups.status_counts(db)
         counts["Total"] = sum(counts.values())
         return jsonify(counts)
     finally:
@@ -988,6 +1516,10 @@ def api_counters():
 @app.after_request
 def add_no_store(resp):
     if request.path.startswith('/api/'):
+        if resp.headers.get('ETag'):
+            # respuestas versionadas (cache.py): el navegador puede guardarlas, pero revalida siempre
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
         resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         resp.headers['Pragma'] = 'no-cache'
         resp.headers['Expires'] = '0'
@@ -996,6 +1528,49 @@ def add_no_store(resp):
 @app.get("/api/health")
 def api_health():
     return {"ok": True, "time": datetime.utcnow().isoformat()}
+
+@app.get("/api/health/deep")
+def api_health_deep():
+    """Ida y vuelta a la BD con latencia medida + estado del pool; 503 si falla o va lenta."""
+    out, status = metrics.deep_health(engine)
+    out["time"] = datetime.utcnow().isoformat()
+    return jsonify(out), status
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Formato de texto de Prometheus. Si METRICS_TOKEN está definido, exige Bearer."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"ok": False, "error": "No autorizado"}), 401
+    return metrics.metrics_response()
+
+# -----------------------------------------------------------------------------
+# Perfil bajo demanda: cProfile + SQL de un GET interno
+# -----------------------------------------------------------------------------
+DEBUG_PROFILE_TOKEN = os.getenv("DEBUG_PROFILE_TOKEN", "")
+PROFILE_SORTS = {"cumulative", "tottime", "calls"}
+
+@app.get("/api/debug/profile")
+def api_debug_profile():
+    """
+    Perfila un GET de la app dentro de este proceso (cProfile + consultas SQL).
+      ?path=/api/invitations%3Flimit%3D200   ruta a perfilar (URL-encoded)
+      ?sort=cumulative|tottime|calls  ?limit=40  (renglones del perfil)
+    Apagado salvo que DEBUG_PROFILE_TOKEN esté definido; exige 'Authorization: Bearer <token>'.
+    """
+    if not DEBUG_PROFILE_TOKEN:
+        return jsonify({"ok": False, "error": "No encontrado"}), 404
+    if request.headers.get("Authorization") != f"Bearer {DEBUG_PROFILE_TOKEN}":
+        return jsonify({"ok": False, "error": "No autorizado"}), 401
+    path = request.args.get("path") or ""
+    sort = request.args.get("sort") or "cumulative"
+    limit = max(5, min(request.args.get("limit", default=40, type=int), 200))
+    if not path.startswith("/") or path.startswith("/api/debug/"):
+        return jsonify({"ok": False, "error": "path inválido"}), 400
+    if sort not in PROFILE_SORTS:
+        return jsonify({"ok": False, "error": f"sort debe ser uno de: {', '.join(sorted(PROFILE_SORTS))}"}), 400
+    return jsonify({"ok": True, **profiling.profile_request(app, path, sort, limit)})
 # =========================
 #  Run
 # =========================
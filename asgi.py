@@ -0,0 +1,430 @@
+# asgi.py
+"""
+Entrada ASGI (uvicorn) de la misma app.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 2
+    pip install -r requirements-asgi.txt
+
+Con gthread (app.py + gunicorn.conf.py) cada request ocupa un hilo y una conexión
+del pool mientras dura: un stream SSE o una descarga larga de un cliente lento
+detiene un hilo entero. Aquí las lecturas del tablero, el feed y los reportes son
+corrutinas sobre SQLAlchemy asyncio + psycopg3 async: cientos de clientes abiertos
+no necesitan cientos de hilos, y la conexión a la BD solo se toma mientras hay
+consulta.
+
+Rutas nativas (mismo contrato que app.py, mismos helpers):
+    GET /api/health
+    GET /api/invitations, /api/invitations/search
+    GET /api/invitation/{id}, /api/invitation/{id}/history
+    GET /api/counters, /api/stats            (caché/ETag de cache.py)
+    GET /api/changes                          (SSE, hasta SSE_ASYNC_MAX_CLIENTS)
+    GET /api/report/confirmados.csv|.xlsx
+
+Todo lo demás (escrituras, adjuntos, importación, catálogo, /metrics...) lo atiende
+la app Flask montada con a2wsgi en su propio pool de hilos (WEB_THREADS), con el
+engine síncrono de db.py.
+
+Las funciones síncronas de consulta (history, search, rollups, fetch_invitations)
+se reutilizan con AsyncSession.run_sync: corren en un greenlet y su I/O es async.
+"""
+import asyncio
+import csv
+import os
+import re
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from io import StringIO
+
+from a2wsgi import WSGIMiddleware
+from openpyxl.utils import get_column_letter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import feed
+import history
+import metrics
+import rollups
+import search
+from app import (
+    app as flask_app, change_hub, decode_cursor, encode_cursor, fetch_invitations, inv_etag,
+    inv_select, invitation_filters, invitations_stmt, report_filename, report_row, report_stmt,
+    report_workbook, REPORT_HEADERS,
+)
+from cache import cache_key, current_data_version, etag_for, response_cache
+from db import DB_URL, ENGINE_CONNECT_ARGS, POOL_SETTINGS, WEB_THREADS, Invitacion
+from parsing import parse_date_flexible
+from serializers import astream_json_array, dumps, parse_fields, parse_version, row_serializer
+
+# -----------------------------------------------------------------------------
+# Engine async: mismo DATABASE_URL/TLS/PgBouncer que db.py, pool propio por proceso
+# -----------------------------------------------------------------------------
+ASYNC_POOL_SETTINGS = dict(
+    POOL_SETTINGS,
+    pool_size=int(os.getenv("DB_ASYNC_POOL_SIZE") or 10),
+    max_overflow=int(os.getenv("DB_ASYNC_MAX_OVERFLOW") or 10),
+)
+
+# postgresql+psycopg:// con create_async_engine = psycopg3 AsyncConnection
+async_engine = create_async_engine(DB_URL, connect_args=ENGINE_CONNECT_ARGS, **ASYNC_POOL_SETTINGS)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# -----------------------------------------------------------------------------
+# Respuestas (mismos headers que add_no_store de app.py)
+# -----------------------------------------------------------------------------
+NO_STORE = {"Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
+            "Pragma": "no-cache", "Expires": "0"}
+
+def json_response(obj, status: int = 200, headers: dict | None = None) -> Response:
+    return Response(dumps(obj), status_code=status, media_type="application/json",
+                    headers={**NO_STORE, **(headers or {})})
+
+def error(msg: str, status: int, headers: dict | None = None) -> Response:
+    return json_response({"ok": False, "error": msg}, status, headers)
+
+def int_arg(params, name: str, default: int | None = None) -> int | None:
+    """Como request.args.get(name, type=int) de Flask: si no es entero, el default."""
+    try:
+        return int(params[name])
+    except (KeyError, ValueError):
+        return default
+
+def if_none_match(request: Request) -> set[str]:
+    raw = request.headers.get("if-none-match") or ""
+    return {t.strip().removeprefix("W/").strip('"') for t in raw.split(",") if t.strip()}
+
+async def cached_json(request: Request, name: str, build) -> Response:
+    """cache.cached_json para corrutinas: `build(db) -> obj` corre con run_sync."""
+    async with AsyncSessionLocal() as db:
+        # versión ANTES que los datos, igual que en cache.py
+        version = await db.run_sync(current_data_version)
+        key = cache_key(name, request.query_params.multi_items())
+        etag = etag_for(key, version)
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+        if etag in if_none_match(request):
+            return Response(status_code=304, headers=headers)
+        hit = response_cache.get(key, version)
+        if hit is None:
+            hit = (dumps(await db.run_sync(build)).encode(), "application/json")
+            response_cache.put(key, version, hit)
+    body, mimetype = hit
+    return Response(body, media_type=mimetype, headers=headers)
+
+async def rows_of(result):
+    """Filas de un AsyncResult en streaming: un salto al greenlet por lote (yield_per), no por fila."""
+    async for part in result.partitions():
+        for r in part:
+            yield r
+
+# -----------------------------------------------------------------------------
+# Invitaciones
+# -----------------------------------------------------------------------------
+async def api_health(request: Request) -> Response:
+    return json_response({"ok": True, "time": datetime.utcnow().isoformat()})
+
+async def api_invitations(request: Request) -> Response:
+    """Ver app.api_invitations: ?fields, ?limit&cursor, ?v=2, filtros; arreglo completo sin limit."""
+    args = request.query_params
+    try:
+        fields = parse_fields(args.get("fields"), parse_version(args.get("v")))
+        cursor = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    except ValueError as e:
+        return error(str(e), 400)
+    limit = int_arg(args, "limit")
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+
+    stmt = invitations_stmt(fields, args, cursor, limit).execution_options(yield_per=500)
+    to_dict = row_serializer(fields)
+
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            if limit is None:
+                rows = rows_of(await db.stream(stmt))
+                async for chunk in astream_json_array(to_dict(r) async for r in rows):
+                    yield chunk
+                return
+
+            # versión de datos leída ANTES de la página: el feed SSE reanuda desde aquí
+            version = await db.run_sync(current_data_version)
+            rows = rows_of(await db.stream(stmt))
+            state = {"last": None, "more": False}
+            async def page():
+                n = 0
+                async for r in rows:
+                    if n == limit:
+                        state["more"] = True
+                        break
+                    n += 1
+                    state["last"] = r
+                    yield to_dict(r)
+            def tail():
+                nxt = encode_cursor(state["last"]) if state["more"] else None
+                return "]," + dumps({"next_cursor": nxt, "version": version})[1:]
+            async for chunk in astream_json_array(page(), head='{"items":[', tail=tail):
+                yield chunk
+
+    return StreamingResponse(generate(), media_type="application/json", headers=NO_STORE)
+
+async def api_invitations_search(request: Request) -> Response:
+    """Ver app.api_invitations_search (search.py, vía run_sync)."""
+    args = request.query_params
+    q = (args.get("q") or "").strip()
+    if len(q) < 2:
+        return error("Escribe al menos 2 caracteres", 400)
+    try:
+        fields = parse_fields(args.get("fields"), parse_version(args.get("v")))
+        cursor = search.decode_cursor(args["cursor"]) if args.get("cursor") else None
+    except ValueError as e:
+        return error(str(e), 400)
+    limit = int_arg(args, "limit", 50)
+
+    async with AsyncSessionLocal() as db:
+        hits, next_cursor, backend = await db.run_sync(
+            search.search, q, invitation_filters(args), limit, cursor)
+        ids = [i for i, _ in hits]
+        rows = ({r.id: r for r in await db.execute(inv_select(fields).where(Invitacion.id.in_(ids)))}
+                if ids else {})
+    to_dict = row_serializer(fields)
+    items = [to_dict(rows[i]) for i in ids if i in rows]
+    return json_response({"items": items, "next_cursor": next_cursor, "backend": backend})
+
+async def api_inv_get(request: Request) -> Response:
+    try:
+        version = parse_version(request.query_params.get("v"))
+    except ValueError as e:
+        return error(str(e), 400)
+    inv_id = request.path_params["inv_id"]
+    async with AsyncSessionLocal() as db:
+        inv = (await db.run_sync(fetch_invitations, [inv_id], version)).get(inv_id)
+    if not inv:
+        return error("Invitación no encontrada", 404)
+    etag = inv_etag(inv["Version"])
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if etag in if_none_match(request):
+        return Response(status_code=304, headers=headers)
+    return Response(dumps(inv), media_type="application/json", headers=headers)
+
+async def api_inv_history(request: Request) -> Response:
+    args = request.query_params
+    compact = args.get("compact") in ("1", "true")
+    try:
+        cursor = history.decode_cursor(args["cursor"]) if args.get("cursor") else None
+    except ValueError as e:
+        return error(str(e), 400)
+    if cursor and not compact and cursor[1] is None:
+        return error("Cursor inválido", 400)
+    limit = int_arg(args, "limit", history.HISTORY_LIMIT)
+    inv_id = request.path_params["inv_id"]
+
+    async with AsyncSessionLocal() as db:
+        if (await db.execute(select(Invitacion.id).where(Invitacion.id == inv_id))).first() is None:
+            return error("Invitación no encontrada", 404)
+        read = history.timeline_compact if compact else history.timeline
+        items, next_cursor = await db.run_sync(read, inv_id, limit, cursor)
+    return json_response({"items": items, "next_cursor": next_cursor})
+
+# -----------------------------------------------------------------------------
+# Contadores (caché por versión de datos)
+# -----------------------------------------------------------------------------
+def _counters(db) -> dict:
+    counts = rollups.status_counts(db)
+    counts["Total"] = sum(counts.values())
+    return counts
+
+async def api_counters(request: Request) -> Response:
+    return await cached_json(request, "counters", _counters)
+
+async def api_stats(request: Request) -> Response:
+    date_from = parse_date_flexible(request.query_params.get("date_from"))
+    date_to   = parse_date_flexible(request.query_params.get("date_to"))
+    if date_from and date_to and date_from > date_to:
+        date_from, date_to = date_to, date_from
+    return await cached_json(request, "stats", lambda db: rollups.status_counts(db, date_from, date_to))
+
+# -----------------------------------------------------------------------------
+# Feed de cambios (SSE): una corrutina por cliente, mismo ChangeHub que app.py
+# -----------------------------------------------------------------------------
+async def api_changes(request: Request) -> Response:
+    raw = request.headers.get("last-event-id") or request.query_params.get("since")
+    try:
+        since = int(raw) if raw else None
+    except ValueError:
+        return error("since inválido", 400)
+
+    loop = asyncio.get_running_loop()
+    # subscribe() puede arrancar el hilo del hub y consultar su versión inicial (síncrono)
+    sub = await run_in_threadpool(change_hub.subscribe, feed.AsyncSubscriber(loop),
+                                  feed.SSE_ASYNC_MAX_CLIENTS)
+    if sub is None:
+        return error("Demasiados clientes en vivo", 503, {"Retry-After": "30"})
+
+    async def generate():
+        try:
+            deadline = loop.time() + feed.SSE_ASYNC_MAX_SECONDS
+            yield f"retry: {feed.SSE_RETRY_MS}\n\n"
+            seen = since
+            if since is not None:
+                async with AsyncSessionLocal() as db:
+                    backlog = await db.run_sync(change_hub.replay, since)
+                if backlog is None:
+                    yield f"event: {feed.RESET}\ndata: {{}}\n\n"
+                    return
+                if backlog:
+                    seen = backlog[-1]["v"]
+                    yield feed.format_events(backlog)
+
+            while loop.time() < deadline:
+                try:
+                    events = await sub.get(feed.HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if events == feed.RESET:
+                    yield f"event: {feed.RESET}\ndata: {{}}\n\n"
+                    return
+                events = [ev for ev in events if seen is None or ev["v"] > seen]
+                if events:
+                    yield feed.format_events(events)
+        finally:
+            change_hub.unsubscribe(sub)
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+# -----------------------------------------------------------------------------
+# Reportes
+# -----------------------------------------------------------------------------
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FILE_CHUNK = 64 * 1024
+
+async def report_confirmados_csv(request: Request) -> Response:
+    stmt = report_stmt(dict(request.query_params)).execution_options(yield_per=1000)
+
+    async def generate():
+        buf = StringIO()
+        w = csv.writer(buf)
+        buf.write("\ufeff")
+        w.writerow(REPORT_HEADERS)
+        async with AsyncSessionLocal() as db:
+            n = 0
+            async for r in rows_of(await db.stream(stmt)):
+                w.writerow(report_row(r))
+                n += 1
+                if n % 500 == 0:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+        yield buf.getvalue()
+
+    return StreamingResponse(generate(), media_type="text/csv", headers={
+        **NO_STORE, "Content-Disposition": f'attachment; filename="{report_filename("csv")}"',
+    })
+
+def _read_chunks(f):
+    with f:
+        while chunk := f.read(FILE_CHUNK):
+            yield chunk
+
+def _append_rows(ws, part) -> None:
+    for r in part:
+        ws.append(report_row(r))
+
+def _save_workbook(wb, ws, n: int, tmp) -> None:
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(REPORT_HEADERS))}{n}"
+    wb.save(tmp)
+
+async def report_confirmados_xlsx(request: Request) -> Response:
+    """
+    Filas desde un cursor async; cada lote (yield_per) se formatea y se escribe a la hoja
+    en un hilo, igual que el zip final (wb.save): el loop solo espera I/O y los demás
+    clientes (SSE incluidos) siguen atendidos. Igual que en app.py, el primer byte sale
+    hasta que el libro está completo.
+    """
+    stmt = report_stmt(dict(request.query_params)).execution_options(yield_per=1000)
+    wb, ws = report_workbook()
+    n = 1
+    async with AsyncSessionLocal() as db:
+        async for part in (await db.stream(stmt)).partitions():
+            await run_in_threadpool(_append_rows, ws, part)
+            n += len(part)
+
+    tmp = tempfile.TemporaryFile()
+    await run_in_threadpool(_save_workbook, wb, ws, n, tmp)
+    size = tmp.tell()
+    tmp.seek(0)
+    return StreamingResponse(_read_chunks(tmp), media_type=XLSX_MIME, headers={
+        **NO_STORE, "Content-Length": str(size),
+        "Content-Disposition": f'attachment; filename="{report_filename("xlsx")}"',
+    })
+
+# -----------------------------------------------------------------------------
+# Métricas de las rutas nativas (las de Flask las cuenta metrics.init_app)
+# -----------------------------------------------------------------------------
+class MetricsMiddleware:
+    """http_requests_total / http_request_duration_seconds con la ruta en formato Flask."""
+
+    def __init__(self, app, routes: list[Route]):
+        self.app = app
+        # /api/invitation/{inv_id:int} -> /api/invitation/<int:inv_id>: mismas series que gunicorn
+        self.labels = {r.endpoint: re.sub(r"\{(\w+):(\w+)\}", r"<\2:\1>", r.path) for r in routes}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                route = self.labels.get(scope.get("endpoint"))
+                if route:
+                    metrics.REQUESTS.labels(scope["method"], route, str(status)).inc()
+                    metrics.LATENCY.labels(scope["method"], route).observe(time.perf_counter() - t0)
+
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            route = self.labels.get(scope.get("endpoint"))
+            if route:
+                metrics.EXCEPTIONS.labels(route).inc()
+            raise
+
+# -----------------------------------------------------------------------------
+# App
+# -----------------------------------------------------------------------------
+ROUTES = [
+    Route("/api/health", api_health),
+    Route("/api/invitations", api_invitations),
+    Route("/api/invitations/search", api_invitations_search),
+    Route("/api/invitation/{inv_id:int}", api_inv_get),
+    Route("/api/invitation/{inv_id:int}/history", api_inv_history),
+    Route("/api/counters", api_counters),
+    Route("/api/stats", api_stats),
+    Route("/api/changes", api_changes),
+    Route("/api/report/confirmados.csv", report_confirmados_csv),
+    Route("/api/report/confirmados.xlsx", report_confirmados_xlsx),
+]
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_engine.dispose()
+
+app = Starlette(
+    routes=ROUTES + [Mount("/", app=WSGIMiddleware(flask_app, workers=WEB_THREADS))],
+    lifespan=lifespan,
+)
+app = MetricsMiddleware(app, ROUTES)
@@ -0,0 +1,183 @@
+# bench/bench_asgi.py
+"""
+gunicorn gthread (app:app) contra uvicorn (asgi:app), lado a lado.
+
+Mismo número de procesos y la misma mezcla de lecturas que load_test.py, pero con
+M tableros conectados al feed (/api/changes) durante toda la corrida y un escritor
+que cambia un estatus por segundo, como en operación real. Reporta req/s y
+latencias de las lecturas, cuántos streams SSE aceptó el servidor, cuántos eventos
+llegaron y los hilos/RSS del árbol de procesos al final.
+
+    python bench/bench_asgi.py                         # 200 streams + 32 clientes, 15 s
+    python bench/bench_asgi.py --streams 500 --clients 64 --seconds 30
+
+Requiere requirements-asgi.txt y una PostgreSQL con datos en DATABASE_URL.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from load_test import free_port, get, run_load, start_server, wait_ready, gunicorn_argv
+
+def uvicorn_argv(port: int, workers: int) -> list[str]:
+    return [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+
+# -----------------------------------------------------------------------------
+# Clientes
+# -----------------------------------------------------------------------------
+class Streams:
+    """M conexiones SSE abiertas; cuenta aceptadas, rechazadas y eventos recibidos."""
+
+    def __init__(self, port: int, n: int):
+        self.port, self.n = port, n
+        self.accepted = self.rejected = self.events = 0
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.conns: list = []
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(n)]
+
+    def start(self) -> None:
+        for t in self.threads:
+            t.start()
+
+    def _run(self) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            conn.request("GET", "/api/changes")
+            r = conn.getresponse()
+            with self.lock:
+                if r.status != 200:
+                    self.rejected += 1
+                    return
+                self.accepted += 1
+                self.conns.append(conn)
+            while not self.stop.is_set():
+                line = r.fp.readline()
+                if not line:
+                    return
+                if line.startswith(b"event: "):
+                    with self.lock:
+                        self.events += 1
+        except (OSError, http.client.HTTPException):
+            if not self.stop.is_set():
+                with self.lock:
+                    self.rejected += 1
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        self.stop.set()
+        with self.lock:
+            conns = list(self.conns)
+        for c in conns:
+            try:
+                c.sock.shutdown(socket.SHUT_RDWR)    # desbloquea el readline
+            except (OSError, AttributeError):
+                pass
+        for t in self.threads:
+            t.join(timeout=5)
+
+def writer(port: int, ids: list[int], stop: threading.Event) -> None:
+    """Un cambio de estatus por segundo (genera un evento para cada stream)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    n = 0
+    while not stop.wait(1):
+        body = json.dumps({"id": ids[n % len(ids)], "estatus": ("Pendiente", "Cancelado")[n % 2],
+                           "comentario": "bench"})
+        try:
+            conn.request("POST", "/api/status", body, {"Content-Type": "application/json"})
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        n += 1
+
+# -----------------------------------------------------------------------------
+# Procesos
+# -----------------------------------------------------------------------------
+def tree(pid: int) -> list[int]:
+    out = [pid]
+    try:
+        kids = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split()
+    except FileNotFoundError:
+        return out
+    for k in kids:
+        out += tree(int(k))
+    return out
+
+def threads_rss(pid: int) -> tuple[int, float]:
+    """(hilos, RSS en MiB) sumando el proceso maestro y sus workers."""
+    threads, rss = 0, 0
+    for p in tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss += int(line.split()[1])
+        except OSError:
+            pass
+    return threads, rss / 1024
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="gunicorn gthread contra uvicorn/asgi.py")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--streams", type=int, default=200)
+    ap.add_argument("--seconds", type=float, default=15)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--log", default=os.path.join(tempfile.gettempdir(), "bench_asgi.log"))
+    args = ap.parse_args()
+
+    print(f"{args.workers} procesos, {args.streams} streams SSE + {args.clients} clientes de lectura, "
+          f"{args.seconds:.0f} s (log: {args.log})\n")
+    print(f"{'servidor':<10} {'req/s':>7} {'p50':>8} {'p95':>8} {'errores':>8} {'SSE ok':>7} "
+          f"{'rechaz.':>7} {'eventos':>8} {'hilos':>6} {'RSS':>8}")
+    servers = [
+        ("gunicorn", lambda port: gunicorn_argv(port)),
+        ("uvicorn", lambda port: uvicorn_argv(port, args.workers)),
+    ]
+    for name, argv in servers:
+        port = free_port()
+        proc, log = start_server(port, {}, args.workers, args.threads, args.log, argv(port))
+        try:
+            wait_ready(port)
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            items = json.loads(get(c, "/api/invitations?limit=500&fields=ID")[1])["items"]
+            ids = [it["ID"] for it in items] or [1]
+            run_load(port, args.clients, 2, ids)            # calentamiento
+
+            streams = Streams(port, args.streams)
+            streams.start()
+            time.sleep(2)
+            stop = threading.Event()
+            w = threading.Thread(target=writer, args=(port, ids, stop), daemon=True)
+            w.start()
+            r = run_load(port, args.clients, args.seconds, ids)
+            threads, rss = threads_rss(proc.pid)
+            stop.set()
+            w.join()
+            streams.close()
+            print(f"{name:<10} {r['rps']:7.1f} {r['p50']:7.1f}ms {r['p95']:7.1f}ms {r['errors']:8d} "
+                  f"{streams.accepted:7d} {streams.rejected:7d} {streams.events:8d} {threads:6d} "
+                  f"{rss:6.0f}MiB")
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/bench_notif_join.py
+"""
+Historial de notificaciones por invitación: join por texto (invitacion_id) contra
+join por entero (invitacion_ref, migrations/m0005).
+
+Trabaja sobre tablas TEMPORALES con datos sintéticos (no toca las tablas reales),
+con la misma forma e índices que notificaciones/invitaciones:
+
+    python bench/bench_notif_join.py                      # 20k invitaciones x 10 notificaciones
+    python bench/bench_notif_join.py --invitaciones 100000 --por-invitacion 20 --repeat 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from db import engine
+
+SETUP = [
+    "CREATE TEMP TABLE b_inv (id integer PRIMARY KEY, evento text) ON COMMIT DROP",
+    """CREATE TEMP TABLE b_notif (
+           id integer PRIMARY KEY, ts timestamp, invitacion_id varchar, invitacion_ref integer,
+           campo varchar, valor_nuevo text) ON COMMIT DROP""",
+    "INSERT INTO b_inv SELECT g, 'Evento ' || g FROM generate_series(1, CAST(:n AS integer)) g",
+    """INSERT INTO b_notif
+       SELECT g, localtimestamp - make_interval(secs => g), (1 + g % n)::text, 1 + g % n,
+              'Estatus', 'Confirmado'
+       FROM (SELECT CAST(:n AS integer) AS n, CAST(:k AS integer) AS k) p,
+            generate_series(1, p.n * p.k) g""",
+    "CREATE INDEX ON b_notif (invitacion_id)",
+    "CREATE INDEX ON b_notif (invitacion_ref)",
+    "ANALYZE b_inv",
+    "ANALYZE b_notif",
+]
+
+# (nombre, SQL); :ids = página de invitaciones del tablero
+QUERIES = [
+    ("texto, cast en la notificación (n.invitacion_id::int = i.id)",
+     "SELECT i.id, n.ts, n.campo, n.valor_nuevo FROM b_inv i "
+     "JOIN b_notif n ON n.invitacion_id::integer = i.id WHERE i.id = ANY(CAST(:ids AS integer[]))"),
+    ("texto, cast en la invitación (n.invitacion_id = i.id::text)",
+     "SELECT i.id, n.ts, n.campo, n.valor_nuevo FROM b_inv i "
+     "JOIN b_notif n ON n.invitacion_id = i.id::text WHERE i.id = ANY(CAST(:ids AS integer[]))"),
+    ("entero (n.invitacion_ref = i.id)",
+     "SELECT i.id, n.ts, n.campo, n.valor_nuevo FROM b_inv i "
+     "JOIN b_notif n ON n.invitacion_ref = i.id WHERE i.id = ANY(CAST(:ids AS integer[]))"),
+]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de join notificaciones ↔ invitaciones")
+    ap.add_argument("--invitaciones", type=int, default=20000)
+    ap.add_argument("--por-invitacion", type=int, default=10)
+    ap.add_argument("--pagina", type=int, default=50, help="invitaciones por consulta")
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args()
+
+    rnd = random.Random(7)
+    with engine.connect() as conn, conn.begin():
+        for sql in SETUP:
+            conn.execute(text(sql), {"n": args.invitaciones, "k": args.por_invitacion})
+        sizes = conn.execute(text(
+            "SELECT c.relname, pg_relation_size(c.oid) FROM pg_index x "
+            "JOIN pg_class c ON c.oid = x.indexrelid WHERE x.indrelid = 'b_notif'::regclass "
+            "AND c.relname <> 'b_notif_pkey' ORDER BY 1")).all()
+        print(f"{args.invitaciones} invitaciones, {args.invitaciones * args.por_invitacion} notificaciones")
+        for name, size in sizes:
+            print(f"   índice {name}: {size / 1024:.0f} KiB")
+
+        for label, sql in QUERIES:
+            times = []
+            for _ in range(args.repeat):
+                ids = rnd.sample(range(1, args.invitaciones + 1), args.pagina)
+                t0 = time.perf_counter()
+                rows = conn.execute(text(sql), {"ids": ids}).all()
+                times.append((time.perf_counter() - t0) * 1000)
+            plan = conn.execute(text("EXPLAIN " + sql), {"ids": ids}).scalars().all()
+            uses = "con índice" if any("b_notif_invitacion" in p for p in plan) else "sin índice"
+            print(f"\n{label}\n   {len(rows)} filas, mediana {statistics.median(times):.2f} ms, "
+                  f"p95 {sorted(times)[int(len(times) * .95) - 1]:.2f} ms ({uses})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# bench/bench_parsing.py
+"""
+Parseo de fechas/horas: implementación anterior (copiada abajo tal cual estaba en
+app.py) contra parsing.py, valor por valor y por columna.
+
+Genera N textos con la mezcla de formatos que llega en importaciones (ISO,
+dd/mm/aaaa, dd/mm/aa, HH:MM, HH:MM:SS, '3 pm', basura) y verifica que ambos
+den el mismo resultado antes de medir. No usa la BD.
+
+    python bench/bench_parsing.py                  # 1,000,000 valores, ~2 años de fechas
+    python bench/bench_parsing.py -n 200000 --dias 20000   # casi todos distintos (LRU frío)
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsing
+
+# -----------------------------------------------------------------------------
+# Implementación anterior (app.py antes de parsing.py)
+# -----------------------------------------------------------------------------
+def old_parse_date_iso(s: Optional[str]) -> Optional[date]:
+    if not s:
+        return None
+    try:
+        return date.fromisoformat(s.strip())
+    except ValueError:
+        return None
+
+def old_parse_date_flexible(s: Optional[str]) -> Optional[date]:
+    if not s:
+        return None
+    s = s.strip()
+    d = old_parse_date_iso(s)
+    if d:
+        return d
+    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def old_parse_time_flexible(s: Optional[str]) -> Optional[dtime]:
+    if not s:
+        return None
+    v = s.strip().lower()
+    m = re.match(r"^(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?\s*(am|pm)$", v)
+    if m:
+        hh = int(m.group(1))
+        mm = int(m.group(2) or 0)
+        ss = int(m.group(3) or 0)
+        ampm = m.group(4)
+        if hh == 12:
+            hh = 0
+        if ampm == "pm":
+            hh += 12
+        return dtime(hh, mm, ss)
+    parts = v.split(":")
+    try:
+        if len(parts) == 2:
+            return dtime(int(parts[0]), int(parts[1]))
+        if len(parts) >= 3:
+            return dtime(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        return None
+    return None
+
+def _old_time_safe(s):
+    # la anterior lanzaba ValueError con '13 pm'; para comparar cuenta como None
+    try:
+        return old_parse_time_flexible(s)
+    except ValueError:
+        return None
+
+# -----------------------------------------------------------------------------
+# Datos
+# -----------------------------------------------------------------------------
+def sample(n: int, dias: int, seed: int = 7) -> tuple[list[str], list[str]]:
+    rnd = random.Random(seed)
+    base = date(2025, 1, 1)
+    fechas, horas = [], []
+    for _ in range(n):
+        d = base + timedelta(days=rnd.randrange(dias))
+        k = rnd.random()
+        if k < .45:
+            fechas.append(d.isoformat())
+        elif k < .75:
+            fechas.append(d.strftime("%d/%m/%Y"))
+        elif k < .95:
+            fechas.append(d.strftime("%d/%m/%y"))
+        elif k < .98:
+            fechas.append(f" {d.day}/{d.month}/{d.year} ")
+        else:
+            fechas.append(rnd.choice(["31/02/2026", "2026-13-01", "mañana", "1/1/1"]))
+
+        hh, mm = rnd.randrange(7, 22), rnd.choice((0, 15, 30, 45))
+        k = rnd.random()
+        if k < .6:
+            horas.append(f"{hh:02d}:{mm:02d}")
+        elif k < .75:
+            horas.append(f"{hh:02d}:{mm:02d}:00")
+        elif k < .95:
+            h12 = hh % 12 or 12
+            horas.append(f"{h12} {'pm' if hh >= 12 else 'am'}" if not mm
+                         else f"{h12}:{mm:02d} {'PM' if hh >= 12 else 'AM'}")
+        else:
+            horas.append(rnd.choice(["25:00", "13 pm", "mediodía", "10"]))
+    return fechas, horas
+
+def timed(label: str, fn, n: int, base: Optional[float] = None) -> float:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    extra = f"  x{base / dt:.1f}" if base else ""
+    print(f"   {label:<40} {dt:7.3f} s  {dt / n * 1e9:7.0f} ns/valor{extra}")
+    return dt
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de parseo de fechas/horas")
+    ap.add_argument("-n", type=int, default=1_000_000)
+    ap.add_argument("--dias", type=int, default=730, help="rango de fechas distintas")
+    args = ap.parse_args()
+
+    fechas, horas = sample(args.n, args.dias)
+    print(f"{args.n} fechas ({len(set(fechas))} distintas), {args.n} horas ({len(set(horas))} distintas)")
+
+    bad = [s for s in set(fechas) if old_parse_date_flexible(s) != parsing.parse_date_flexible(s)]
+    bad += [s for s in set(horas) if _old_time_safe(s) != parsing.parse_time_flexible(s)]
+    if bad:
+        sys.exit(f"❌ resultados distintos: {bad[:10]}")
+    print("✅ mismos resultados que la implementación anterior")
+
+    for label, values, old, new, batch, cached in (
+        ("fechas", fechas, old_parse_date_flexible, parsing.parse_date_flexible,
+         parsing.parse_dates, parsing._date),
+        ("horas", horas, _old_time_safe, parsing.parse_time_flexible,
+         parsing.parse_times, parsing._time),
+    ):
+        print(f"\n{label}")
+        base = timed("anterior, valor por valor", lambda: [old(s) for s in values], args.n)
+        cached.cache_clear()
+        timed("parsing, valor por valor (LRU)", lambda: [new(s) for s in values], args.n, base)
+        info = cached.cache_info()
+        print(f"   {'':<40} LRU: {info.hits} aciertos, {info.misses} fallos")
+        cached.cache_clear()
+        timed("parsing, columna completa", lambda: batch(values), args.n, base)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# bench/bench_serializers.py
+"""
+Costo por fila del payload de invitaciones:
+
+  - inv_to_dict sobre objetos ORM (detalle, con la relación persona), como estaba en app.py
+  - serializador por columnas anterior (date.today() y strftime por campo y fila)
+  - serializers.RowSerializer v1 y v2 (compacta)
+
+y de codificarlo a JSON (json stdlib contra orjson si está instalado). Filas
+sintéticas con las mismas llaves que app.inv_select; no consulta la BD (db.py sí
+pide DATABASE_URL para importar los modelos).
+
+    python bench/bench_serializers.py              # 10k invitaciones
+    python bench/bench_serializers.py -n 50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializers
+from db import Invitacion, Persona
+from serializers import fmt_date, fmt_time, fmt_dt
+
+COLS = ("id", "persona_id", "evento", "convoca_cargo", "convoca", "partido_politico", "fecha",
+        "hora", "municipio", "lugar", "estatus", "asignado_a", "rol", "observaciones",
+        "fecha_asignacion", "ultima_modificacion", "modificado_por", "archivo_url",
+        "archivo_nombre", "archivo_mime", "archivo_tamano", "archivo_ts", "version", "persona_nombre")
+FakeRow = namedtuple("FakeRow", COLS)
+
+# -----------------------------------------------------------------------------
+# Implementaciones anteriores (app.py antes de serializers.py)
+# -----------------------------------------------------------------------------
+def old_inv_to_dict(inv: Invitacion) -> dict:
+    dias = (inv.fecha - date.today()).days if inv.fecha else None
+    asignado_nombre = (inv.persona.nombre if getattr(inv, "persona", None) and inv.persona else None) \
+                      or (inv.asignado_a or "")
+    return {
+        "ID": inv.id, "PersonaID": inv.persona_id, "Evento": inv.evento or "",
+        "Convoca Cargo": inv.convoca_cargo or "", "Convoca": inv.convoca or "",
+        "Partido Político": inv.partido_politico or "",
+        "Fecha": inv.fecha.isoformat() if inv.fecha else None,
+        "Hora": inv.hora.strftime("%H:%M") if inv.hora else None,
+        "FechaISO": inv.fecha.isoformat() if inv.fecha else None,
+        "HoraISO": inv.hora.strftime("%H:%M") if inv.hora else None,
+        "FechaFmt": fmt_date(inv.fecha), "HoraFmt": fmt_time(inv.hora),
+        "Municipio/Dependencia": inv.municipio or "", "Lugar": inv.lugar or "",
+        "Estatus": inv.estatus or "Pendiente", "Asignado A": asignado_nombre,
+        "PersonaNombre": (inv.persona.nombre if inv.persona else None),
+        "Rol": inv.rol or "", "Observaciones": inv.observaciones or "",
+        "Fecha Asignación": fmt_dt(inv.fecha_asignacion),
+        "Última Modificación": fmt_dt(inv.ultima_modificacion),
+        "Modificado Por": inv.modificado_por or "",
+        "ArchivoURL": inv.archivo_url or "", "ArchivoNombre": inv.archivo_nombre or "",
+        "ArchivoMime": inv.archivo_mime or "", "ArchivoTamano": inv.archivo_tamano or 0,
+        "ArchivoTS": fmt_dt(inv.archivo_ts), "DiasParaEvento": dias,
+    }
+
+def _iso(d):
+    return d.isoformat() if d else None
+
+def _hhmm(t):
+    return t.strftime("%H:%M") if t else None
+
+OLD_FIELDS = {
+    "ID": lambda r: r.id, "PersonaID": lambda r: r.persona_id,
+    "Evento": lambda r: r.evento or "", "Convoca Cargo": lambda r: r.convoca_cargo or "",
+    "Convoca": lambda r: r.convoca or "", "Partido Político": lambda r: r.partido_politico or "",
+    "Fecha": lambda r: _iso(r.fecha), "Hora": lambda r: _hhmm(r.hora),
+    "FechaISO": lambda r: _iso(r.fecha), "HoraISO": lambda r: _hhmm(r.hora),
+    "FechaFmt": lambda r: fmt_date(r.fecha), "HoraFmt": lambda r: fmt_time(r.hora),
+    "Municipio/Dependencia": lambda r: r.municipio or "", "Lugar": lambda r: r.lugar or "",
+    "Estatus": lambda r: r.estatus or "Pendiente",
+    "Asignado A": lambda r: r.persona_nombre or r.asignado_a or "",
+    "PersonaNombre": lambda r: r.persona_nombre, "Rol": lambda r: r.rol or "",
+    "Observaciones": lambda r: r.observaciones or "",
+    "Fecha Asignación": lambda r: fmt_dt(r.fecha_asignacion),
+    "Última Modificación": lambda r: fmt_dt(r.ultima_modificacion),
+    "Modificado Por": lambda r: r.modificado_por or "",
+    "ArchivoURL": lambda r: r.archivo_url or "", "ArchivoNombre": lambda r: r.archivo_nombre or "",
+    "ArchivoMime": lambda r: r.archivo_mime or "", "ArchivoTamano": lambda r: r.archivo_tamano or 0,
+    "ArchivoTS": lambda r: fmt_dt(r.archivo_ts),
+    "DiasParaEvento": lambda r: (r.fecha - date.today()).days if r.fecha else None,
+}
+
+def old_row_serializer(fields):
+    getters = [(f, OLD_FIELDS[f]) for f in fields]
+    return lambda r: {f: g(r) for f, g in getters}
+
+def old_dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+# -----------------------------------------------------------------------------
+# Datos
+# -----------------------------------------------------------------------------
+def sample(n: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    today = date.today()
+    personas = [f"Persona {i}" for i in range(300)]
+    rows = []
+    for i in range(n):
+        fecha = today + timedelta(days=rnd.randrange(-180, 180))
+        asignada = rnd.random() < .6
+        nombre = rnd.choice(personas) if asignada else None
+        mod = datetime(2026, 1, 1) + timedelta(seconds=rnd.randrange(20_000_000))
+        rows.append(FakeRow(
+            i + 1, rnd.randrange(1, 300) if asignada else None, f"Evento {i} en plaza",
+            rnd.choice(["Diputado(a)", "Presidente(a)", "Senador(a)"]), f"Convoca {i % 500}",
+            rnd.choice(["", "PRI", "PAN", "MORENA"]), fecha,
+            dtime(rnd.randrange(8, 21), rnd.choice((0, 30))), "Toluca", "Auditorio municipal",
+            rnd.choice(["Pendiente", "Confirmado", "Sustituido", "Cancelado"]), nombre,
+            "Diputado" if asignada else None, "obs " * rnd.randrange(0, 10),
+            mod if asignada else None, mod, "admin", "", "", "", 0, None, rnd.randrange(1, 20), nombre))
+    return rows
+
+def to_orm(r) -> Invitacion:
+    inv = Invitacion(**{c: getattr(r, c) for c in COLS if c != "persona_nombre"})
+    if r.persona_nombre:
+        inv.persona = Persona(id=r.persona_id, nombre=r.persona_nombre)
+    return inv
+
+def timed(label: str, fn, n: int, repeat: int, base=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    extra = f"  x{base / best:.1f}" if base else ""
+    print(f"   {label:<44} {best * 1000:8.1f} ms  {best / n * 1e6:6.2f} µs/fila{extra}")
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark del serializador de invitaciones")
+    ap.add_argument("-n", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=3, help="se reporta la mejor corrida")
+    args = ap.parse_args()
+
+    rows = sample(args.n)
+    objs = [to_orm(r) for r in rows]
+    v1, v2 = serializers.default_fields(1), serializers.default_fields(2)
+    print(f"{args.n} invitaciones, {len(v1)} campos (v1) / {len(v2)} (v2); "
+          f"orjson {'sí' if serializers.orjson else 'no instalado'}")
+
+    # las anteriores no conocían "Version" (concurrencia optimista): se comparan los campos en común
+    legacy = [f for f in v1 if f in OLD_FIELDS]
+    old = old_row_serializer(legacy)
+    new = serializers.row_serializer(legacy)
+    if any(old(r) != new(r) for r in rows) or any(old_inv_to_dict(o) != new(r) for o, r in zip(objs, rows)):
+        sys.exit("❌ el serializador nuevo no da el mismo payload")
+    print("✅ mismo payload que las implementaciones anteriores")
+
+    print("\ndict por fila")
+    base = timed("inv_to_dict (ORM + persona)", lambda: [old_inv_to_dict(o) for o in objs], args.n, args.repeat)
+    timed("por columnas, anterior", lambda: [old(r) for r in rows], args.n, args.repeat, base)
+    # uno nuevo por corrida, como en un request (memo de fechas vacío al empezar)
+    timed("RowSerializer v1", lambda: list(map(serializers.row_serializer(v1), rows)),
+          args.n, args.repeat, base)
+    timed("RowSerializer v2 (compacta)", lambda: list(map(serializers.row_serializer(v2), rows)),
+          args.n, args.repeat, base)
+
+    print("\ndict + JSON (arreglo completo en streaming)")
+    def encode(ser, dumps):
+        return lambda: sum(len(dumps(d)) for d in map(ser(), rows))
+    base = timed("anterior + json", encode(lambda: old, old_dumps), args.n, args.repeat)
+    timed("v1 + serializers.dumps", encode(lambda: serializers.row_serializer(v1), serializers.dumps),
+          args.n, args.repeat, base)
+    timed("v2 + serializers.dumps", encode(lambda: serializers.row_serializer(v2), serializers.dumps),
+          args.n, args.repeat, base)
+    size1 = sum(len(serializers.dumps(d).encode()) for d in map(serializers.row_serializer(v1), rows))
+    size2 = sum(len(serializers.dumps(d).encode()) for d in map(serializers.row_serializer(v2), rows))
+    print(f"\n   bytes: v1 {size1 / 1024:.0f} KiB, v2 {size2 / 1024:.0f} KiB ({size2 / size1:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# bench/load_test.py
+"""
+Prueba de carga del tablero con distintas configuraciones de pool (db.py).
+
+Por cada configuración levanta gunicorn (gunicorn.conf.py) con esas variables de
+entorno, le pega con N clientes concurrentes durante S segundos a una mezcla de
+lecturas del tablero y reporta req/s, latencias y la espera por conexión del pool
+(leída de /metrics: db_pool_wait_seconds). Usa la BD de DATABASE_URL tal cual: correr
+contra una PostgreSQL local con datos (p.ej. después de importar un XLSX).
+
+    python bench/load_test.py                                 # configuraciones por omisión
+    python bench/load_test.py --clients 48 --seconds 30
+    python bench/load_test.py --pgbouncer-url postgresql://app@127.0.0.1:6432/app
+    python bench/load_test.py --config "chico:DB_POOL_SIZE=2,DB_MAX_OVERFLOW=0"
+
+Configuraciones por omisión:
+    antes            pool 3 + 2, pre_ping (lo que tenía db.py)
+    por hilos        pool = GUNICORN_THREADS + 2, pre_ping
+    sin pre_ping     igual, sin la ida y vuelta extra por checkout
+    pgbouncer        solo con --pgbouncer-url (DB_PGBOUNCER=1, directo para LISTEN)
+
+Resultados (PostgreSQL 16 local por socket, 5000 invitaciones / 300 personas,
+2 workers x 8 hilos, 32 clientes, 15 s; 1 núcleo compartido por clientes, gunicorn
+y PostgreSQL, así que req/s topa en CPU y la diferencia se ve en la espera por pool):
+
+    configuración       req/s      p50      p95  espera pool   >5ms
+    antes                74.1    430ms    742ms     67.81 ms  44.5%
+    por hilos            71.7    408ms    856ms      0.81 ms   2.5%
+    sin pre_ping         70.0    527ms    919ms      0.29 ms   2.3%
+    modo pgbouncer       76.3    343ms    823ms      0.18 ms   1.8%
+
+"modo pgbouncer" = --config "modo pgbouncer:DB_PGBOUNCER=1" contra PostgreSQL directo
+(sin prepared statements, sin pre_ping): mide el lado de la app, no el pooler. Con
+PgBouncer real en modo transaction se corre con --pgbouncer-url; no hay medición
+aquí porque el binario no estaba disponible en la máquina de prueba.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOARD_FIELDS = "ID,Evento,Convoca,Fecha,FechaFmt,HoraFmt,Lugar,Estatus,Asignado A,DiasParaEvento"
+# (peso, ruta); {id} se reemplaza por una invitación existente
+MIX = [
+    (5, "/api/invitations?limit=200&fields=" + BOARD_FIELDS.replace(" ", "%20")),
+    (3, "/api/invitation/{id}?v=2"),
+    (2, "/api/invitations/search?q=evento&limit=50"),
+    (1, "/api/invitation/{id}/history?compact=1"),
+    (1, "/api/health/deep"),
+]
+
+DEFAULT_CONFIGS = [
+    ("antes", {"DB_POOL_SIZE": "3", "DB_MAX_OVERFLOW": "2", "DB_PRE_PING": "1"}),
+    ("por hilos", {"DB_PRE_PING": "1"}),
+    ("sin pre_ping", {"DB_PRE_PING": "0"}),
+]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def get(conn: http.client.HTTPConnection, path: str) -> tuple[int, bytes]:
+    conn.request("GET", path)
+    r = conn.getresponse()
+    return r.status, r.read()
+
+def wait_ready(port: int, timeout: float = 30) -> None:
+    t_end = time.time() + timeout
+    while time.time() < t_end:
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            if get(c, "/api/health")[0] == 200:
+                return
+        except OSError:
+            time.sleep(.3)
+    raise RuntimeError("gunicorn no respondió")
+
+def gunicorn_argv(port: int) -> list[str]:
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "app:app"]
+
+def start_server(port: int, env_extra: dict, workers: int, threads: int, log_path: str,
+                 argv: list[str] | None = None):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix="metrics-"), **env_extra)
+    for k in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_PRE_PING"):
+        if k not in env_extra:
+            env.pop(k, None)
+    log = open(log_path, "ab")
+    proc = subprocess.Popen(argv or gunicorn_argv(port), cwd=ROOT, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    return proc, log
+
+def pool_wait(port: int) -> tuple[float, float, float]:
+    """(esperas, segundos totales, fracción de esperas > 5 ms) según /metrics."""
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    text = get(c, "/metrics")[1].decode()
+    def val(name: str) -> float:
+        m = re.search(rf"^{re.escape(name)} ([0-9.e+]+)$", text, re.M)
+        return float(m.group(1)) if m else 0.0
+    n = val("db_pool_wait_seconds_count")
+    fast = val('db_pool_wait_seconds_bucket{le="0.005"}')
+    return n, val("db_pool_wait_seconds_sum"), (1 - fast / n) if n else 0.0
+
+def run_load(port: int, clients: int, seconds: float, ids: list[int]) -> dict:
+    paths = [p for w, p in MIX for _ in range(w)]
+    lat, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client(seed: int):
+        rnd = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine, bad = [], 0
+        while time.time() < stop:
+            path = rnd.choice(paths).replace("{id}", str(rnd.choice(ids)))
+            t0 = time.perf_counter()
+            try:
+                try:
+                    status, _ = get(conn, path)
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # gunicorn cerró el keep-alive ocioso: reconectar y reintentar una vez
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                    status, _ = get(conn, path)
+                if status >= 500:
+                    bad += 1
+            except (OSError, http.client.HTTPException):
+                bad += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            lat.extend(mine)
+            errors[0] += bad
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] * 1000 if lat else 0
+    return {"requests": len(lat), "errors": errors[0], "rps": len(lat) / seconds,
+            "p50": pct(.5), "p95": pct(.95), "p99": pct(.99),
+            "mean": statistics.fmean(lat) * 1000 if lat else 0}
+
+def parse_config(raw: str) -> tuple[str, dict]:
+    name, _, pairs = raw.partition(":")
+    env = dict(p.split("=", 1) for p in pairs.split(",") if p)
+    return name, env
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Prueba de carga por configuración de pool")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=15)
+    ap.add_argument("--warmup", type=float, default=2)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--config", action="append", help="nombre:VAR=VAL,VAR=VAL (reemplaza las de omisión)")
+    ap.add_argument("--pgbouncer-url", help="DATABASE_URL vía PgBouncer (modo transaction)")
+    ap.add_argument("--log", default=os.path.join(tempfile.gettempdir(), "load_test_gunicorn.log"))
+    args = ap.parse_args()
+
+    configs = [parse_config(c) for c in args.config] if args.config else list(DEFAULT_CONFIGS)
+    if args.pgbouncer_url:
+        direct = os.environ.get("DATABASE_URL") or os.environ.get("DB_URL", "")
+        configs.append(("pgbouncer", {"DATABASE_URL": args.pgbouncer_url, "DATABASE_DIRECT_URL": direct,
+                                      "DB_PGBOUNCER": "1"}))
+
+    print(f"{args.workers} workers x {args.threads} hilos, {args.clients} clientes, "
+          f"{args.seconds:.0f} s por configuración (log de gunicorn: {args.log})\n")
+    print(f"{'configuración':<16} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errores':>8}"
+          f" {'espera pool':>12} {'>5ms':>6}")
+    for name, env in configs:
+        port = free_port()
+        proc, log = start_server(port, env, args.workers, args.threads, args.log)
+        try:
+            wait_ready(port)
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            items = json.loads(get(c, "/api/invitations?limit=500&fields=ID")[1])["items"]
+            ids = [it["ID"] for it in items] or [1]
+            run_load(port, args.clients, args.warmup, ids)
+            n0, s0, _ = pool_wait(port)
+            r = run_load(port, args.clients, args.seconds, ids)
+            n1, s1, slow = pool_wait(port)
+            waits = n1 - n0
+            avg = (s1 - s0) / waits * 1000 if waits else 0
+            print(f"{name:<16} {r['rps']:8.1f} {r['p50']:7.1f}ms {r['p95']:7.1f}ms {r['p99']:7.1f}ms "
+                  f"{r['errors']:8d} {avg:9.2f} ms {slow:6.1%}")
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# cache.py
+"""
+Caché en proceso para lecturas agregadas (catálogo, contadores, stats).
+
+La validez la decide un contador en la BD (tabla version_datos) que sube con cada
+escritura. Así los workers de gunicorn comparten la misma noción de "datos sin
+cambios" sin compartir memoria: cada uno tiene su copia local, pero todas se
+invalidan con el mismo número de versión.
+
+El incremento NO va dentro de la transacción de la escritura: todas tocarían la misma
+fila y se formarían detrás de su lock hasta el commit. bump_data_version() solo lo
+anota en la sesión y, tras el commit, bump_now() lo aplica en una transacción corta
+aparte (un upsert). Entre el commit y el bump un lector puede guardar datos nuevos
+bajo la versión vieja; el bump los invalida enseguida.
+
+El bump corre cuando la sesión ya devolvió su conexión al pool (after_transaction_end)
+y toma esa misma: una escritura nunca ocupa dos conexiones a la vez, así el tamaño del
+pool (una por hilo, db.pool_settings) alcanza.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db import SessionLocal, VersionDatos, engine
+
+log = logging.getLogger("cache")
+
+DATA = "datos"   # ámbito general: cualquier escritura de personas/invitaciones
+
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))                  # segundos
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+# parámetros que no cambian la respuesta (cache-busters del front)
+IGNORED_ARGS = {"_ts"}
+
+# -----------------------------------------------------------------------------
+# Versión en BD
+# -----------------------------------------------------------------------------
+PENDING = "versiones_pendientes"   # llave en Session.info
+COMMITTED = "versiones_por_subir"  # ya con commit, esperando a que se suelte la conexión
+
+# hooks(conn, clave, versión) dentro de la transacción corta del bump
+# (feed.py: sella la bitácora de cambios con esa versión y manda el NOTIFY)
+BUMP_HOOKS: list = []
+
+def bump_data_version(db, clave: str = DATA) -> None:
+    """
+    Marca `clave` para subir de versión cuando `db` haga commit (si hace rollback, nada).
+    No toca version_datos dentro de la transacción de la escritura.
+    """
+    db.info.setdefault(PENDING, set()).add(clave)
+
+def bump_now(clave: str = DATA) -> int:
+    """
+    Sube la versión en su propia transacción y corre BUMP_HOOKS; regresa la nueva.
+    El lock de la fila dura solo este upsert + hooks, y ordena los bumps entre sí.
+    """
+    stmt = (pg_insert(VersionDatos)
+            .values(clave=clave, version=1)
+            .on_conflict_do_update(index_elements=[VersionDatos.clave],
+                                   set_={"version": VersionDatos.version + 1})
+            .returning(VersionDatos.version))
+    with engine.begin() as conn:
+        version = conn.execute(stmt).scalar_one()
+        for hook in BUMP_HOOKS:
+            hook(conn, clave, version)
+    return version
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_committed(session):
+    # un SAVEPOINT también dispara after_commit: solo cuenta el commit de la transacción raíz
+    if session.in_nested_transaction():
+        return
+    pending = session.info.pop(PENDING, None)
+    if pending:
+        session.info.setdefault(COMMITTED, set()).update(pending)
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _bump_after_commit(session, transaction):
+    # aquí la conexión de la sesión ya volvió al pool: bump_now() la reutiliza
+    if transaction.parent is not None:
+        return
+    for clave in sorted(session.info.pop(COMMITTED, ())):
+        try:
+            bump_now(clave)
+        except Exception:
+            # los datos ya se guardaron: el request no falla por esto. La caché se pone
+            # al día con el siguiente bump (o el TTL) y feed.py sella lo pendiente.
+            log.exception("no se pudo subir la versión %r tras el commit", clave)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING, None)
+
+def current_data_version(db, clave: str = DATA) -> int:
+    v = db.execute(select(VersionDatos.version).where(VersionDatos.clave == clave)).scalar()
+    return v or 0
+
+# -----------------------------------------------------------------------------
+# Caché LRU con TTL
+# -----------------------------------------------------------------------------
+class VersionedCache:
+    """LRU acotado por número de entradas; una entrada vale solo para su versión y su TTL."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            ver, expires, value = entry
+            if ver != version or expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, version, value) -> None:
+        with self._lock:
+            self._data[key] = (version, time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+response_cache = VersionedCache()
+
+def cache_key(name: str, items) -> tuple:
+    """Llave a partir de los pares (parámetro, valor) de la petición (Flask o asgi.py)."""
+    args = tuple(sorted((k, v) for k, v in items if k not in IGNORED_ARGS))
+    # la fecha entra en la llave: hay respuestas que dependen de "hoy" (p.ej. próximas)
+    return (name, args, date.today().isoformat())
+
+def etag_for(key: tuple, version: int) -> str:
+    return hashlib.sha1(repr((key, version)).encode()).hexdigest()[:24]
+
+def _request_key(name: str) -> tuple:
+    return cache_key(name, request.args.items(multi=True))
+
+def cached_json(name: str, clave: str = DATA):
+    """
+    Decorador para GETs que regresan JSON derivado de la BD:
+      - ETag = hash(llave de la petición, versión) -> 304 si el cliente ya lo tiene
+      - cuerpo servido desde memoria mientras la versión no cambie (y no venza el TTL)
+    """
+    def deco(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # la versión se lee ANTES que los datos: si una escritura se cuela en medio,
+            # lo peor es guardar datos nuevos bajo la versión vieja (se descartan al leer la nueva)
+            db = SessionLocal()
+            try:
+                version = current_data_version(db, clave)
+            finally:
+                db.close()
+
+            key = _request_key(name)
+            etag = etag_for(key, version)
+            if request.if_none_match.contains(etag):
+                resp = make_response("", 304)
+                resp.set_etag(etag)
+                return resp
+
+            hit = response_cache.get(key, version)
+            if hit is None:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                hit = (resp.get_data(), resp.mimetype)
+                response_cache.put(key, version, hit)
+
+            body, mimetype = hit
+            resp = make_response(body)
+            resp.mimetype = mimetype
+            resp.set_etag(etag)
+            return resp
+        return wrapper
+    return deco
@@ -0,0 +1,154 @@
+# conflicts.py
+"""
+Motor único de conflictos de agenda (assign, reassign, check-conflict, bulk).
+
+Las invitaciones activas de cada (persona_id, fecha) se guardan en una lista ordenada
+por segundo del día; "¿qué tiene X alrededor de D/T?" se responde con bisect sobre
+esa lista (O(log n) + coincidencias) y se clasifica con ventanas de severidad.
+"""
+import logging
+import os
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import date, time as dtime
+from typing import Iterable, Optional
+
+from sqlalchemy import select, tuple_
+
+from db import Invitacion
+
+log = logging.getLogger("conflicts")
+
+# Estatus en los que la persona asignada sí asiste
+ESTATUS_ACTIVOS = ("Confirmado", "Sustituido")
+
+DEFAULT_WINDOWS = "hard:0,tight1h:60,tight2h:120"
+
+def _parse_windows(raw: str) -> tuple:
+    """
+    'hard:0,tight1h:60,tight2h:120' -> (("hard", 0), ...) de más a menos severo.
+    ValueError si algún tramo no es nombre:minutos, se repite un nombre o los minutos
+    no van en orden creciente.
+    """
+    out = []
+    for part in raw.split(","):
+        name, _, mins = part.strip().partition(":")
+        if not name or name == "none" or not mins.strip().isdigit():
+            raise ValueError(f"tramo inválido {part.strip()!r}")
+        if out and (name in dict(out) or int(mins) <= out[-1][1]):
+            raise ValueError(f"{name!r} repetido o fuera de orden")
+        out.append((name, int(mins)))
+    return tuple(out)
+
+def _windows_from_env() -> tuple:
+    # un valor mal escrito no debe tumbar los workers al importar: se avisa y se usan las de omisión
+    raw = os.getenv("CONFLICT_WINDOWS") or DEFAULT_WINDOWS
+    try:
+        return _parse_windows(raw)
+    except ValueError as e:
+        log.warning("CONFLICT_WINDOWS=%r inválido (%s); se usa %s", raw, e, DEFAULT_WINDOWS)
+        return _parse_windows(DEFAULT_WINDOWS)
+
+# Ventanas en minutos: una coincidencia toma el primer nivel cuya ventana la contiene
+SEVERITY_WINDOWS = _windows_from_env()
+
+Entry = namedtuple("Entry", "id persona_id fecha hora evento estatus lugar")
+Conflict = namedtuple("Conflict", "level entries")   # level: "none" | nombre de ventana
+
+NO_CONFLICT = Conflict("none", [])
+
+def _secs(t: dtime) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+class ScheduleIndex:
+    """Agenda en memoria por (persona_id, fecha), ordenada por hora."""
+
+    def __init__(self, windows: tuple = SEVERITY_WINDOWS):
+        self.windows = windows
+        self.rank = {name: i for i, (name, _) in enumerate(windows)}
+        self.span = max(m for _, m in windows)
+        self._slots: dict = {}     # (persona_id, fecha) -> [(segundos, id), ...] ordenada
+        self._entries: dict = {}   # id -> Entry
+
+    def add(self, e: Entry) -> None:
+        # sin persona/fecha/hora no es comparable: nunca genera conflicto
+        if not (e.persona_id and e.fecha and e.hora):
+            return
+        self.discard(e.id)
+        insort(self._slots.setdefault((e.persona_id, e.fecha), []), (_secs(e.hora), e.id))
+        self._entries[e.id] = e
+
+    def discard(self, inv_id: int) -> None:
+        e = self._entries.pop(inv_id, None)
+        if e is None:
+            return
+        slot = self._slots[(e.persona_id, e.fecha)]
+        del slot[bisect_left(slot, (_secs(e.hora), e.id))]
+
+    def level_for(self, minutes: int) -> str:
+        for name, limit in self.windows:
+            if minutes <= limit:
+                return name
+        return "none"
+
+    def check(self, persona_id: int, fecha: date, hora: dtime,
+              exclude_id: Optional[int] = None) -> Conflict:
+        slot = self._slots.get((persona_id, fecha))
+        if not slot or hora is None:
+            return NO_CONFLICT
+
+        s = _secs(hora)
+        reach = (self.span + 1) * 60            # |Δ| // 60 <= span  <=>  |Δ| < reach
+        lo = bisect_left(slot, (s - reach + 1,))
+        hi = bisect_left(slot, (s + reach,))
+
+        level, entries = "none", []
+        for secs, inv_id in slot[lo:hi]:
+            if inv_id == exclude_id:
+                continue
+            lev = self.level_for(abs(secs - s) // 60)
+            if lev == "none":
+                continue
+            entries.append(self._entries[inv_id])
+            if level == "none" or self.rank[lev] < self.rank[level]:
+                level = lev
+        return Conflict(level, entries)
+
+
+def load_index(db, keys: Iterable[tuple], windows: tuple = SEVERITY_WINDOWS) -> ScheduleIndex:
+    """Carga en UNA consulta la agenda activa de todos los (persona_id, fecha) pedidos."""
+    keys = {(pid, f) for pid, f in keys if pid and f}
+    idx = ScheduleIndex(windows)
+    if not keys:
+        return idx
+
+    stmt = (select(Invitacion.id, Invitacion.persona_id, Invitacion.fecha, Invitacion.hora,
+                   Invitacion.evento, Invitacion.estatus, Invitacion.lugar)
+            .where(Invitacion.estatus.in_(ESTATUS_ACTIVOS))
+            .where(Invitacion.hora.isnot(None)))
+    if len(keys) == 1:
+        pid, f = next(iter(keys))
+        stmt = stmt.where(Invitacion.persona_id == pid, Invitacion.fecha == f)
+    else:
+        stmt = stmt.where(tuple_(Invitacion.persona_id, Invitacion.fecha).in_(list(keys)))
+
+    for r in db.execute(stmt):
+        idx.add(Entry(*r))
+    return idx
+
+def check_conflict(db, persona_id: int, fecha: Optional[date], hora: Optional[dtime],
+                   exclude_id: Optional[int] = None) -> Conflict:
+    """Conflictos de una candidata; sin fecha/hora no hay nada que comparar."""
+    if not (persona_id and fecha and hora):
+        return NO_CONFLICT
+    return load_index(db, [(persona_id, fecha)]).check(persona_id, fecha, hora, exclude_id)
+
+def check_many(db, candidates: list[tuple]) -> list[Conflict]:
+    """
+    Lote de (persona_id, fecha, hora, exclude_id) con un solo viaje a la BD.
+    Cada candidata se evalúa contra lo ya guardado, no contra las otras del lote.
+    """
+    idx = load_index(db, [(c[0], c[1]) for c in candidates])
+    return [idx.check(pid, f, h, ex) if (pid and f and h) else NO_CONFLICT
+            for pid, f, h, ex in candidates]
@@ -1,11 +1,14 @@
 # db.py
 import os
+import time
 from datetime import datetime
 from sqlalchemy import (
-    create_engine, Column, String, Integer, Date, Time, Text,
+    create_engine, Column, String, Integer, BigInteger, Date, Time, Text,
     Boolean, DateTime, ForeignKey, Index
 )
+from sqlalchemy import text
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.pool import NullPool, QueuePool
 
 # ============================
 # CONFIG: toma DATABASE_URL (Render) o DB_URL como alias
@@ -13,24 +16,92 @@ raw = os.getenv("DATABASE_URL") or os.getenv("DB_URL")
 if not raw:
     raise RuntimeError("DATABASE_URL/DB_URL no definida")
 
-# Fuerza el driver psycopg3 en la URL de SQLAlchemy
-# postgres://... | postgresql://...  -> postgresql+psycopg://...
-if raw.startswith("postgres://"):
-    DB_URL = raw.replace("postgres://", "postgresql+psycopg://", 1)
-elif raw.startswith("postgresql://"):
-    DB_URL = raw.replace("postgresql://", "postgresql+psycopg://", 1)
-else:
-    DB_URL = raw
+def _psycopg_url(raw: str) -> str:
+    """Fuerza el driver psycopg3: postgres://... | postgresql://... -> postgresql+psycopg://..."""
+    if raw.startswith("postgres://"):
+        return raw.replace("postgres://", "postgresql+psycopg://", 1)
+    if raw.startswith("postgresql://"):
+        return raw.replace("postgresql://", "postgresql+psycopg://", 1)
+    return raw
+
+DB_URL = _psycopg_url(raw)
+
+# TLS seguro para Render PG (DB_SSLMODE=disable solo para una BD local)
+CONNECT_ARGS = {"sslmode": os.getenv("DB_SSLMODE", "require")}
+
+# ============================
+# PgBouncer en modo transaction (DB_PGBOUNCER=1): cada transacción puede caer en otra
+# conexión del servidor, así que nada de estado de sesión:
+#   - sin prepared statements del lado del servidor (psycopg3: prepare_threshold=None)
+#   - LISTEN del feed, advisory lock y CREATE INDEX CONCURRENTLY de las migraciones van
+#     por DATABASE_DIRECT_URL (directo a PostgreSQL); SET LOCAL / set_config(..., true)
+#     sí funcionan porque viven dentro de la transacción
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+raw_direct = os.getenv("DATABASE_DIRECT_URL")
+DIRECT_DB_URL = _psycopg_url(raw_direct) if raw_direct else DB_URL
+
+ENGINE_CONNECT_ARGS = dict(CONNECT_ARGS, prepare_threshold=None) if DB_PGBOUNCER else CONNECT_ARGS
+
+# ============================
+# POOL: uno por proceso (cada worker de gunicorn tiene el suyo)
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "2"))
+WEB_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+
+def pool_settings() -> dict:
+    """
+    Por omisión una conexión por hilo del worker (WEB_THREADS) + 2 de overflow para los
+    hilos de fondo (feed), así ningún request hace cola en el pool. El bump de versión
+    tras el commit (cache.py) corre cuando la sesión ya soltó su conexión y reutiliza
+    esa, así que una escritura no necesita una segunda. DB_MAX_CONNECTIONS
+    reparte un tope total entre los WEB_WORKERS procesos; DB_POOL_SIZE/DB_MAX_OVERFLOW
+    fijan los valores a mano.
+
+    pre_ping cuesta una ida y vuelta por checkout; con PgBouncer (conexión local y
+    larga) va apagado por omisión y una conexión muerta solo tumba un request.
+    """
+    size = int(os.getenv("DB_POOL_SIZE") or WEB_THREADS)
+    overflow = int(os.getenv("DB_MAX_OVERFLOW") or 2)
+    budget = int(os.getenv("DB_MAX_CONNECTIONS") or 0)
+    if budget:
+        per_worker = max(1, budget // max(1, WEB_WORKERS))
+        size = min(size, per_worker)
+        overflow = max(0, min(overflow, per_worker - size))
+    return {
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT") or 30),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE") or 1800),
+        "pool_pre_ping": os.getenv("DB_PRE_PING", "0" if DB_PGBOUNCER else "1") == "1",
+    }
+
+POOL_SETTINGS = pool_settings()
+
+# callbacks(segundos) por cada checkout del pool (metrics.py: histograma; profiling.py: log)
+POOL_WAIT_HOOKS: list = []
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cada checkout: espera por una conexión libre (+ connect si es nueva)."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            dt = time.perf_counter() - t0
+            for hook in POOL_WAIT_HOOKS:
+                hook(dt)
 
 engine = create_engine(
     DB_URL,
-    pool_pre_ping=True,
-    pool_size=3,
-    max_overflow=2,
-    pool_recycle=1800,
-    connect_args={"sslmode": "require"},  # TLS seguro para Render PG
+    poolclass=TimedQueuePool,
+    connect_args=ENGINE_CONNECT_ARGS,
+    **POOL_SETTINGS,
 )
 
+# Sin PgBouncer es el mismo engine; con PgBouncer, conexiones directas sin pool (uso esporádico)
+direct_engine = (engine if DIRECT_DB_URL == DB_URL
+                 else create_engine(DIRECT_DB_URL, poolclass=NullPool, connect_args=CONNECT_ARGS))
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 # -------------------------------------------------------------------
@@ -48,8 +119,8 @@ class Persona(Base):
     unidad_region = Column(String)
     activo        = Column(Boolean, default=True)
 
-    # relación con invitaciones (1:N)
-    invitaciones  = relationship("Invitacion", back_populates="persona", lazy="selectin")
+    # relación con invitaciones (1:N). Carga perezosa: el catálogo no debe traer el historial.
+    invitaciones  = relationship("Invitacion", back_populates="persona", lazy="select")
 
     __table_args__ = (
         Index("idx_personas_nombre", "nombre"),
@@ -92,20 +163,37 @@ class Invitacion(Base):
     archivo_tamano       = Column(Integer)     # bytes
     archivo_ts           = Column(DateTime)    # cuándo se subió
 
+    # Concurrencia optimista (migrations/m0008): el ORM escribe UPDATE/DELETE ... WHERE id = ?
+    # AND version = ? y la incrementa; si otro commit se adelantó, el flush lanza StaleDataError
+    version              = Column(Integer, nullable=False, default=1, server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": version}
+
     __table_args__ = (
         Index("idx_invitaciones_estatus", "estatus"),
         Index("idx_invitaciones_fecha", "fecha"),
         Index("idx_invitaciones_persona", "persona_id"),
+        # conteo de referencias de adjuntos (storage.py)
+        Index("idx_invitaciones_archivo_url", "archivo_url",
+              postgresql_where=text("archivo_url IS NOT NULL")),
     )
 
 
 class Notificacion(Base):
+    """
+    Particionada por mes sobre ts (partitions.py, migrations/m0007): la PK incluye ts
+    porque PostgreSQL exige la llave de partición en los índices únicos.
+    """
     __tablename__ = "notificaciones"
 
-    id                = Column(Integer, primary_key=True)
-    ts                = Column(DateTime, default=datetime.utcnow)
+    id                = Column(Integer, primary_key=True, autoincrement=True)
+    ts                = Column(DateTime, primary_key=True, default=datetime.utcnow,
+                               server_default=text("localtimestamp"))
 
-    # vínculo lógico a Invitacion (guardado como texto por compatibilidad)
+    # vínculo a Invitacion. invitacion_ref es el FK real (joins por entero, índice chico);
+    # invitacion_id (texto) se sigue escribiendo mientras el bot lo lea (migrations/m0005)
+    invitacion_ref    = Column(Integer, ForeignKey("invitaciones.id", ondelete="SET NULL",
+                                                   name="fk_notif_invitacion"), nullable=True)
     invitacion_id     = Column(String, index=True)
 
     # Snapshot principal
@@ -130,27 +218,77 @@ class Notificacion(Base):
     enviado           = Column(Boolean, default=False)
     enviado_ts        = Column(DateTime, nullable=True)
 
+    # Outbox: lote reclamado por una instancia del bot y hasta cuándo (ver outbox.py)
+    lease_owner       = Column(String, nullable=True)
+    lease_until       = Column(DateTime, nullable=True)
+
     __table_args__ = (
         Index("idx_notif_enviado", "enviado"),
         Index("idx_notif_ts", "ts"),
         Index("idx_notif_inv_id", "invitacion_id"),
+        # historial por invitación (history.py); también sirve al ON DELETE SET NULL del FK
+        Index("idx_notif_inv_ref_ts", "invitacion_ref", "ts", "id"),
+        # solo las pendientes, en el orden en que se reclaman
+        Index("idx_notif_pendientes", "ts", "id", postgresql_where=text("enviado = false")),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+
+class VersionDatos(Base):
+    """Contador de versión por ámbito; lo incrementan las escrituras (ver cache.py)."""
+    __tablename__ = "version_datos"
+
+    clave   = Column(String, primary_key=True)          # "datos", ...
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class CambioInvitacion(Base):
+    """Bitácora corta de cambios para el feed SSE (reanudar con ?since=<version>)."""
+    __tablename__ = "cambios_invitaciones"
+
+    id            = Column(BigInteger, primary_key=True)
+    # version_datos["datos"] del bump que siguió al commit; NULL hasta entonces (feed.py)
+    version       = Column(BigInteger, nullable=True)
+    invitacion_id = Column(Integer, nullable=False)
+    op            = Column(String, nullable=False)       # created / updated / deleted
+    ts            = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_cambios_version", "version"),
+        Index("idx_cambios_ts", "ts"),
+        Index("idx_cambios_sin_sello", "id", postgresql_where=text("version IS NULL")),
+    )
+
+
+class EstadisticaDiaria(Base):
+    """
+    Rollup de invitaciones por fecha × estatus × municipio × partido (ver rollups.py).
+    Lo mantienen triggers de invitaciones; los KPIs suman aquí en vez de contar filas.
+    """
+    __tablename__ = "invitaciones_daily_stats"
+
+    id        = Column(BigInteger, primary_key=True)
+    fecha     = Column(Date)                               # NULL = invitaciones sin fecha
+    estatus   = Column(String, nullable=False)             # NULL en invitaciones -> "Pendiente"
+    municipio = Column(Text, nullable=False, default="")
+    partido   = Column(String, nullable=False, default="")
+    total     = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("idx_daily_stats_fecha", "fecha"),
     )
 
 
 # -------------------------------------------------------------------
-# Sugerencias de índices/constraints adicionales (opcionales)
+# Índices/constraints fuera del modelo: migrations/ (python migrate.py)
 # -------------------------------------------------------------------
-# 1) Anti “doble booking”: misma persona + misma fecha + misma hora para estados activos.
-#    Esto es un índice único parcial en SQL (no se define aquí automáticamente).
-#
-#   CREATE UNIQUE INDEX IF NOT EXISTS uq_inv_persona_fecha_hora
-#   ON invitaciones (persona_id, fecha, hora)
-#   WHERE estatus IN ('Confirmado','Sustituido');
-#
-# 2) Si en algún momento manejas intervalos (inicio/fin), conviene EXCLUDE USING gist.
+# - uq_inv_persona_fecha_hora: anti “doble booking” (índice único parcial en
+#   estatus activos), idx_inv_persona_fecha y los del orden del tablero: m0004.
+# - Si en algún momento manejas intervalos (inicio/fin), conviene EXCLUDE USING gist.
 # -------------------------------------------------------------------
 
 __all__ = [
     "engine", "SessionLocal", "Base",
-    "Persona", "Invitacion", "Notificacion",
+    "Persona", "Invitacion", "Notificacion", "VersionDatos", "CambioInvitacion",
+    "EstadisticaDiaria",
 ]
@@ -0,0 +1,257 @@
+# feed.py
+"""
+Feed de cambios de invitaciones para el tablero (Server-Sent Events).
+
+Escritura: publish_changes() anota los ids en cambios_invitaciones dentro de la
+transacción de la escritura, todavía sin versión (sin tocar ninguna fila compartida).
+Tras el commit, el bump de la versión de datos (cache.bump_now, transacción corta)
+sella esas filas con la versión nueva y hace pg_notify: los sellos van en el orden
+de los bumps, así que un lector con ?since=N nunca se salta un commit, y el aviso
+solo sale si el commit se hizo. Si el bump falla, el hilo LISTEN barre lo que quedó
+sin sellar (STAMP_GRACE).
+
+Lectura: un ChangeHub por proceso escucha el canal con una conexión dedicada, lee
+de la bitácora lo nuevo (una consulta por aviso, no una por cliente) y reparte
+los eventos a las colas de los clientes conectados.
+
+Con workers gthread cada stream ocupa un hilo, así que se limitan los clientes
+por proceso (SSE_MAX_CLIENTS) y cada conexión dura SSE_MAX_SECONDS: el navegador
+se reconecta solo con Last-Event-ID y no hay hilos atrapados por clientes ociosos.
+En asgi.py los streams son corrutinas (AsyncSubscriber) y el tope es SSE_ASYNC_MAX_CLIENTS.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import psycopg
+from sqlalchemy import select, insert, update, delete, func
+
+from cache import BUMP_HOOKS, DATA, bump_data_version, bump_now
+from serializers import dumps
+from db import SessionLocal, CambioInvitacion, DIRECT_DB_URL, CONNECT_ARGS
+
+log = logging.getLogger("feed")
+
+CHANNEL = "invitaciones_cambios"
+
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "4"))      # por proceso (de 8 hilos)
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", "55"))     # luego el cliente se reconecta
+SSE_RETRY_MS    = int(os.getenv("SSE_RETRY_MS", "2000"))
+SSE_ASYNC_MAX_CLIENTS = int(os.getenv("SSE_ASYNC_MAX_CLIENTS", "1000"))   # por proceso, asgi.py
+SSE_ASYNC_MAX_SECONDS = int(os.getenv("SSE_ASYNC_MAX_SECONDS", "600"))
+HEARTBEAT       = 15                                          # segundos entre pings
+SAFETY_POLL     = 30                                          # relee la bitácora aunque no haya avisos
+RETENTION_DAYS  = int(os.getenv("CAMBIOS_RETENTION_DAYS", "7"))
+STAMP_GRACE     = 10                                          # s sin sellar antes de barrerlas
+
+RESET = "reset"    # el cliente debe recargar todo (hueco en la bitácora / cola desbordada)
+QUEUE_MAX = 1000   # lotes pendientes por cliente antes de mandarle RESET
+
+# -----------------------------------------------------------------------------
+# Escritura
+# -----------------------------------------------------------------------------
+def publish_changes(db, op: str, inv_ids) -> None:
+    """Registra `op` para cada invitación (sin versión) y marca la versión de datos para el commit."""
+    bump_data_version(db)
+    ids = sorted({int(i) for i in inv_ids if i})
+    if ids:
+        ts = datetime.utcnow()
+        db.execute(insert(CambioInvitacion),
+                   [{"version": None, "invitacion_id": i, "op": op, "ts": ts} for i in ids])
+
+def _stamp_changes(conn, clave: str, version: int) -> None:
+    """BUMP_HOOKS: lo pendiente de la bitácora recibe la versión recién subida."""
+    if clave != DATA:
+        return
+    n = conn.execute(update(CambioInvitacion).where(CambioInvitacion.version.is_(None))
+                     .values(version=version)).rowcount
+    if n:
+        conn.execute(select(func.pg_notify(CHANNEL, str(version))))
+
+BUMP_HOOKS.append(_stamp_changes)
+
+# -----------------------------------------------------------------------------
+# Lectura
+# -----------------------------------------------------------------------------
+def events_since(db, since: int, fetch: Callable) -> list[dict]:
+    """
+    Eventos posteriores a `since`, uno por invitación (el último), en orden de versión.
+    `fetch(db, ids) -> {id: payload}`; si ya no existe, el evento sale como deleted.
+    """
+    rows = db.execute(select(CambioInvitacion.version, CambioInvitacion.invitacion_id, CambioInvitacion.op)
+                      .where(CambioInvitacion.version > since)
+                      .order_by(CambioInvitacion.version, CambioInvitacion.id)).all()
+    latest: dict = {}
+    for v, inv_id, op in rows:
+        prev = latest.get(inv_id)
+        if prev and prev[1] == "created" and op == "updated":
+            op = "created"
+        latest[inv_id] = (v, op)
+
+    payloads = fetch(db, [i for i, (_, op) in latest.items() if op != "deleted"])
+    events = []
+    for inv_id, (v, op) in sorted(latest.items(), key=lambda kv: kv[1][0]):
+        inv = payloads.get(inv_id)
+        events.append({"v": v, "op": op if inv is not None else "deleted", "id": inv_id, "inv": inv})
+    return events
+
+def format_events(events: list[dict]) -> str:
+    """
+    Texto SSE. El `id:` (versión) solo va en el último evento de cada versión, para
+    que Last-Event-ID no avance si la conexión se corta a media versión.
+    """
+    out = []
+    for n, ev in enumerate(events):
+        last_of_version = n + 1 == len(events) or events[n + 1]["v"] != ev["v"]
+        data = dumps(ev)
+        out.append((f"id: {ev['v']}\n" if last_of_version else "")
+                   + f"event: {ev['op']}\ndata: {data}\n\n")
+    return "".join(out)
+
+
+class AsyncSubscriber:
+    """
+    Cola de un cliente asyncio (asgi.py). El hilo LISTEN no puede tocar un asyncio.Queue
+    directamente: entrega con call_soon_threadsafe y el desborde se resuelve en el loop.
+    """
+
+    def __init__(self, loop, maxsize: int = QUEUE_MAX):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, events) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, events)
+        except RuntimeError:        # loop cerrado: el cliente ya se fue
+            pass
+
+    def _put(self, events) -> None:
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self, timeout: float):
+        """Siguiente lote; asyncio.TimeoutError si no llega nada en `timeout` segundos."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class ChangeHub:
+    """Un LISTEN por proceso, reparto a N colas de clientes."""
+
+    def __init__(self, fetch: Callable):
+        self.fetch = fetch
+        self._subs: set = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._version = 0            # última versión repartida; la fija subscribe() al arrancar
+        self._last_prune = 0.0
+
+    # ---------- clientes ----------
+
+    def subscribe(self, q=None, limit: int = SSE_MAX_CLIENTS):
+        """
+        Registra la cola de un cliente nuevo (por omisión una queue.Queue; asgi.py pasa un
+        AsyncSubscriber); None si el proceso ya tiene `limit` clientes.
+        """
+        with self._lock:
+            if len(self._subs) >= limit:
+                return None
+            if q is None:
+                q = queue.Queue(maxsize=QUEUE_MAX)
+            if self._thread is None or not self._thread.is_alive():
+                # punto de partida ANTES de aceptar al cliente: todo commit posterior sale
+                # por broadcast aunque el hilo tarde en conectarse, y lo anterior lo cubre
+                # el replay del cliente (corre después; los repetidos se filtran por versión)
+                self._version = self._current_version()
+                self._thread = threading.Thread(target=self._run, name="feed-listen", daemon=True)
+                self._thread.start()
+            self._subs.add(q)
+            return q
+
+    def unsubscribe(self, q) -> None:
+        with self._lock:
+            self._subs.discard(q)
+
+    def _current_version(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.execute(select(func.max(CambioInvitacion.version))).scalar() or 0
+        finally:
+            db.close()
+
+    def replay(self, db, since: int) -> Optional[list[dict]]:
+        """Eventos desde `since`, o None si la bitácora ya no los cubre (el cliente recarga)."""
+        oldest = db.execute(select(func.min(CambioInvitacion.version))).scalar()
+        if oldest is not None and since < oldest - 1:
+            return None
+        return events_since(db, since, self.fetch)
+
+    def _broadcast(self, events: list[dict]) -> None:
+        with self._lock:
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait(events)
+            except queue.Full:
+                # cliente demasiado lento: se le pide recargar y se suelta
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(RESET)
+
+    # ---------- hilo LISTEN ----------
+
+    def _poll(self) -> None:
+        db = SessionLocal()
+        try:
+            # commits cuyo bump falló: sin sellar nunca saldrían
+            orphan = (CambioInvitacion.version.is_(None)
+                      & (CambioInvitacion.ts < datetime.utcnow() - timedelta(seconds=STAMP_GRACE)))
+            if db.execute(select(CambioInvitacion.id).where(orphan).limit(1)).first():
+                bump_now()
+            events = events_since(db, self._version, self.fetch)
+            if events:
+                self._version = events[-1]["v"]
+                self._broadcast(events)
+            if time.monotonic() - self._last_prune > 3600:
+                self._last_prune = time.monotonic()
+                cutoff = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+                db.execute(delete(CambioInvitacion).where(CambioInvitacion.ts < cutoff))
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        # LISTEN es estado de sesión: directo a PostgreSQL aunque haya PgBouncer
+        conninfo = DIRECT_DB_URL.replace("postgresql+psycopg://", "postgresql://", 1)
+        backoff = 1
+        while True:
+            with self._lock:
+                if not self._subs:
+                    self._thread = None
+                    return
+            try:
+                with psycopg.connect(conninfo, autocommit=True, **CONNECT_ARGS) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    self._poll()           # lo que pasó mientras no escuchábamos
+                    backoff = 1
+                    last_poll = time.monotonic()
+                    while True:
+                        with self._lock:
+                            if not self._subs:
+                                break
+                        got = any(True for _ in conn.notifies(timeout=HEARTBEAT))
+                        if got or time.monotonic() - last_poll > SAFETY_POLL:
+                            self._poll()
+                            last_poll = time.monotonic()
+            except Exception:
+                log.exception("feed: se perdió la conexión LISTEN; reintento en %ss", backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
@@ -0,0 +1,34 @@
+# gc_uploads.py
+"""
+Barre adjuntos huérfanos del almacén (storage.py): objetos que ninguna invitación
+referencia en archivo_url y que llevan más de UPLOAD_GC_GRACE segundos sin tocarse.
+
+    python gc_uploads.py              # borra
+    python gc_uploads.py --dry-run    # solo lista
+    python gc_uploads.py --grace 0    # sin periodo de gracia (¡solo sin tráfico!)
+"""
+import argparse
+
+from db import SessionLocal
+import storage
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="GC de adjuntos sin referencia")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--grace", type=int, default=storage.UPLOAD_GC_GRACE, help="segundos")
+    args = ap.parse_args()
+
+    store = storage.from_env()
+    db = SessionLocal()
+    try:
+        orphans = storage.collect_garbage(store, db, grace=args.grace, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    verbo = "Se borrarían" if args.dry_run else "Borrados"
+    for o in orphans:
+        print(f"   {o.key} ({o.size} bytes)")
+    print(f"✅ {verbo} {len(orphans)} archivos, {sum(o.size for o in orphans)} bytes.")
+
+if __name__ == "__main__":
+    main()
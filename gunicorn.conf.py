@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (Procfile: gunicorn -c gunicorn.conf.py app:app).
+
+Métricas multiproceso (metrics.py): todos los workers escriben en el mismo
+PROMETHEUS_MULTIPROC_DIR. Se vacía al arrancar el master (si no, se sumarían
+contadores de corridas anteriores) y cada worker que termina se marca muerto para
+que sus gauges "livesum" dejen de contar.
+"""
+import os
+import shutil
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# antes de que los workers importen prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                      os.path.join(tempfile.gettempdir(), "asistencia-metrics"))
+
+# importado aquí y no en child_exit: ese hook corre dentro del manejador de SIGCHLD y
+# un import a medias (otro worker que muere al mismo tiempo) falla como import circular
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    d = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(d, ignore_errors=True)
+    os.makedirs(d, exist_ok=True)
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,96 @@
+# history.py
+"""
+Historial de una invitación (/api/invitation/<id>/history) leído de notificaciones.
+
+Cada acción ya deja ahí una fila por campo cambiado (campo, valor_anterior,
+valor_nuevo, comentario) con el mismo ts para toda la acción. Se lee por el
+índice (invitacion_ref, ts, id) hacia atrás, con cursor keyset:
+  - completo:  una entrada por fila, cursor (ts, id)
+  - compacto:  una entrada por acción (filas con el mismo ts), con una línea de
+               texto lista para mostrar; reemplaza la bitácora en observaciones
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from db import Notificacion
+
+HISTORY_LIMIT = 50
+HISTORY_MAX   = 500
+
+ROW_COLS = ("id", "ts", "campo", "valor_anterior", "valor_nuevo", "comentario",
+            "estatus", "asignado_a_nombre", "enviado")
+
+def encode_cursor(ts: datetime, row_id: Optional[int]) -> str:
+    raw = json.dumps([ts.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(s: str) -> tuple:
+    """ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+        ts, row_id = json.loads(raw)
+        return datetime.fromisoformat(ts), (int(row_id) if row_id is not None else None)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+def _fmt_ts(ts: Optional[datetime]) -> str:
+    return ts.strftime("%d/%m/%y %H:%M") if ts else ""
+
+def describe(cambios: list, comentarios: list) -> str:
+    """'Estatus: Pendiente → Confirmado; Rol: → Diputado (comentario)'"""
+    partes = [f"{c}: {a or '—'} → {n or '—'}" if a != n else f"{c}: {n or '—'}"
+              for c, a, n in cambios]
+    texto = "; ".join(partes)
+    notas = [c for c in dict.fromkeys(comentarios) if c]
+    return f"{texto} ({' | '.join(notas)})" if notas else texto
+
+# -----------------------------------------------------------------------------
+# Lectura
+# -----------------------------------------------------------------------------
+def timeline(db, inv_id: int, limit: int = HISTORY_LIMIT,
+             cursor: Optional[tuple] = None) -> tuple[list[dict], Optional[str]]:
+    """Una entrada por notificación, de la más reciente a la más vieja."""
+    limit = max(1, min(limit, HISTORY_MAX))
+    stmt = (select(*(getattr(Notificacion, c) for c in ROW_COLS))
+            .where(Notificacion.invitacion_ref == inv_id, Notificacion.ts.isnot(None)))
+    if cursor:
+        ts, row_id = cursor
+        stmt = stmt.where(or_(Notificacion.ts < ts,
+                              and_(Notificacion.ts == ts, Notificacion.id < row_id)))
+    stmt = stmt.order_by(Notificacion.ts.desc(), Notificacion.id.desc()).limit(limit + 1)
+
+    rows = db.execute(stmt).all()
+    items = []
+    for r in rows[:limit]:
+        d = {c: getattr(r, c) for c in ROW_COLS}
+        d["ts"] = r.ts.isoformat()
+        d["enviado"] = bool(r.enviado)
+        items.append(d)
+    nxt = encode_cursor(rows[limit - 1].ts, rows[limit - 1].id) if len(rows) > limit else None
+    return items, nxt
+
+def timeline_compact(db, inv_id: int, limit: int = HISTORY_LIMIT,
+                     cursor: Optional[tuple] = None) -> tuple[list[dict], Optional[str]]:
+    """Una entrada por acción: {ts, fecha, texto, cambios: [[campo, anterior, nuevo], ...]}."""
+    limit = max(1, min(limit, HISTORY_MAX))
+    cambios = func.json_agg(aggregate_order_by(
+        func.json_build_array(Notificacion.campo, Notificacion.valor_anterior, Notificacion.valor_nuevo),
+        Notificacion.id))
+    comentarios = func.array_agg(aggregate_order_by(Notificacion.comentario, Notificacion.id))
+    stmt = (select(Notificacion.ts, cambios.label("cambios"), comentarios.label("comentarios"))
+            .where(Notificacion.invitacion_ref == inv_id, Notificacion.ts.isnot(None)))
+    if cursor:
+        stmt = stmt.where(Notificacion.ts < cursor[0])
+    stmt = stmt.group_by(Notificacion.ts).order_by(Notificacion.ts.desc()).limit(limit + 1)
+
+    rows = db.execute(stmt).all()
+    items = [{"ts": r.ts.isoformat(), "fecha": _fmt_ts(r.ts),
+              "texto": describe(r.cambios, r.comentarios), "cambios": r.cambios}
+             for r in rows[:limit]]
+    nxt = encode_cursor(rows[limit - 1].ts, None) if len(rows) > limit else None
+    return items, nxt
@@ -0,0 +1,247 @@
+# importer.py
+"""
+Importación masiva de invitaciones desde XLSX/CSV (/api/invitations/import).
+
+1. Se lee el archivo en streaming (openpyxl read_only / csv), fila por fila.
+2. Cada fila se normaliza (mismas reglas que el alta manual) y las válidas van por
+   COPY a una tabla temporal; las inválidas solo dejan su error en el reporte.
+3. En SQL, de un jalón: duplicados dentro del archivo y contra invitaciones ya
+   existentes por (fecha, hora, evento, convoca) sin distinguir mayúsculas/espacios,
+   y un solo INSERT ... SELECT de lo que queda.
+
+En memoria solo viven la fila actual y los errores (hasta IMPORT_MAX_ERRORS).
+"""
+import csv
+import io
+import os
+from datetime import date, datetime, time as dtime
+from typing import Iterator, NamedTuple, Optional
+
+from openpyxl import load_workbook
+from sqlalchemy import text
+
+from parsing import parse_date_flexible, parse_time_flexible
+from search import fold
+
+IMPORT_MAX_ROWS   = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+IMPORT_MAX_ERRORS = 1000
+
+# columna de invitaciones -> encabezados aceptados (plegados: minúsculas, sin acentos)
+HEADERS = {
+    "fecha":            ("fecha",),
+    "hora":             ("hora",),
+    "evento":           ("evento", "nombre del evento"),
+    "convoca_cargo":    ("convoca cargo", "quien convoca", "cargo"),
+    "convoca":          ("convoca", "nombre de quien convoca"),
+    "partido_politico": ("partido politico", "partido"),
+    "municipio":        ("municipio/dependencia", "municipio", "dependencia"),
+    "lugar":            ("lugar",),
+    "observaciones":    ("observaciones", "notas"),
+}
+# obligatorias, igual que /api/invitation/create
+REQUIRED = ("fecha", "hora", "evento", "convoca_cargo", "convoca", "municipio", "lugar")
+COLUMNS  = tuple(HEADERS)
+
+STAGE = "import_stage"
+STAGE_DDL = f"""
+    CREATE TEMP TABLE {STAGE} (
+        fila integer, fecha date, hora time, evento text, convoca_cargo text, convoca text,
+        partido_politico text, municipio text, lugar text, observaciones text
+    ) ON COMMIT DROP"""
+
+
+class RowError(NamedTuple):
+    fila: int
+    error: str
+
+
+class ImportResult(NamedTuple):
+    total: int
+    insertadas: int
+    duplicadas: int
+    errores: list        # [RowError] inválidas + duplicadas (hasta IMPORT_MAX_ERRORS)
+    errores_total: int
+    ids: list
+
+
+class ImportFormatError(ValueError):
+    """El archivo no se puede leer o no trae las columnas necesarias."""
+
+# -----------------------------------------------------------------------------
+# Lectura en streaming
+# -----------------------------------------------------------------------------
+def _xlsx_rows(stream) -> Iterator[tuple]:
+    try:
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFormatError(f"No se pudo abrir el XLSX: {e}")
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _csv_rows(stream) -> Iterator[list]:
+    f = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    sample = f.read(8192)
+    f.seek(0)
+    try:
+        # Excel en español suele exportar con ';'
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        yield from csv.reader(f, dialect)
+    finally:
+        f.detach()
+
+def read_rows(stream, filename: str) -> Iterator[tuple[int, list]]:
+    """(número de fila en la hoja, celdas) a partir del renglón de encabezados."""
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "xlsx":
+        rows = _xlsx_rows(stream)
+    elif ext == "csv":
+        rows = _csv_rows(stream)
+    else:
+        raise ImportFormatError("Formato no soportado (usa .xlsx o .csv)")
+    for n, cells in enumerate(rows, start=1):
+        if cells and any(c not in (None, "") for c in cells):
+            yield n, list(cells)
+
+def map_headers(cells: list) -> dict:
+    """{columna: índice}; ImportFormatError si faltan obligatorias."""
+    aliases = {alias: col for col, names in HEADERS.items() for alias in names}
+    index = {}
+    for i, h in enumerate(cells):
+        col = aliases.get(" ".join(fold(str(h or "")).split()))
+        if col and col not in index:
+            index[col] = i
+    missing = [c for c in REQUIRED if c not in index]
+    if missing:
+        raise ImportFormatError("Faltan columnas: " + ", ".join(missing))
+    return index
+
+# -----------------------------------------------------------------------------
+# Normalización de una fila
+# -----------------------------------------------------------------------------
+def _text(v) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    s = " ".join(str(v).split())
+    return s or None
+
+def _to_date(v) -> Optional[date]:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return parse_date_flexible(_text(v))
+
+def _to_time(v) -> Optional[dtime]:
+    if isinstance(v, datetime):
+        return v.time()
+    if isinstance(v, dtime):
+        return v
+    return parse_time_flexible(_text(v))
+
+def normalize(cells: list, index: dict):
+    """Tupla de columnas (en orden de COLUMNS) o el texto del error."""
+    raw = {c: (cells[i] if i < len(cells) else None) for c, i in index.items()}
+    missing = [c for c in REQUIRED if _text(raw.get(c)) is None]
+    if missing:
+        return "Faltan: " + ", ".join(missing)
+    fecha = _to_date(raw["fecha"])
+    if fecha is None:
+        return f"Fecha inválida: {_text(raw['fecha'])}"
+    hora = _to_time(raw["hora"])
+    if hora is None:
+        return f"Hora inválida: {_text(raw['hora'])}"
+    values = {c: _text(raw.get(c)) for c in COLUMNS}
+    values.update(fecha=fecha, hora=hora)
+    return tuple(values[c] for c in COLUMNS)
+
+# -----------------------------------------------------------------------------
+# Carga
+# -----------------------------------------------------------------------------
+def _copy(db, rows: Iterator[tuple]) -> None:
+    raw = db.connection().connection.driver_connection      # psycopg 3
+    with raw.cursor() as cur:
+        with cur.copy(f"COPY {STAGE} (fila, {', '.join(COLUMNS)}) FROM STDIN") as cp:
+            for r in rows:
+                cp.write_row(r)
+
+DUPLICATES_SQL = f"""
+    WITH t AS (
+        SELECT fila, fecha, hora, lower(btrim(evento)) AS e, lower(btrim(coalesce(convoca, ''))) AS c
+        FROM {STAGE}
+    ), ya AS (
+        SELECT DISTINCT t.fila FROM t
+        JOIN invitaciones i ON i.fecha = t.fecha AND i.hora = t.hora
+         AND lower(btrim(i.evento)) = t.e AND lower(btrim(coalesce(i.convoca, ''))) = t.c
+    ), d AS (
+        SELECT t.fila, min(t.fila) OVER (PARTITION BY t.fecha, t.hora, t.e, t.c) AS primera,
+               ya.fila IS NOT NULL AS existe
+        FROM t LEFT JOIN ya USING (fila)
+    )
+    SELECT fila, primera, existe FROM d WHERE existe OR fila <> primera ORDER BY fila
+"""
+
+def run(db, stream, filename: str, dry_run: bool = False, usuario: str = "importacion") -> ImportResult:
+    """
+    Importa dentro de la transacción de `db` (el commit lo hace quien llama).
+    Con dry_run valida y detecta duplicados pero no inserta.
+    """
+    errors: list[RowError] = []
+    counts = {"total": 0, "errores": 0}
+
+    def report(fila: int, msg: str) -> None:
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append(RowError(fila, msg))
+
+    rows = read_rows(stream, filename)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("El archivo está vacío")
+    index = map_headers(header[1])
+
+    def valid_rows():
+        for fila, cells in rows:
+            if counts["total"] >= IMPORT_MAX_ROWS:
+                counts["errores"] += 1
+                report(fila, f"Se ignoró el resto: máximo {IMPORT_MAX_ROWS} filas por archivo")
+                break
+            counts["total"] += 1
+            r = normalize(cells, index)
+            if isinstance(r, str):
+                counts["errores"] += 1
+                report(fila, r)
+            else:
+                yield (fila, *r)
+
+    db.execute(text(STAGE_DDL))
+    _copy(db, valid_rows())
+    db.execute(text(f"ANALYZE {STAGE}"))     # tabla temporal: sin autovacuum, sin estadísticas
+
+    # duplicados: dentro del archivo se queda la primera aparición
+    dups = db.execute(text(DUPLICATES_SQL)).all()
+    for r in dups:
+        report(r.fila, "Ya existe una invitación con la misma fecha, hora, evento y convoca" if r.existe
+                       else f"Duplicada en el archivo (igual a la fila {r.primera})")
+    if dups:
+        db.execute(text(f"DELETE FROM {STAGE} WHERE fila = ANY(:f)"), {"f": [r.fila for r in dups]})
+
+    ids = []
+    if dry_run:
+        insertadas = db.execute(text(f"SELECT count(*) FROM {STAGE}")).scalar()
+    else:
+        ids = list(db.execute(text(f"""
+            INSERT INTO invitaciones ({', '.join(COLUMNS)}, estatus, ultima_modificacion, modificado_por)
+            SELECT {', '.join(COLUMNS)}, 'Pendiente', :now, :usuario FROM {STAGE} ORDER BY fila
+            RETURNING id"""), {"now": datetime.utcnow(), "usuario": usuario}).scalars())
+        insertadas = len(ids)
+
+    errors.sort(key=lambda e: e.fila)
+    # el reporte trae ambos: filas inválidas y duplicadas
+    return ImportResult(counts["total"], insertadas, len(dups), errors,
+                        counts["errores"] + len(dups), ids)
@@ -1,9 +1,12 @@
 # init_db.py
-from db import Base, engine
+from db import Base, direct_engine as engine
+import migrate
 
 def init():
     print("⏳ Creando tablas en la base de datos...")
     Base.metadata.create_all(bind=engine)
+    # índices, triggers y columnas que create_all no cubre: migraciones versionadas
+    migrate.upgrade()
     print("✅ Tablas creadas correctamente en Render PostgreSQL.")
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+# maintain_notifs.py
+"""
+Mantenimiento de la tabla particionada notificaciones (partitions.py). Para cron:
+
+    python maintain_notifs.py                  # crea meses futuros + archiva lo viejo ya enviado
+    python maintain_notifs.py --dry-run        # solo dice qué haría
+    python maintain_notifs.py --ahead 6 --retain 24 --archive-dir /data/archivo
+    python maintain_notifs.py --no-archive     # solo crea particiones
+"""
+import argparse
+
+from db import engine
+import partitions
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Particiones y retención de notificaciones")
+    ap.add_argument("--ahead", type=int, default=partitions.NOTIF_PARTITIONS_AHEAD, help="meses")
+    ap.add_argument("--retain", type=int, default=partitions.NOTIF_RETENTION_MONTHS, help="meses")
+    ap.add_argument("--archive-dir", default=partitions.NOTIF_ARCHIVE_DIR)
+    ap.add_argument("--no-archive", action="store_true")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    with engine.begin() as conn:
+        created = partitions.ensure_partitions(conn, ahead=args.ahead)
+        if args.dry_run:
+            conn.rollback()
+    verbo = "Se crearían" if args.dry_run else "Creadas"
+    print(f"✅ {verbo} {len(created)} particiones" + (f": {', '.join(created)}" if created else "."))
+
+    if args.no_archive:
+        return
+    done, blocked = partitions.archive_old(engine, retain=args.retain,
+                                           dest_dir=args.archive_dir, dry_run=args.dry_run)
+    for a in done:
+        print(f"   {a.partition} -> {a.path}" + (f" ({a.rows} filas)" if a.rows >= 0 else ""))
+    for name in blocked:
+        print(f"⚠️  {name} sigue con notificaciones sin enviar: no se archiva")
+    verbo = "Se archivarían" if args.dry_run else "Archivadas"
+    print(f"✅ {verbo} {len(done)} particiones.")
+
+if __name__ == "__main__":
+    main()
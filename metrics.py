@@ -0,0 +1,190 @@
+# metrics.py
+"""
+Métricas Prometheus (/metrics).
+
+Con gunicorn cada worker es un proceso: prometheus_client en modo multiproceso
+escribe cada métrica en archivos mmap dentro de PROMETHEUS_MULTIPROC_DIR y el
+worker que atiende /metrics los suma todos. gunicorn.conf.py crea/limpia ese
+directorio al arrancar y marca los workers muertos (child_exit). Sin la variable
+(flask run, scripts) se usa el registro normal del proceso.
+
+Por request (ruta = plantilla de Flask, p.ej. /api/invitation/<int:inv_id>):
+    http_requests_total{method,route,status}
+    http_request_duration_seconds{method,route}     histograma; al cerrar la respuesta
+    http_request_exceptions_total{route}           excepciones sin manejar
+Pool de SQLAlchemy (engine de db.py), sumado entre workers:
+    db_pool_size / db_pool_checked_out / db_pool_overflow
+    db_pool_wait_seconds                           histograma de cada checkout
+Adjuntos:
+    uploads_bytes_total                            bytes recibidos por upload
+Leídas de la BD al momento del scrape (valen igual en cualquier worker):
+    outbox_backlog / outbox_oldest_pending_seconds
+    uploads_stored_bytes                           adjuntos referenciados (sin duplicados)
+"""
+import os
+import time
+
+from flask import Response, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event, text
+
+import db as dbmod
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+POOL_BUCKETS    = (.0005, .001, .005, .01, .05, .1, .5, 1, 5, 30)
+
+REQUESTS = Counter("http_requests_total", "Requests atendidos",
+                   ["method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "Duración del request hasta cerrar la respuesta",
+                    ["method", "route"], buckets=LATENCY_BUCKETS)
+EXCEPTIONS = Counter("http_request_exceptions_total", "Excepciones sin manejar", ["route"])
+
+POOL_SIZE = Gauge("db_pool_size", "Tamaño base del pool", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Conexiones prestadas", multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Conexiones por encima de pool_size", multiprocess_mode="livesum")
+POOL_WAIT = Histogram("db_pool_wait_seconds", "Espera por una conexión del pool", buckets=POOL_BUCKETS)
+
+UPLOAD_BYTES = Counter("uploads_bytes_total", "Bytes de adjuntos recibidos")
+
+UNMATCHED = "<sin_ruta>"
+
+def route_label() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED
+
+# -----------------------------------------------------------------------------
+# Requests
+# -----------------------------------------------------------------------------
+def init_app(app) -> None:
+    if not MULTIPROC_DIR:
+        REGISTRY.register(_db_collector)
+
+    @app.before_request
+    def _metrics_start():
+        request.environ["metrics.t0"] = time.perf_counter()
+
+    @app.after_request
+    def _metrics_finish(resp):
+        t0 = request.environ.pop("metrics.t0", None)
+        if t0 is None:
+            return resp
+        method, route, status = request.method, route_label(), str(resp.status_code)
+
+        def done():
+            # streaming incluido: cuenta hasta el último byte
+            REQUESTS.labels(method, route, status).inc()
+            LATENCY.labels(method, route).observe(time.perf_counter() - t0)
+        resp.call_on_close(done)
+        return resp
+
+    @app.teardown_request
+    def _metrics_exception(exc):
+        if exc is not None:
+            EXCEPTIONS.labels(route_label()).inc()
+
+# -----------------------------------------------------------------------------
+# Pool
+# -----------------------------------------------------------------------------
+def install_pool(engine) -> None:
+    pool = engine.pool
+    POOL_SIZE.set(pool.size())
+
+    # "checkin" se dispara antes de devolver la conexión a la cola: pool.checkedout()
+    # todavía la cuenta, por eso se lleva la cuenta propia con inc/dec
+    @event.listens_for(engine, "checkout")
+    def _checkout(*a):
+        POOL_CHECKED_OUT.inc()
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(*a):
+        POOL_CHECKED_OUT.dec()
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    dbmod.POOL_WAIT_HOOKS.append(POOL_WAIT.observe)
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    return {"size": pool.size(), "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0), "idle": pool.checkedin()}
+
+# -----------------------------------------------------------------------------
+# Valores de la BD (al momento del scrape)
+# -----------------------------------------------------------------------------
+BACKLOG_SQL = text("""
+    SELECT count(*), extract(epoch FROM localtimestamp - min(ts))
+    FROM notificaciones WHERE enviado = false""")
+
+STORED_SQL = text("""
+    SELECT coalesce(sum(tam), 0) FROM (
+        SELECT DISTINCT archivo_url, coalesce(archivo_tamano, 0) AS tam
+        FROM invitaciones WHERE coalesce(archivo_url, '') <> ''
+    ) t""")
+
+class DatabaseCollector:
+    """Cola del outbox y bytes de adjuntos; una consulta corta por scrape."""
+
+    def collect(self):
+        backlog = GaugeMetricFamily("outbox_backlog", "Notificaciones pendientes de envío")
+        oldest = GaugeMetricFamily("outbox_oldest_pending_seconds", "Antigüedad del pendiente más viejo")
+        stored = GaugeMetricFamily("uploads_stored_bytes", "Bytes de adjuntos referenciados")
+        up = GaugeMetricFamily("metrics_db_up", "1 si las métricas de BD se pudieron leer")
+        try:
+            with dbmod.engine.connect() as conn:
+                n, age = conn.execute(BACKLOG_SQL).one()
+                size = conn.execute(STORED_SQL).scalar()
+            backlog.add_metric([], n)
+            oldest.add_metric([], float(age or 0))
+            stored.add_metric([], float(size))
+            up.add_metric([], 1)
+            yield from (backlog, oldest, stored, up)
+        except Exception:
+            up.add_metric([], 0)
+            yield up
+
+_db_collector = DatabaseCollector()
+
+def registry() -> CollectorRegistry:
+    """Multiproceso: registro nuevo por scrape que suma los archivos de todos los workers."""
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    from prometheus_client import multiprocess
+    reg = CollectorRegistry()
+    multiprocess.MultiProcessCollector(reg)
+    reg.register(_db_collector)
+    return reg
+
+def metrics_response() -> Response:
+    return Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
+
+# -----------------------------------------------------------------------------
+# Health profundo
+# -----------------------------------------------------------------------------
+HEALTH_DB_MAX_MS = float(os.getenv("HEALTH_DB_MAX_MS", "500"))
+
+def deep_health(engine) -> tuple[dict, int]:
+    """
+    Ida y vuelta a la BD (SELECT 1), medida aparte de la espera por conexión del pool.
+    503 si falla o si tarda más de HEALTH_DB_MAX_MS.
+    """
+    out = {"ok": False, "pool": dict(pool_status(engine), max_overflow=dbmod.POOL_SETTINGS["max_overflow"],
+                                     pre_ping=dbmod.POOL_SETTINGS["pool_pre_ping"],
+                                     pgbouncer=dbmod.DB_PGBOUNCER)}
+    t0 = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            t1 = time.perf_counter()
+            conn.execute(text("SELECT 1")).scalar()
+            t2 = time.perf_counter()
+    except Exception as e:
+        out.update(error=str(e))
+        return out, 503
+    ms = round((t2 - t1) * 1000, 2)
+    out.update(ok=ms <= HEALTH_DB_MAX_MS, db_ms=ms, checkout_ms=round((t1 - t0) * 1000, 2),
+               db_max_ms=HEALTH_DB_MAX_MS)
+    return out, 200 if out["ok"] else 503
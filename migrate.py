@@ -0,0 +1,239 @@
+# migrate.py
+"""
+Runner de migraciones del esquema (módulos en migrations/).
+
+    python migrate.py status            # aplicadas / pendientes
+    python migrate.py upgrade [N]       # aplica hasta la versión N (default: todas)
+    python migrate.py downgrade N       # revierte las posteriores a N (0 = todas)
+    python migrate.py check             # EXPLAIN de las consultas calientes: ¿usan sus índices?
+
+Las versiones aplicadas se guardan en schema_migrations. Un advisory lock evita que
+dos deploys migren a la vez. Las migraciones con CONCURRENT = True corren en
+autocommit (CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción) y se
+registran al terminar; si fallan a la mitad, se pueden volver a correr.
+"""
+import importlib
+import json
+import pkgutil
+import re
+import sys
+from collections import namedtuple
+
+from sqlalchemy import text
+
+import migrations
+# advisory lock de sesión y CONCURRENTLY: conexión directa aunque haya PgBouncer
+from db import direct_engine as engine
+
+VERSION_TABLE = "schema_migrations"
+LOCK_KEY = 7270014     # pg_advisory_lock: un solo runner a la vez
+
+Migration = namedtuple("Migration", "version name description module")
+
+def discover() -> list[Migration]:
+    out = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        m = re.fullmatch(r"m(\d{4})_(\w+)", info.name)
+        if not m:
+            continue
+        mod = importlib.import_module(f"migrations.{info.name}")
+        desc = (mod.__doc__ or "").strip().splitlines()[0] if mod.__doc__ else ""
+        out.append(Migration(int(m.group(1)), m.group(2), desc, mod))
+    out.sort(key=lambda m: m.version)
+    return out
+
+def _ensure_table(conn) -> None:
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            version  INTEGER PRIMARY KEY,
+            nombre   VARCHAR NOT NULL,
+            aplicada TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT localtimestamp
+        )"""))
+
+def applied_versions() -> dict:
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        rows = conn.execute(text(f"SELECT version, nombre, aplicada FROM {VERSION_TABLE}"))
+        return {r.version: r for r in rows}
+
+def _mark(conn, m: Migration, up: bool) -> None:
+    if up:
+        conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version, nombre) VALUES (:v, :n) "
+                          "ON CONFLICT (version) DO NOTHING"), {"v": m.version, "n": m.name})
+    else:
+        conn.execute(text(f"DELETE FROM {VERSION_TABLE} WHERE version = :v"), {"v": m.version})
+
+def _run(m: Migration, up: bool) -> None:
+    fn = m.module.upgrade if up else m.module.downgrade
+    if getattr(m.module, "CONCURRENT", False):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            fn(conn)
+        with engine.begin() as conn:
+            _mark(conn, m, up)
+    else:
+        # cambio y registro en la misma transacción
+        with engine.begin() as conn:
+            fn(conn)
+            _mark(conn, m, up)
+
+class _Lock:
+    """Advisory lock de sesión en una conexión aparte, en autocommit: no deja una
+    transacción abierta que haría esperar para siempre a CREATE INDEX CONCURRENTLY."""
+
+    def __enter__(self):
+        self.conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        self.conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_KEY})
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
+        finally:
+            self.conn.close()
+
+# -----------------------------------------------------------------------------
+# Comandos
+# -----------------------------------------------------------------------------
+def upgrade(target: int = None, verbose: bool = True) -> list[int]:
+    done = []
+    with _Lock():
+        applied = applied_versions()
+        for m in discover():
+            if m.version in applied or (target is not None and m.version > target):
+                continue
+            if verbose:
+                print(f"⏳ {m.version:04d} {m.name}: {m.description}")
+            _run(m, up=True)
+            done.append(m.version)
+    if verbose:
+        print(f"✅ {len(done)} migraciones aplicadas." if done else "✅ Esquema al día.")
+    return done
+
+def downgrade(target: int, verbose: bool = True) -> list[int]:
+    done = []
+    with _Lock():
+        applied = applied_versions()
+        for m in reversed(discover()):
+            if m.version not in applied or m.version <= target:
+                continue
+            if verbose:
+                print(f"⏳ revirtiendo {m.version:04d} {m.name}")
+            _run(m, up=False)
+            done.append(m.version)
+    if verbose:
+        print(f"✅ {len(done)} migraciones revertidas.")
+    return done
+
+def status() -> None:
+    applied = applied_versions()
+    for m in discover():
+        row = applied.get(m.version)
+        mark = f"✅ {row.aplicada:%Y-%m-%d %H:%M}" if row else "⬜ pendiente      "
+        print(f"{mark}  {m.version:04d} {m.name}: {m.description}")
+
+# -----------------------------------------------------------------------------
+# check: las consultas calientes de app.py (mismo WHERE/ORDER BY) contra sus índices.
+# Se corre con enable_seqscan=off: en tablas chicas el planner prefiere leer todo,
+# aquí lo que se verifica es que el índice SIRVE para esa consulta. Con tablas vacías
+# o sin ANALYZE el planner puede escoger otro índice equivalente: correr en una BD con datos.
+# -----------------------------------------------------------------------------
+HOT_QUERIES = [
+    ("tablero sin filtro (/api/invitations)",
+     "SELECT id FROM invitaciones "
+     "ORDER BY fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC LIMIT 201",
+     {"idx_inv_orden"}),
+    ("tablero por estatus (/api/invitations?status=)",
+     "SELECT id FROM invitaciones WHERE estatus = 'Confirmado' "
+     "ORDER BY fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC LIMIT 201",
+     {"idx_inv_estatus_orden"}),
+    ("agenda para conflictos (conflicts.load_index)",
+     "SELECT id, hora FROM invitaciones WHERE persona_id = 1 AND fecha = current_date "
+     "AND estatus IN ('Confirmado', 'Sustituido') AND hora IS NOT NULL",
+     {"idx_inv_persona_fecha", "uq_inv_persona_fecha_hora"}),
+    ("outbox claim (outbox.claim)",
+     "SELECT id FROM notificaciones WHERE enviado = false "
+     "AND (lease_until IS NULL OR lease_until < localtimestamp) "
+     "AND ts >= localtimestamp - interval '30 days' ORDER BY ts, id LIMIT 50",
+     {"idx_notif_pendientes"}),
+    ("outbox claim, pendientes viejos (outbox.claim)",
+     "SELECT id FROM notificaciones WHERE enviado = false "
+     "AND (lease_until IS NULL OR lease_until < localtimestamp) "
+     "AND ts < localtimestamp - interval '30 days' ORDER BY ts, id LIMIT 50",
+     {"idx_notif_pendientes"}),
+    ("referencias de adjunto (storage.ref_count)",
+     "SELECT count(*) FROM invitaciones WHERE archivo_url = '/uploads/ab/x.pdf'",
+     {"idx_invitaciones_archivo_url"}),
+    ("búsqueda (/api/invitations/search)",
+     "SELECT id FROM invitaciones WHERE search_vec @@ to_tsquery('spanish'::regconfig, 'reunion:*')",
+     {"idx_invitaciones_search_vec"}),
+    ("historial por invitación (history.timeline)",
+     "SELECT id FROM notificaciones WHERE invitacion_ref = 1 AND ts IS NOT NULL "
+     "ORDER BY ts DESC, id DESC LIMIT 51",
+     {"idx_notif_inv_ref_ts"}),
+    ("feed SSE (feed.events_since)",
+     "SELECT version, invitacion_id FROM cambios_invitaciones WHERE version > 0 ORDER BY version, id",
+     {"idx_cambios_version"}),
+    ("KPIs por rango (rollups.status_counts)",
+     "SELECT estatus, sum(total) FROM invitaciones_daily_stats "
+     "WHERE fecha BETWEEN current_date AND current_date + 30 GROUP BY estatus",
+     {"idx_daily_stats_fecha"}),
+]
+
+def _plan_indexes(node: dict) -> set:
+    found = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+def _with_parents(conn, names: set) -> set:
+    """En tablas particionadas el plan nombra el índice de cada partición: se suma el del padre."""
+    out = set(names)
+    for n in names:
+        out |= set(conn.execute(text(
+            "SELECT c.relname FROM pg_partition_ancestors(CAST(:n AS regclass)) a "
+            "JOIN pg_class c ON c.oid = a.relid"), {"n": n}).scalars())
+    return out
+
+def check(verbose: bool = True) -> bool:
+    ok = True
+    with engine.connect() as conn:
+        for name, sql, expected in HOT_QUERIES:
+            with conn.begin():
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                try:
+                    plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+                except Exception as e:
+                    used, err = set(), str(e).splitlines()[0]
+                else:
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    used, err = _with_parents(conn, _plan_indexes(plan[0]["Plan"])), None
+            hit = bool(used & expected)
+            ok &= hit
+            if verbose:
+                mark = "✅" if hit else "❌"
+                detail = err or (", ".join(sorted(used & expected if hit else used)) or "sin índice")
+                print(f"{mark} {name}: {detail}")
+    return ok
+
+def main(argv: list[str]) -> int:
+    cmd = argv[0] if argv else "status"
+    arg = int(argv[1]) if len(argv) > 1 else None
+    if cmd == "status":
+        status()
+    elif cmd == "upgrade":
+        upgrade(arg)
+    elif cmd == "downgrade":
+        if arg is None:
+            print("Uso: python migrate.py downgrade <versión destino>")
+            return 2
+        downgrade(arg)
+    elif cmd == "check":
+        return 0 if check() else 1
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
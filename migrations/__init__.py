@@ -0,0 +1,80 @@
+# migrations/__init__.py
+"""
+Migraciones versionadas del esquema (las corre migrate.py).
+
+Cada módulo mNNNN_nombre.py define:
+    upgrade(conn)      aplica el cambio
+    downgrade(conn)    lo revierte
+    CONCURRENT = True  (opcional) se corre en autocommit, para CREATE INDEX CONCURRENTLY;
+                       sin esto la migración va en una sola transacción
+El docstring del módulo es la descripción que muestra `migrate.py status`.
+Las sentencias deben ser idempotentes (IF [NOT] EXISTS): así una BD creada antes
+del runner puede marcarse al día con solo correr upgrade.
+"""
+import re
+
+from sqlalchemy import text
+
+def index_state(conn, name: str):
+    """None si no existe; True/False según indisvalid (un CONCURRENTLY fallido deja False)."""
+    return conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :n"), {"n": name}).scalar()
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text("SELECT relkind = 'p' FROM pg_class WHERE relname = :t"),
+                        {"t": table}).scalar() or False
+
+def partitions(conn, table: str) -> list[str]:
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t ORDER BY 1"), {"t": table}).scalars())
+
+def create_index_concurrently(conn, name: str, definition: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY (conn en autocommit). Si un intento anterior dejó el índice
+    INVALID, se tira y se vuelve a crear; si ya existe válido no hace nada.
+    `definition` es todo lo que va después del nombre: "ON tabla (cols) [WHERE ...]".
+    """
+    unique = definition.startswith("UNIQUE ")
+    if unique:
+        definition = definition[len("UNIQUE "):]
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    table = re.match(r"ON\s+(\w+)", definition).group(1)
+    if is_partitioned(conn, table):
+        return _create_partitioned_index(conn, name, kind, definition, table)
+    state = index_state(conn, name)
+    if state is True:
+        return
+    if state is False:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} {definition}"))
+
+def _create_partitioned_index(conn, name: str, kind: str, definition: str, table: str) -> None:
+    """
+    Tabla particionada: CONCURRENTLY no aplica al padre. Se crea el índice padre ON ONLY
+    (INVALID, sin bloquear), el de cada partición con CONCURRENTLY y se adjuntan; al
+    quedar todas adjuntas el padre pasa a válido. Si se interrumpe, se retoma donde quedó.
+    """
+    if index_state(conn, name) is True:
+        return
+    conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} {re.sub(r'^ON ', 'ON ONLY ', definition)}"))
+    attached = set(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :n"), {"n": name}).scalars())
+    for part in partitions(conn, table):
+        child = f"{part}_{name}"[:63]
+        if child in attached:
+            continue
+        if index_state(conn, child) is False:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {child}"))
+        child_def = re.sub(rf"^ON\s+{table}\b", f"ON {part}", definition)
+        conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {child} {child_def}"))
+        conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child}"))
+
+def drop_index_concurrently(conn, name: str) -> None:
+    partitioned = conn.execute(text("SELECT relkind = 'I' FROM pg_class WHERE relname = :n"),
+                               {"n": name}).scalar()
+    # el índice de una tabla particionada no admite CONCURRENTLY (arrastra los de las particiones)
+    how = "" if partitioned else "CONCURRENTLY "
+    conn.execute(text(f"DROP INDEX {how}IF EXISTS {name}"))
@@ -0,0 +1,27 @@
+# migrations/m0001_baseline.py
+"""Outbox con lease + índice de pendientes; índice de referencias de adjuntos."""
+from sqlalchemy import text
+
+UP = [
+    # outbox del bot: lease por lote + índice parcial de pendientes
+    "ALTER TABLE notificaciones ADD COLUMN IF NOT EXISTS lease_owner VARCHAR",
+    "ALTER TABLE notificaciones ADD COLUMN IF NOT EXISTS lease_until TIMESTAMP WITHOUT TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS idx_notif_pendientes ON notificaciones (ts, id) WHERE enviado = false",
+    # adjuntos por contenido: conteo de referencias por archivo_url
+    "CREATE INDEX IF NOT EXISTS idx_invitaciones_archivo_url ON invitaciones (archivo_url) "
+    "WHERE archivo_url IS NOT NULL",
+]
+
+# las columnas de lease son del modelo (db.py): al revertir solo se quitan los índices
+DOWN = [
+    "DROP INDEX IF EXISTS idx_invitaciones_archivo_url",
+    "DROP INDEX IF EXISTS idx_notif_pendientes",
+]
+
+def upgrade(conn):
+    for ddl in UP:
+        conn.execute(text(ddl))
+
+def downgrade(conn):
+    for ddl in DOWN:
+        conn.execute(text(ddl))
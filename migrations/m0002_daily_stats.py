@@ -0,0 +1,18 @@
+# migrations/m0002_daily_stats.py
+"""Rollup diario de KPIs: triggers de invitaciones_daily_stats + recuento inicial."""
+from sqlalchemy import text
+
+import rollups
+
+def upgrade(conn):
+    rollups.install(conn)
+    rollups.rebuild(conn)
+
+def downgrade(conn):
+    for trg in ("trg_daily_stats_ins", "trg_daily_stats_upd", "trg_daily_stats_del", "trg_daily_stats_truncate"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trg} ON invitaciones"))
+    conn.execute(text("DROP FUNCTION IF EXISTS invitaciones_daily_stats_trg()"))
+    conn.execute(text("DROP FUNCTION IF EXISTS invitaciones_daily_stats_truncate()"))
+    conn.execute(text("DROP INDEX IF EXISTS uq_daily_stats"))
+    # la tabla es del modelo; sin triggers quedaría desfasada
+    conn.execute(text(f"TRUNCATE {rollups.TABLE}"))
@@ -0,0 +1,15 @@
+# migrations/m0003_search.py
+"""Búsqueda: f_unaccent, columnas generadas search_vec/search_txt y sus GIN."""
+from sqlalchemy import text
+
+import search
+
+def upgrade(conn):
+    search.install(conn)
+
+def downgrade(conn):
+    conn.execute(text("DROP INDEX IF EXISTS idx_invitaciones_search_trgm"))
+    conn.execute(text("DROP INDEX IF EXISTS idx_invitaciones_search_vec"))
+    conn.execute(text("ALTER TABLE invitaciones DROP COLUMN IF EXISTS search_txt"))
+    conn.execute(text("ALTER TABLE invitaciones DROP COLUMN IF EXISTS search_vec"))
+    conn.execute(text("DROP FUNCTION IF EXISTS f_unaccent(text)"))
@@ -0,0 +1,42 @@
+# migrations/m0004_hot_indexes.py
+"""Índices de las consultas calientes: anti doble booking, conflictos y orden del tablero."""
+from sqlalchemy import text
+
+from migrations import create_index_concurrently, drop_index_concurrently
+
+CONCURRENT = True
+
+INDEXES = [
+    # misma persona, misma fecha y hora, en estatus activos: imposible a nivel BD
+    ("uq_inv_persona_fecha_hora",
+     "UNIQUE ON invitaciones (persona_id, fecha, hora) "
+     "WHERE estatus IN ('Confirmado', 'Sustituido')"),
+    # conflicts.load_index: agenda de (persona_id, fecha)
+    ("idx_inv_persona_fecha", "ON invitaciones (persona_id, fecha)"),
+    # /api/invitations: orden del tablero, con y sin ?status=
+    ("idx_inv_estatus_orden",
+     "ON invitaciones (estatus, fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC)"),
+    ("idx_inv_orden", "ON invitaciones (fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC)"),
+]
+
+DUPLICATES_SQL = """
+    SELECT persona_id, fecha, hora, array_agg(id ORDER BY id) AS ids
+    FROM invitaciones
+    WHERE estatus IN ('Confirmado', 'Sustituido')
+      AND persona_id IS NOT NULL AND fecha IS NOT NULL AND hora IS NOT NULL
+    GROUP BY persona_id, fecha, hora
+    HAVING COUNT(*) > 1
+"""
+
+def upgrade(conn):
+    dups = conn.execute(text(DUPLICATES_SQL)).all()
+    if dups:
+        lines = "\n".join(f"   persona {d.persona_id} {d.fecha} {d.hora}: invitaciones {d.ids}" for d in dups)
+        raise RuntimeError("Hay dobles asignaciones activas; corrígelas antes de crear "
+                           "uq_inv_persona_fecha_hora:\n" + lines)
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
+
+def downgrade(conn):
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(conn, name)
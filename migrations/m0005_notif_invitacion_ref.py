@@ -0,0 +1,84 @@
+# migrations/m0005_notif_invitacion_ref.py
+"""Notificaciones: invitacion_ref entero con FK a invitaciones (backfill por lotes, en línea)."""
+import os
+import time
+
+from sqlalchemy import text
+
+from migrations import create_index_concurrently, drop_index_concurrently
+
+CONCURRENT = True      # autocommit: cada lote del backfill es su propia transacción
+
+BATCH = int(os.getenv("MIGRATION_BATCH", "5000"))
+PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", "0.05"))   # respiro entre lotes (réplicas, autovacuum)
+
+FK = "fk_notif_invitacion"
+
+# Mientras el bot u otro proceso siga insertando solo el texto, el trigger llena la
+# columna nueva; si la invitación ya no existe queda NULL (el FK no lo permitiría).
+TRIGGER_DDL = [
+    r"""CREATE OR REPLACE FUNCTION notificaciones_invitacion_ref() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF NEW.invitacion_ref IS NULL AND NEW.invitacion_id ~ '^\d{1,9}$' THEN
+                SELECT id INTO NEW.invitacion_ref FROM invitaciones
+                WHERE id = NEW.invitacion_id::integer;
+            END IF;
+            RETURN NEW;
+        END $$""",
+    "DROP TRIGGER IF EXISTS trg_notif_invitacion_ref ON notificaciones",
+    """CREATE TRIGGER trg_notif_invitacion_ref BEFORE INSERT ON notificaciones
+        FOR EACH ROW EXECUTE FUNCTION notificaciones_invitacion_ref()""",
+]
+
+BACKFILL_SQL = r"""
+    UPDATE notificaciones n SET invitacion_ref = i.id
+    FROM invitaciones i
+    WHERE n.id >= :lo AND n.id < :hi
+      AND n.invitacion_ref IS NULL
+      AND n.invitacion_id ~ '^\d{1,9}$'
+      AND i.id = n.invitacion_id::integer
+"""
+
+def _constraint_exists(conn, name: str) -> bool:
+    return bool(conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = :n"), {"n": name}).first())
+
+def backfill(conn, verbose: bool = True) -> int:
+    """Por rangos de id: cada lote bloquea solo sus filas y hace commit (conn en autocommit)."""
+    lo, top = conn.execute(text("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) "
+                                "FROM notificaciones WHERE invitacion_ref IS NULL")).one()
+    total = 0
+    while lo <= top:
+        n = conn.execute(text(BACKFILL_SQL), {"lo": lo, "hi": lo + BATCH}).rowcount
+        total += n
+        lo += BATCH
+        if verbose and n:
+            print(f"   … {total} notificaciones enlazadas (id < {lo})")
+        if PAUSE:
+            time.sleep(PAUSE)
+    return total
+
+def upgrade(conn):
+    # si hay transacciones largas sobre la tabla, fallar rápido en vez de encolar a todos detrás
+    conn.execute(text("SET lock_timeout = '5s'"))
+    try:
+        # columna nullable sin default: solo catálogo, no reescribe la tabla
+        conn.execute(text("ALTER TABLE notificaciones ADD COLUMN IF NOT EXISTS invitacion_ref INTEGER"))
+        for ddl in TRIGGER_DDL:
+            conn.execute(text(ddl))
+        backfill(conn)
+        create_index_concurrently(conn, "idx_notif_inv_ref", "ON notificaciones (invitacion_ref)")
+        if not _constraint_exists(conn, FK):
+            # NOT VALID: no revisa lo existente (bloqueo corto); VALIDATE revisa sin bloquear escrituras
+            conn.execute(text(f"""ALTER TABLE notificaciones ADD CONSTRAINT {FK}
+                FOREIGN KEY (invitacion_ref) REFERENCES invitaciones (id) ON DELETE SET NULL NOT VALID"""))
+        conn.execute(text(f"ALTER TABLE notificaciones VALIDATE CONSTRAINT {FK}"))
+    finally:
+        conn.execute(text("RESET lock_timeout"))
+
+# la columna es del modelo (db.py): al revertir se quitan FK, índice y trigger
+def downgrade(conn):
+    conn.execute(text(f"ALTER TABLE notificaciones DROP CONSTRAINT IF EXISTS {FK}"))
+    drop_index_concurrently(conn, "idx_notif_inv_ref")
+    conn.execute(text("DROP TRIGGER IF EXISTS trg_notif_invitacion_ref ON notificaciones"))
+    conn.execute(text("DROP FUNCTION IF EXISTS notificaciones_invitacion_ref()"))
@@ -0,0 +1,14 @@
+# migrations/m0006_notif_history_index.py
+"""Historial por invitación: índice (invitacion_ref, ts, id), reemplaza a idx_notif_inv_ref."""
+from migrations import create_index_concurrently, drop_index_concurrently
+
+CONCURRENT = True
+
+def upgrade(conn):
+    # el nuevo cubre al viejo (mismo prefijo): se crea primero y luego se tira el otro
+    create_index_concurrently(conn, "idx_notif_inv_ref_ts", "ON notificaciones (invitacion_ref, ts, id)")
+    drop_index_concurrently(conn, "idx_notif_inv_ref")
+
+def downgrade(conn):
+    create_index_concurrently(conn, "idx_notif_inv_ref", "ON notificaciones (invitacion_ref)")
+    drop_index_concurrently(conn, "idx_notif_inv_ref_ts")
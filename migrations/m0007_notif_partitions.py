@@ -0,0 +1,58 @@
+# migrations/m0007_notif_partitions.py
+"""Notificaciones particionada por mes sobre ts (+ partición default)."""
+from sqlalchemy import text
+
+import partitions
+from migrations import is_partitioned
+from migrations.m0005_notif_invitacion_ref import FK, TRIGGER_DDL
+
+TABLE = partitions.TABLE
+OLD = f"{TABLE}_old"
+
+# Una sola transacción: se copia la tabla bajo ACCESS EXCLUSIVE (el bot y las
+# escrituras esperan lo que dure la copia). Si algo falla no queda nada a medias.
+
+def _swap(conn, partitioned: bool) -> None:
+    """Reemplaza notificaciones por una copia particionada (o normal), con sus índices."""
+    conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+    indexdefs = conn.execute(text(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = :t AND indexname <> :pk"),
+        {"t": TABLE, "pk": f"{TABLE}_pkey"}).scalars().all()
+    seq = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": TABLE}).scalar()
+
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {OLD}"))
+    conn.execute(text(f"ALTER TABLE {OLD} RENAME CONSTRAINT {TABLE}_pkey TO {OLD}_pkey"))
+    how = "PARTITION BY RANGE (ts)" if partitioned else ""
+    conn.execute(text(f"CREATE TABLE {TABLE} (LIKE {OLD} INCLUDING DEFAULTS) {how}"))
+    # la llave de partición va en la PK y no admite NULL (al revertir se deja igual que db.py)
+    conn.execute(text(f"UPDATE {OLD} SET ts = COALESCE(enviado_ts, localtimestamp) WHERE ts IS NULL"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN ts SET NOT NULL, "
+                      f"ALTER COLUMN ts SET DEFAULT localtimestamp"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, ts)"))
+    if partitioned:
+        since = conn.execute(text(f"SELECT min(ts) FROM {OLD}")).scalar()
+        partitions.ensure_partitions(conn, since=since)
+
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {OLD}"))
+    if seq:
+        conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {TABLE}.id"))
+    conn.execute(text(f"DROP TABLE {OLD} CASCADE"))
+
+    # los indexdef se leyeron con el nombre original: ya apuntan a la tabla nueva
+    for ddl in indexdefs:
+        conn.execute(text(ddl.replace(" ON ONLY ", " ON ")))
+    conn.execute(text(f"""ALTER TABLE {TABLE} ADD CONSTRAINT {FK}
+        FOREIGN KEY (invitacion_ref) REFERENCES invitaciones (id) ON DELETE SET NULL"""))
+    for ddl in TRIGGER_DDL:
+        conn.execute(text(ddl))
+
+def upgrade(conn):
+    if is_partitioned(conn, TABLE):
+        # BD nueva: create_all ya la creó particionada (db.py); solo faltan los meses
+        partitions.ensure_partitions(conn)
+        return
+    _swap(conn, partitioned=True)
+
+def downgrade(conn):
+    if is_partitioned(conn, TABLE):
+        _swap(conn, partitioned=False)
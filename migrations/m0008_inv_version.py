@@ -0,0 +1,10 @@
+# migrations/m0008_inv_version.py
+"""Invitaciones: columna version para concurrencia optimista (UPDATE ... WHERE version = ?)."""
+from sqlalchemy import text
+
+def upgrade(conn):
+    # DEFAULT constante: PostgreSQL 11+ no reescribe la tabla, las filas existentes quedan en 1
+    conn.execute(text("ALTER TABLE invitaciones ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+
+def downgrade(conn):
+    conn.execute(text("ALTER TABLE invitaciones DROP COLUMN IF EXISTS version"))
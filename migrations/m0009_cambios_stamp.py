@@ -0,0 +1,14 @@
+# migrations/m0009_cambios_stamp.py
+"""Bitácora del feed: version nullable (se sella tras el commit) + índice de las filas sin sellar."""
+from sqlalchemy import text
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE cambios_invitaciones ALTER COLUMN version DROP NOT NULL"))
+    # tabla chica (retención de días): sin CONCURRENTLY
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_cambios_sin_sello "
+                      "ON cambios_invitaciones (id) WHERE version IS NULL"))
+
+def downgrade(conn):
+    conn.execute(text("DROP INDEX IF EXISTS idx_cambios_sin_sello"))
+    conn.execute(text("DELETE FROM cambios_invitaciones WHERE version IS NULL"))
+    conn.execute(text("ALTER TABLE cambios_invitaciones ALTER COLUMN version SET NOT NULL"))
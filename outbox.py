@@ -0,0 +1,130 @@
+# outbox.py
+"""
+Outbox de notificaciones para el bot.
+
+Varias instancias del bot pueden consumir a la vez: cada una reclama un lote con
+FOR UPDATE SKIP LOCKED y le pone un lease (lease_owner/lease_until). Lo que no
+se confirme (ack) antes de que venza el lease vuelve a estar disponible.
+Los tiempos salen del reloj de la BD (localtimestamp), no del de cada worker.
+
+notificaciones está particionada por mes (partitions.py): claim() busca primero en
+los últimos OUTBOX_LOOKBACK_DAYS días, así el planner descarta las particiones viejas
+en vez de revisar el índice de pendientes de cada una (0 = sin límite). Si esa
+ventana no llena el lote y toca (cada OUTBOX_BACKLOG_SWEEP segundos por proceso),
+completa con pendientes más viejos (bot caído semanas, lease que nunca se confirmó):
+sin eso se quedarían sin enviar y su mes nunca se archivaría (partitions.archivable
+los deja bloqueados). Mientras ese barrido siga encontrando filas se repite en cada
+claim hasta vaciarlas; un bot ocioso no revisa las particiones viejas en cada poll.
+"""
+import os
+import time
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, func, or_
+
+from db import Notificacion
+
+MAX_BATCH = 500
+OUTBOX_LOOKBACK_DAYS = int(os.getenv("OUTBOX_LOOKBACK_DAYS", "30"))
+OUTBOX_BACKLOG_SWEEP = int(os.getenv("OUTBOX_BACKLOG_SWEEP", "600"))   # segundos
+
+_sweep = {"next": 0.0}   # monotonic del próximo barrido fuera de la ventana
+
+# columnas que viajan en cada mensaje (mismos nombres que la tabla)
+MESSAGE_COLS = (
+    "id", "ts", "invitacion_ref", "invitacion_id", "evento", "convoca", "convoca_cargo", "estatus",
+    "asignado_a_nombre", "rol", "campo", "valor_anterior", "valor_nuevo", "comentario",
+    "fecha", "hora", "municipio", "lugar",
+)
+CHANGE_COLS = ("campo", "valor_anterior", "valor_nuevo", "comentario", "ts")
+
+def _iso(v):
+    return v.isoformat() if v is not None else None
+
+def _row_to_dict(r) -> dict:
+    d = {c: getattr(r, c) for c in MESSAGE_COLS}
+    for c in ("ts", "fecha", "hora"):
+        d[c] = _iso(d[c])
+    return d
+
+
+def _claim(db, owner: str, limit: int, lease_seconds: int, window: list) -> list:
+    now = func.localtimestamp()
+    # la ventana va en ambos lados: el UPDATE también poda particiones al buscar los ids
+    pick = (select(Notificacion.id)
+            .where(Notificacion.enviado == False, *window)
+            .where(or_(Notificacion.lease_until.is_(None), Notificacion.lease_until < now))
+            .order_by(Notificacion.ts, Notificacion.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True))
+    stmt = (update(Notificacion)
+            .where(Notificacion.id.in_(pick.scalar_subquery()), *window)
+            .values(lease_owner=owner, lease_until=now + timedelta(seconds=lease_seconds))
+            .returning(*(getattr(Notificacion, c) for c in MESSAGE_COLS)))
+    return [_row_to_dict(r) for r in db.execute(stmt)]
+
+def claim(db, owner: str, limit: int = 50, lease_seconds: int = 120) -> list[dict]:
+    """Reclama hasta `limit` pendientes sin lease vigente; regresa filas en orden (ts, id)."""
+    limit = max(1, min(limit, MAX_BATCH))
+    if OUTBOX_LOOKBACK_DAYS <= 0:
+        rows = _claim(db, owner, limit, lease_seconds, [])
+    else:
+        cutoff = func.localtimestamp() - timedelta(days=OUTBOX_LOOKBACK_DAYS)
+        rows = _claim(db, owner, limit, lease_seconds, [Notificacion.ts >= cutoff])
+        missing = limit - len(rows)
+        if missing and time.monotonic() >= _sweep["next"]:
+            # lote sin llenar: lo que quedó atrás de la ventana (solo particiones viejas)
+            old = _claim(db, owner, missing, lease_seconds, [Notificacion.ts < cutoff])
+            if len(old) < missing:
+                _sweep["next"] = time.monotonic() + OUTBOX_BACKLOG_SWEEP
+            rows += old
+    rows.sort(key=lambda d: (d["ts"] or "", d["id"]))
+    return rows
+
+def ack(db, ids: list[int], owner: Optional[str] = None) -> int:
+    """Marca como enviadas; con `owner` solo las que siguen bajo ese lease."""
+    if not ids:
+        return 0
+    stmt = (update(Notificacion)
+            .where(Notificacion.id.in_(ids))
+            .where(Notificacion.enviado == False)
+            .values(enviado=True, enviado_ts=func.localtimestamp(),
+                    lease_owner=None, lease_until=None))
+    if owner:
+        stmt = stmt.where(Notificacion.lease_owner == owner)
+    return db.execute(stmt).rowcount
+
+
+def as_messages(rows: list[dict]) -> list[dict]:
+    """Un mensaje por notificación (con `ids` para que el ack sea igual en ambos modos)."""
+    return [{**r, "ids": [r["id"]]} for r in rows]
+
+def coalesce(rows: list[dict]) -> list[dict]:
+    """
+    Un mensaje por invitacion_id: snapshot de la fila más reciente + lista de cambios.
+    Varios cambios del mismo campo se funden (primer valor_anterior -> último valor_nuevo).
+    """
+    groups: dict = {}
+    for r in rows:
+        # filas previas al FK (o de invitaciones borradas) solo traen el texto
+        key = str(r["invitacion_ref"] or r["invitacion_id"])
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {"ids": [], "cambios": {}}
+        g["ids"].append(r["id"])
+        g["snapshot"] = r
+        prev = g["cambios"].get(r["campo"])
+        change = {c: r[c] for c in CHANGE_COLS}
+        if prev:
+            change["valor_anterior"] = prev["valor_anterior"]
+        g["cambios"][r["campo"]] = change
+
+    out = []
+    for g in groups.values():
+        msg = {k: v for k, v in g["snapshot"].items()
+               if k not in ("id", "campo", "valor_anterior", "valor_nuevo")}
+        msg["ids"] = g["ids"]
+        msg["cambios"] = list(g["cambios"].values())
+        out.append(msg)
+    return out
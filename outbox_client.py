@@ -0,0 +1,79 @@
+# outbox_client.py
+"""
+Cliente mínimo (solo stdlib) para que el bot consuma /api/outbox.
+
+    from outbox_client import OutboxClient
+
+    def enviar(msg):                 # regresa sin excepción = enviado
+        telegram.send(render(msg))
+
+    OutboxClient("https://mi-app.onrender.com", token="...").run(enviar)
+
+Cada mensaje trae `ids`; solo se confirman los que el handler procesó sin error.
+Los demás se reintentan cuando vence su lease.
+"""
+import json
+import logging
+import time
+import uuid
+import urllib.request
+from typing import Callable, Optional
+
+log = logging.getLogger("outbox_client")
+
+
+class OutboxClient:
+    def __init__(self, base_url: str, token: Optional[str] = None,
+                 owner: Optional[str] = None, timeout: int = 30):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.owner = owner or f"bot-{uuid.uuid4().hex[:8]}"
+        self.timeout = timeout
+
+    def _post(self, path: str, body: dict) -> dict:
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def claim(self, limit: int = 50, lease_seconds: int = 120, coalesce: bool = False) -> list[dict]:
+        data = self._post("/api/outbox/claim", {
+            "limit": limit, "lease_seconds": lease_seconds,
+            "coalesce": coalesce, "owner": self.owner,
+        })
+        return data.get("messages", [])
+
+    def ack(self, ids: list[int]) -> int:
+        if not ids:
+            return 0
+        return self._post("/api/outbox/ack", {"ids": ids, "lease": self.owner}).get("acked", 0)
+
+    def run(self, handler: Callable[[dict], None], limit: int = 50, lease_seconds: int = 120,
+            coalesce: bool = True, idle_sleep: float = 5.0,
+            stop: Optional[Callable[[], bool]] = None) -> None:
+        """Bucle reclamar -> handler -> ack; duerme `idle_sleep` cuando no hay pendientes."""
+        while not (stop and stop()):
+            try:
+                msgs = self.claim(limit, lease_seconds, coalesce)
+            except Exception:
+                log.exception("No se pudo reclamar lote")
+                time.sleep(idle_sleep)
+                continue
+            if not msgs:
+                time.sleep(idle_sleep)
+                continue
+
+            done = []
+            for m in msgs:
+                try:
+                    handler(m)
+                    done.extend(m["ids"])
+                except Exception:
+                    log.exception("Falló el envío de %s; se reintenta al vencer el lease", m["ids"])
+            self.ack(done)
@@ -0,0 +1,148 @@
+# parsing.py
+"""
+Parseo de fechas/horas capturadas por el usuario (una sola fuente de verdad).
+
+    parse_date_flexible('2026-11-01' | '01/11/2026' | '01/11/26') -> date | None
+    parse_time_flexible('10:30' | '10:30:15' | '3 pm' | '3:05 PM')  -> time | None
+
+Los formatos se compilan una vez; lo común entra por una regex y se arma el
+date/time directo, lo raro cae al camino de siempre (fromisoformat / strptime), así
+que el resultado es idéntico. Cada texto ya parseado se guarda en un LRU acotado:
+en importaciones y ediciones masivas se repiten mucho las mismas fechas y horas.
+
+Para columnas completas: parse_dates / parse_times regresan (valores, errores), dos
+listas paralelas; errores[i] es True si el valor venía lleno y no se pudo leer.
+"""
+import os
+import re
+from datetime import date, datetime, time as dtime
+from functools import lru_cache
+from typing import Iterable, Optional
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "4096"))
+
+_ISO_RE  = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_DMY_RE  = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})")
+_H24_RE  = re.compile(r"(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?")
+_AMPM_RE = re.compile(r"^(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?\s*(am|pm)$")
+
+# -----------------------------------------------------------------------------
+# Camino completo (el de siempre); solo se usa si la regex rápida no aplica
+# -----------------------------------------------------------------------------
+def _slow_date(s: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(s)
+    except ValueError:
+        pass
+    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _slow_time(v: str) -> Optional[dtime]:
+    m = _AMPM_RE.match(v)
+    try:
+        if m:
+            hh, mm, ss = int(m.group(1)), int(m.group(2) or 0), int(m.group(3) or 0)
+            if hh == 12:
+                hh = 0
+            if m.group(4) == "pm":
+                hh += 12
+            return dtime(hh, mm, ss)
+        parts = v.split(":")
+        if len(parts) == 2:
+            return dtime(int(parts[0]), int(parts[1]))
+        if len(parts) >= 3:
+            return dtime(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:      # '13 pm', '10:75'
+        return None
+    return None
+
+# -----------------------------------------------------------------------------
+# Un valor
+# -----------------------------------------------------------------------------
+def _year2(yy: str) -> int:
+    # misma regla que %y: 69-99 -> 19xx, 00-68 -> 20xx
+    y = int(yy)
+    return y + (1900 if y >= 69 else 2000)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _date(s: str) -> Optional[date]:
+    s = s.strip()
+    try:
+        m = _ISO_RE.fullmatch(s)
+        if m:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        m = _DMY_RE.fullmatch(s)
+        if m:
+            y = m.group(3)
+            return date(int(y) if len(y) == 4 else _year2(y), int(m.group(2)), int(m.group(1)))
+    except ValueError:      # 31/02/2026
+        return None
+    return _slow_date(s)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _time(s: str) -> Optional[dtime]:
+    v = s.strip().lower()
+    m = _H24_RE.fullmatch(v)
+    if m:
+        try:
+            return dtime(int(m.group(1)), int(m.group(2)), int(m.group(3) or 0))
+        except ValueError:
+            return None
+    return _slow_time(v)
+
+def parse_date_iso(s: Optional[str]) -> Optional[date]:
+    """Estricto: solo ISO YYYY-MM-DD."""
+    if not s:
+        return None
+    try:
+        return date.fromisoformat(s.strip())
+    except ValueError:
+        return None
+
+def parse_date_flexible(s: Optional[str]) -> Optional[date]:
+    """Tolerante: ISO (YYYY-MM-DD) o dd/mm/aaaa o dd/mm/aa."""
+    return _date(s) if s else None
+
+def parse_time_flexible(s: Optional[str]) -> Optional[dtime]:
+    """
+    Acepta:
+      - HH:MM
+      - HH:MM:SS
+      - 'h:mm am/pm' / 'hh am' (ej. '3 pm', '3:05 PM')
+    Lo que no es una hora válida ('13 pm', '10:75') regresa None.
+    """
+    return _time(s) if s else None
+
+# -----------------------------------------------------------------------------
+# Columnas completas
+# -----------------------------------------------------------------------------
+def _parse_column(values: Iterable, one) -> tuple[list, list[bool]]:
+    # cada texto distinto se parsea una sola vez
+    seen: dict = {}
+    out, errors = [], []
+    for v in values:
+        if not v:
+            out.append(None)
+            errors.append(False)
+            continue
+        r = seen.get(v, seen)
+        if r is seen:
+            r = seen[v] = one(v)
+        out.append(r)
+        errors.append(r is None)
+    return out, errors
+
+def parse_dates(values: Iterable[Optional[str]]) -> tuple[list[Optional[date]], list[bool]]:
+    """([date | None, ...], [error, ...]); vacíos -> None sin error."""
+    return _parse_column(values, _date)
+
+def parse_times(values: Iterable[Optional[str]]) -> tuple[list[Optional[dtime]], list[bool]]:
+    """([time | None, ...], [error, ...]); vacíos -> None sin error."""
+    return _parse_column(values, _time)
+
+def cache_info() -> dict:
+    return {"date": _date.cache_info()._asdict(), "time": _time.cache_info()._asdict()}
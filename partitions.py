@@ -0,0 +1,178 @@
+# partitions.py
+"""
+Particiones mensuales de notificaciones (RANGE sobre ts) y su retención.
+
+    notificaciones_y2026m10   [2026-10-01, 2026-11-01)
+    notificaciones_default    lo que no cae en ningún mes creado (no debería tener filas)
+
+ensure_partitions() crea los meses que falten hasta `ahead` meses adelante; si la
+partición default ya tiene filas de ese mes, las mueve a la nueva en la misma
+transacción. archive_old() toma los meses anteriores a la retención que ya no tienen
+pendientes de envío: los desprende de la tabla, los vuelca a JSONL comprimido en
+NOTIF_ARCHIVE_DIR, verifica el conteo y los borra. Un mes que quedó desprendido a
+medias (p. ej. se cayó el proceso al exportar) se termina en la siguiente corrida.
+
+Lo corre `python maintain_notifs.py` (cron diario/semanal).
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+
+TABLE = "notificaciones"
+DEFAULT = f"{TABLE}_default"
+_NAME_RE = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+NOTIF_PARTITIONS_AHEAD = int(os.getenv("NOTIF_PARTITIONS_AHEAD", "3"))
+NOTIF_RETENTION_MONTHS = int(os.getenv("NOTIF_RETENTION_MONTHS", "12"))
+NOTIF_ARCHIVE_DIR      = os.getenv("NOTIF_ARCHIVE_DIR", "archive/notificaciones")
+
+
+class Archived(NamedTuple):
+    partition: str
+    path: str
+    rows: int
+
+
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+def partition_month(name: str) -> Optional[date]:
+    m = _NAME_RE.match(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+def _db_today(conn) -> date:
+    # reloj de la BD, como outbox.py
+    return conn.execute(text("SELECT current_date")).scalar()
+
+def attached(conn) -> list[str]:
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:t AS regclass) ORDER BY 1"), {"t": TABLE}).scalars())
+
+def detached(conn) -> list[str]:
+    """Tablas con nombre de partición mensual que ya no cuelgan de notificaciones."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname LIKE :p "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid) ORDER BY 1"),
+        {"p": f"{TABLE}_y%"}).scalars()
+    return [r for r in rows if _NAME_RE.match(r)]
+
+# -----------------------------------------------------------------------------
+# Creación
+# -----------------------------------------------------------------------------
+def create_partition(conn, month: date) -> str:
+    """
+    Un mes nuevo. Se arma como tabla suelta, se le pasan las filas de ese mes que hubieran
+    caído en la default y se adjunta (índices, FK y triggers del padre se clonan al adjuntar).
+    """
+    name, lo, hi = partition_name(month), month, add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)"))
+    if DEFAULT in attached(conn):
+        conn.execute(text(f"""
+            WITH movidas AS (
+                DELETE FROM {DEFAULT} WHERE ts >= :lo AND ts < :hi RETURNING *
+            ) INSERT INTO {name} SELECT * FROM movidas"""), {"lo": lo, "hi": hi})
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+                      f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"))
+    return name
+
+def ensure_partitions(conn, ahead: int = NOTIF_PARTITIONS_AHEAD,
+                      since: Optional[date] = None) -> list[str]:
+    """Crea los meses faltantes de `since` (default: el mes actual) a hoy + `ahead` meses."""
+    today = month_start(_db_today(conn))
+    month = month_start(since) if since else today
+    have = set(attached(conn)) | set(detached(conn))
+    created = []
+    while month <= add_months(today, ahead):
+        if partition_name(month) not in have:
+            created.append(create_partition(conn, month))
+        month = add_months(month, 1)
+    if DEFAULT not in have:
+        conn.execute(text(f"CREATE TABLE {DEFAULT} PARTITION OF {TABLE} DEFAULT"))
+        created.append(DEFAULT)
+    return created
+
+# -----------------------------------------------------------------------------
+# Retención / archivo
+# -----------------------------------------------------------------------------
+def archivable(conn, retain: int = NOTIF_RETENTION_MONTHS) -> tuple[list[str], list[str]]:
+    """(meses a archivar, meses viejos que se quedan porque aún tienen pendientes)."""
+    cutoff = add_months(month_start(_db_today(conn)), -retain)
+    ready, blocked = [], []
+    for name in attached(conn):
+        month = partition_month(name)
+        if month is None or month >= cutoff:
+            continue
+        pending = conn.execute(text(f"SELECT 1 FROM {name} WHERE enviado = false LIMIT 1")).first()
+        (blocked if pending else ready).append(name)
+    return ready, blocked
+
+def detach(conn, name: str) -> None:
+    conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+
+def export(conn, name: str, dest_dir: str = NOTIF_ARCHIVE_DIR) -> Archived:
+    """Vuelca la tabla a <dest_dir>/<name>.jsonl.gz (temporal + rename: nunca queda a medias)."""
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, f"{name}.jsonl.gz")
+    tmp = path + ".tmp"
+    n = 0
+    result = conn.execution_options(yield_per=2000).execute(text(f"SELECT * FROM {name} ORDER BY ts, id"))
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for r in result.mappings():
+            f.write(json.dumps({k: _jsonable(v) for k, v in r.items()}, ensure_ascii=False))
+            f.write("\n")
+            n += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return Archived(name, path, n)
+
+def _jsonable(v):
+    # ts/fecha/hora como ISO; lo demás ya es JSON
+    return v.isoformat() if hasattr(v, "isoformat") else v
+
+def count_lines(path: str) -> int:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def archive_old(engine, retain: int = NOTIF_RETENTION_MONTHS, dest_dir: str = NOTIF_ARCHIVE_DIR,
+                dry_run: bool = False) -> tuple[list[Archived], list[str]]:
+    """
+    Archiva y borra los meses fuera de retención. Cada paso en su propia transacción:
+    desprender (bloqueo breve del padre) -> exportar -> verificar conteo -> DROP.
+    Regresa (archivados, meses que se quedaron por tener pendientes).
+    """
+    with engine.begin() as conn:
+        ready, blocked = archivable(conn, retain)
+        leftovers = detached(conn)
+    if dry_run:
+        return [Archived(n, os.path.join(dest_dir, f"{n}.jsonl.gz"), -1) for n in leftovers + ready], blocked
+
+    for name in ready:
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            detach(conn, name)
+    done = []
+    for name in leftovers + ready:
+        with engine.connect() as conn:
+            total = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            arch = export(conn, name, dest_dir)
+            conn.rollback()
+        if arch.rows != total or count_lines(arch.path) != total:
+            raise RuntimeError(f"{name}: se exportaron {arch.rows} de {total} filas; no se borra")
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {name}"))
+        done.append(arch)
+    return done, blocked
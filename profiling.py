@@ -0,0 +1,189 @@
+# profiling.py
+"""
+Instrumentación por request: cuántas consultas, cuánto tiempo en BD y cuáles fueron
+las más lentas.
+
+- Eventos de SQLAlchemy (before/after_cursor_execute) sobre el engine; solo anotan si
+  hay un request en curso (ContextVar), así que hilos de fondo (feed, outbox) no pagan
+  nada y cada hilo de gthread lleva su propia cuenta.
+- Al responder: header Server-Timing (lo muestra la pestaña Network del navegador)
+  y una línea JSON por request en el logger "requests".
+  En respuestas en streaming el header sale antes del cuerpo (solo cuenta lo previo);
+  la línea de log se escribe al cerrar la respuesta, ya con todo.
+- Consultas arriba de SQL_SLOW_MS se registran aparte con su SQL.
+- Espera por conexión del pool (db.POOL_WAIT_HOOKS): se suma al request (pool_wait_ms,
+  Server-Timing "pool") y si pasa de POOL_WAIT_LOG_MS se avisa con el estado del pool.
+- profile_request(): corre un GET interno bajo cProfile (/api/debug/profile).
+
+Costo: dos perf_counter y un ContextVar.get por consulta. SQL_STATS=0 lo apaga.
+"""
+import cProfile
+import heapq
+import io
+import json
+import logging
+import os
+import pstats
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from flask import request
+from sqlalchemy import event
+
+import db as dbmod
+
+SQL_STATS   = os.getenv("SQL_STATS", "1") != "0"
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+POOL_WAIT_LOG_MS = float(os.getenv("POOL_WAIT_LOG_MS", "100"))
+SQL_TOP     = 3        # consultas más lentas que se guardan por request
+SQL_MAXLEN  = 300      # caracteres de SQL en log/perfil
+
+log = logging.getLogger("requests")
+
+
+class RequestStats:
+    __slots__ = ("method", "path", "t0", "queries", "db_s", "pool_s", "slowest")
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.method, self.path = method, path
+        self.t0 = time.perf_counter()
+        self.queries = 0
+        self.db_s = 0.0
+        self.pool_s = 0.0            # espera por conexión del pool
+        self.slowest: list = []      # heap de (segundos, n, sql)
+
+    def add(self, dt: float, statement: str) -> None:
+        self.queries += 1
+        self.db_s += dt
+        item = (dt, self.queries, statement)
+        if len(self.slowest) < SQL_TOP:
+            heapq.heappush(self.slowest, item)
+        elif dt > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def summary(self) -> dict:
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.db_s * 1000, 2),
+            "pool_wait_ms": round(self.pool_s * 1000, 2),
+            "slowest": [{"ms": round(dt * 1000, 2), "sql": short_sql(sql)}
+                        for dt, _, sql in sorted(self.slowest, reverse=True)],
+        }
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+def short_sql(sql: str) -> str:
+    s = " ".join(sql.split())
+    return s if len(s) <= SQL_MAXLEN else s[:SQL_MAXLEN] + "…"
+
+# -----------------------------------------------------------------------------
+# Eventos del engine
+# -----------------------------------------------------------------------------
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._sql_t0 = time.perf_counter()
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    t0 = getattr(context, "_sql_t0", None)
+    if stats is None or t0 is None:
+        return
+    dt = time.perf_counter() - t0
+    stats.add(dt, statement)
+    if dt * 1000 >= SQL_SLOW_MS:
+        # sin `request`: en streaming el contexto de Flask ya se cerró
+        log.warning("consulta lenta %.1f ms %s %s: %s", dt * 1000, stats.method, stats.path,
+                    short_sql(statement))
+
+def install(engine) -> None:
+    if SQL_STATS:
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+        dbmod.POOL_WAIT_HOOKS.append(lambda dt: _pool_wait(engine.pool, dt))
+
+def _pool_wait(pool, dt: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_s += dt
+    if dt * 1000 >= POOL_WAIT_LOG_MS:
+        where = f"{stats.method} {stats.path}" if stats else "(fuera de request)"
+        log.warning("espera por conexión del pool %.1f ms %s: prestadas %d, overflow %d, tamaño %d",
+                    dt * 1000, where, pool.checkedout(), max(pool.overflow(), 0), pool.size())
+
+# -----------------------------------------------------------------------------
+# Flask
+# -----------------------------------------------------------------------------
+def server_timing(stats: RequestStats) -> str:
+    total = (time.perf_counter() - stats.t0) * 1000
+    return (f'db;dur={stats.db_s * 1000:.1f};desc="{stats.queries} consultas", '
+            f"pool;dur={stats.pool_s * 1000:.1f}, app;dur={total:.1f}")
+
+def _log_line(stats: RequestStats, endpoint: Optional[str], status: int) -> None:
+    line = {"method": stats.method, "path": stats.path, "endpoint": endpoint, "status": status,
+            "ms": round((time.perf_counter() - stats.t0) * 1000, 2), **stats.summary()}
+    log.info(json.dumps(line, ensure_ascii=False))
+
+def init_app(app) -> None:
+    """before/after_request: una RequestStats por request, Server-Timing y línea de log."""
+    if not SQL_STATS:
+        return
+    if not log.handlers:
+        h = logging.StreamHandler()
+        h.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        log.addHandler(h)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+
+    @app.before_request
+    def _start_stats():
+        # profile_request() trae la suya para leerla al final
+        stats = request.environ.get("sql_stats.profile") or RequestStats(request.method, request.path)
+        request.environ["sql_stats.token"] = _current.set(stats)
+
+    @app.after_request
+    def _finish_stats(resp):
+        token = request.environ.pop("sql_stats.token", None)
+        if token is None:
+            return resp
+        stats = token.var.get()
+        resp.headers["Server-Timing"] = server_timing(stats)
+        endpoint, status = request.endpoint, resp.status_code
+
+        def done():
+            # al terminar de mandar el cuerpo (streaming incluido)
+            _log_line(stats, endpoint, status)
+            try:
+                _current.reset(token)
+            except ValueError:      # se cerró desde otro contexto
+                _current.set(None)
+        resp.call_on_close(done)
+        return resp
+
+# -----------------------------------------------------------------------------
+# cProfile bajo demanda
+# -----------------------------------------------------------------------------
+def profile_request(app, path: str, sort: str = "cumulative", limit: int = 40,
+                    headers: Optional[dict] = None) -> dict:
+    """Corre GET `path` dentro del proceso con cProfile; regresa tiempos, SQL y el perfil en texto."""
+    client = app.test_client()
+    stats = RequestStats("GET", path)
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        resp = client.get(path, headers=headers or {}, environ_base={"sql_stats.profile": stats})
+        body = resp.get_data()           # consume el streaming dentro del perfil
+        resp.close()
+    finally:
+        prof.disable()
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return {
+        "path": path, "status": resp.status_code, "bytes": len(body),
+        "ms": round((time.perf_counter() - stats.t0) * 1000, 2),
+        "sql": stats.summary(),
+        "profile": out.getvalue(),
+    }
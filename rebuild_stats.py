@@ -0,0 +1,44 @@
+# rebuild_stats.py
+"""
+Reconstruye y verifica el rollup diario de KPIs (invitaciones_daily_stats).
+
+    python rebuild_stats.py            # reinstala triggers, recalcula y verifica
+    python rebuild_stats.py --verify   # solo compara contra un recuento en vivo
+
+Sale con código 1 si el rollup no cuadra con las invitaciones.
+"""
+import sys
+
+from cache import bump_data_version
+from db import engine, SessionLocal
+import rollups
+
+def main(argv: list[str]) -> int:
+    if "--verify" not in argv:
+        print("⏳ Recalculando invitaciones_daily_stats...")
+        with engine.begin() as conn:
+            rollups.install(conn)
+            n = rollups.rebuild(conn)
+        print(f"✅ {n} filas en el rollup.")
+
+        # los contadores en caché (cache.py) se invalidan con la versión
+        db = SessionLocal()
+        try:
+            bump_data_version(db)
+            db.commit()
+        finally:
+            db.close()
+
+    with engine.connect() as conn:
+        diffs = rollups.verify(conn)
+    if diffs:
+        print(f"❌ {len(diffs)} llaves no cuadran:")
+        for d in diffs[:50]:
+            print(f"   {d['fecha']} | {d['estatus']} | {d['municipio']} | {d['partido']}: "
+                  f"vivo={d['vivo']} rollup={d['rollup']}")
+        return 1
+    print("✅ El rollup coincide con el recuento en vivo.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,155 @@
+# rollups.py
+"""
+Rollup diario de invitaciones para los KPIs (tabla invitaciones_daily_stats).
+
+Una fila por (fecha, estatus, municipio, partido) con su `total`. La mantienen
+triggers por SENTENCIA de la tabla invitaciones (con tablas de transición), así que
+cualquier escritura cuenta (ORM, bulk, SQL a mano) y un UPDATE/INSERT masivo
+aplica sus deltas en un solo upsert, en orden de llave (sin deadlocks entre lotes).
+Las filas del rollup son lo único compartido que bloquea una escritura de invitaciones:
+la versión de datos (version_datos) sube después del commit, en su propia transacción
+(cache.py), así que un alta y un cambio de estatus con la misma llave no se cruzan.
+
+/api/counters y /api/stats suman unas cuantas filas de aquí en vez de agrupar
+todas las invitaciones. `python rebuild_stats.py` recalcula y verifica.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text, select, func
+
+from db import EstadisticaDiaria
+
+ESTATUS = ("Pendiente", "Confirmado", "Sustituido", "Cancelado")
+
+TABLE = "invitaciones_daily_stats"
+
+# Llave del rollup a partir de una fila de invitaciones (alias r). Mismas reglas que
+# los contadores: estatus vacío cuenta como Pendiente.
+KEY_SQL = ("r.fecha, COALESCE(NULLIF(r.estatus, ''), 'Pendiente'), "
+           "COALESCE(r.municipio, ''), COALESCE(r.partido_politico, '')")
+
+# fecha NULL también es una llave (invitaciones sin fecha cuentan en el total)
+CONFLICT_SQL = "((COALESCE(fecha, DATE '0001-01-01')), estatus, municipio, partido)"
+
+UPSERT_SQL = f"""
+    INSERT INTO {TABLE} AS t (fecha, estatus, municipio, partido, total)
+    SELECT fecha, estatus, municipio, partido, delta FROM d
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT {CONFLICT_SQL} DO UPDATE SET total = t.total + EXCLUDED.total
+"""
+
+def _deltas(sources: str) -> str:
+    return f"""
+    WITH d AS (
+        SELECT fecha, estatus, municipio, partido, SUM(delta) AS delta
+        FROM ({sources}) k (fecha, estatus, municipio, partido, delta)
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+    )"""
+
+_FROM_NEW = f"SELECT {KEY_SQL}, 1 FROM nuevas r"
+_FROM_OLD = f"SELECT {KEY_SQL}, -1 FROM viejas r"
+
+DDL = [
+    f"""CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_stats
+        ON {TABLE} ((COALESCE(fecha, DATE '0001-01-01')), estatus, municipio, partido)""",
+
+    # En UPDATE se resta la llave vieja y se suma la nueva; si no cambió, se anulan
+    # (HAVING) y no se toca ninguna fila del rollup.
+    f"""CREATE OR REPLACE FUNCTION invitaciones_daily_stats_trg() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_deltas(_FROM_NEW)} {UPSERT_SQL};
+            ELSIF TG_OP = 'DELETE' THEN
+                {_deltas(_FROM_OLD)} {UPSERT_SQL};
+            ELSE
+                {_deltas(_FROM_OLD + " UNION ALL " + _FROM_NEW)} {UPSERT_SQL};
+            END IF;
+            RETURN NULL;
+        END $$""",
+
+    f"""CREATE OR REPLACE FUNCTION invitaciones_daily_stats_truncate() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            TRUNCATE {TABLE};
+            RETURN NULL;
+        END $$""",
+
+    "DROP TRIGGER IF EXISTS trg_daily_stats_ins ON invitaciones",
+    """CREATE TRIGGER trg_daily_stats_ins AFTER INSERT ON invitaciones
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION invitaciones_daily_stats_trg()""",
+
+    "DROP TRIGGER IF EXISTS trg_daily_stats_upd ON invitaciones",
+    """CREATE TRIGGER trg_daily_stats_upd AFTER UPDATE ON invitaciones
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION invitaciones_daily_stats_trg()""",
+
+    "DROP TRIGGER IF EXISTS trg_daily_stats_del ON invitaciones",
+    """CREATE TRIGGER trg_daily_stats_del AFTER DELETE ON invitaciones
+        REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION invitaciones_daily_stats_trg()""",
+
+    "DROP TRIGGER IF EXISTS trg_daily_stats_truncate ON invitaciones",
+    """CREATE TRIGGER trg_daily_stats_truncate AFTER TRUNCATE ON invitaciones
+        FOR EACH STATEMENT EXECUTE FUNCTION invitaciones_daily_stats_truncate()""",
+]
+
+# -----------------------------------------------------------------------------
+# Instalación / reconstrucción
+# -----------------------------------------------------------------------------
+def install(conn) -> None:
+    """Crea índice, funciones y triggers (idempotente). La tabla la crea create_all."""
+    for ddl in DDL:
+        conn.execute(text(ddl))
+
+def rebuild(conn) -> int:
+    """
+    Recalcula el rollup desde cero. Bloquea escrituras de invitaciones (SHARE) hasta
+    el commit para que nada se cuele entre el recuento y el reemplazo.
+    """
+    conn.execute(text("LOCK TABLE invitaciones IN SHARE MODE"))
+    conn.execute(text(f"DELETE FROM {TABLE}"))
+    return conn.execute(text(f"""
+        INSERT INTO {TABLE} (fecha, estatus, municipio, partido, total)
+        SELECT {KEY_SQL}, COUNT(*) FROM invitaciones r
+        GROUP BY 1, 2, 3, 4
+    """)).rowcount
+
+def verify(conn) -> list[dict]:
+    """Llaves donde el rollup no coincide con un recuento en vivo (vacío = todo bien)."""
+    rows = conn.execute(text(f"""
+        WITH vivo (fecha, estatus, municipio, partido, n) AS (
+            SELECT {KEY_SQL}, COUNT(*) FROM invitaciones r GROUP BY 1, 2, 3, 4
+        ), rollup (fecha, estatus, municipio, partido, n) AS (
+            SELECT fecha, estatus, municipio, partido, SUM(total) FROM {TABLE}
+            GROUP BY 1, 2, 3, 4 HAVING SUM(total) <> 0
+        )
+        SELECT COALESCE(v.fecha, r.fecha) AS fecha, COALESCE(v.estatus, r.estatus) AS estatus,
+               COALESCE(v.municipio, r.municipio) AS municipio,
+               COALESCE(v.partido, r.partido) AS partido,
+               COALESCE(v.n, 0) AS vivo, COALESCE(r.n, 0) AS rollup
+        FROM vivo v FULL JOIN rollup r
+          ON COALESCE(v.fecha, DATE '0001-01-01') = COALESCE(r.fecha, DATE '0001-01-01')
+         AND v.estatus = r.estatus AND v.municipio = r.municipio AND v.partido = r.partido
+        WHERE v.n IS DISTINCT FROM r.n
+        ORDER BY 1, 2, 3, 4
+    """)).mappings().all()
+    return [dict(r) for r in rows]
+
+# -----------------------------------------------------------------------------
+# Lectura
+# -----------------------------------------------------------------------------
+def status_counts(db, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """{estatus: total} en el rango (sin rango incluye las invitaciones sin fecha)."""
+    stmt = select(EstadisticaDiaria.estatus, func.sum(EstadisticaDiaria.total))
+    if date_from:
+        stmt = stmt.where(EstadisticaDiaria.fecha >= date_from)
+    if date_to:
+        stmt = stmt.where(EstadisticaDiaria.fecha <= date_to)
+    counts = {e: 0 for e in ESTATUS}
+    for est, n in db.execute(stmt.group_by(EstadisticaDiaria.estatus)):
+        counts[est] = int(n or 0)
+    return counts
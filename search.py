@@ -0,0 +1,302 @@
+# search.py
+"""
+Búsqueda de invitaciones (/api/invitations/search).
+
+PostgreSQL: dos columnas GENERATED en invitaciones (se mantienen solas en cada
+INSERT/UPDATE, no hay que tocar los endpoints de escritura):
+  search_vec  tsvector 'spanish' con pesos evento A, convoca B, municipio/lugar C,
+              observaciones D; el texto se pliega antes (minúsculas, sin acentos)
+  search_txt  evento+convoca+municipio+lugar plegado, para pg_trgm (errores de dedo)
+ambas con índice GIN. El plegado es f_unaccent() con translate(): IMMUTABLE y sin
+depender de la extensión unaccent (no siempre está disponible). pg_trgm es opcional:
+si no se puede instalar, la búsqueda queda solo en texto completo.
+
+Resultados por relevancia (ts_rank_cd normalizado + word_similarity) con cursor
+keyset (score, id). Sin esas columnas (otra BD, o SEARCH_BACKEND=memory) se usa un
+índice invertido en memoria que sigue a la bitácora de cambios (feed.py): solo se
+vuelven a indexar las invitaciones anotadas en cambios_invitaciones desde la última
+versión vista; se reconstruye entero solo si la bitácora ya no cubre ese hueco.
+"""
+import base64
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from difflib import get_close_matches
+from typing import Optional
+
+from sqlalchemy import select, func, literal, literal_column, and_, or_, text
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+
+from db import CambioInvitacion, Invitacion
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")                   # auto | pg | memory
+FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.5"))   # word_similarity
+MAX_LIMIT = 200
+
+# (columna, peso tsvector, peso en memoria)
+FIELDS = (
+    ("evento",        "A", 1.0),
+    ("convoca",       "B", 0.4),
+    ("municipio",     "C", 0.2),
+    ("lugar",         "C", 0.2),
+    ("observaciones", "D", 0.1),
+)
+TRGM_FIELDS = ("evento", "convoca", "municipio", "lugar")
+
+_FOLD_FROM = "áàäâãéèëêíìïîóòöôõúùüûñç"
+_FOLD_TO   = "aaaaaeeeeiiiiooooouuuunc"
+_FOLD = str.maketrans(_FOLD_FROM, _FOLD_TO)
+
+def fold(s: Optional[str]) -> str:
+    """Igual que f_unaccent() en SQL: minúsculas y sin acentos."""
+    return (s or "").lower().translate(_FOLD)
+
+def tokens(s: Optional[str]) -> list[str]:
+    return re.findall(r"[a-z0-9]+", fold(s))
+
+# -----------------------------------------------------------------------------
+# DDL (init_db.py)
+# -----------------------------------------------------------------------------
+def _vec_sql() -> str:
+    parts = [f"setweight(to_tsvector('spanish'::regconfig, f_unaccent(coalesce({c}, ''))), '{w}')"
+             for c, w, _ in FIELDS]
+    return " || ".join(parts)
+
+def _txt_sql() -> str:
+    return "f_unaccent(" + " || ' ' || ".join(f"coalesce({c}, '')" for c in TRGM_FIELDS) + ")"
+
+DDL = [
+    f"""CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+        $$ SELECT translate(lower($1), '{_FOLD_FROM}', '{_FOLD_TO}') $$""",
+    f"""ALTER TABLE invitaciones ADD COLUMN IF NOT EXISTS search_vec tsvector
+        GENERATED ALWAYS AS ({_vec_sql()}) STORED""",
+    f"""ALTER TABLE invitaciones ADD COLUMN IF NOT EXISTS search_txt text
+        GENERATED ALWAYS AS ({_txt_sql()}) STORED""",
+    "CREATE INDEX IF NOT EXISTS idx_invitaciones_search_vec ON invitaciones USING gin (search_vec)",
+]
+TRGM_DDL = [
+    "CREATE INDEX IF NOT EXISTS idx_invitaciones_search_trgm ON invitaciones "
+    "USING gin (search_txt gin_trgm_ops)",
+]
+
+def install(conn) -> bool:
+    """Columnas + índices de búsqueda (idempotente). Regresa si quedó pg_trgm."""
+    for ddl in DDL:
+        conn.execute(text(ddl))
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception:
+        print("⚠️  pg_trgm no disponible: búsqueda sin coincidencia difusa.")
+        return False
+    for ddl in TRGM_DDL:
+        conn.execute(text(ddl))
+    return True
+
+# -----------------------------------------------------------------------------
+# Cursor (score, id)
+# -----------------------------------------------------------------------------
+def encode_cursor(score: float, inv_id: int) -> str:
+    raw = json.dumps([score, inv_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(s: str) -> tuple:
+    """ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+        score, inv_id = json.loads(raw)
+        return float(score), int(inv_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+# -----------------------------------------------------------------------------
+# Backend PostgreSQL
+# -----------------------------------------------------------------------------
+_caps: dict = {}
+_caps_lock = threading.Lock()
+
+def capabilities(db) -> dict:
+    """
+    {"pg": hay columnas de búsqueda, "trgm": hay pg_trgm}; se consulta una vez por proceso.
+    La consulta va fuera del candado: en asgi.py corre en un greenlet del loop y otra
+    corrutina del mismo hilo se quedaría esperándolo para siempre.
+    """
+    if _caps:
+        return _caps
+    pg = trgm = False
+    if SEARCH_BACKEND != "memory" and db.get_bind().dialect.name == "postgresql":
+        pg = bool(db.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'invitaciones' AND column_name = 'search_vec'")).first())
+        trgm = pg and bool(db.execute(text(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first())
+    if SEARCH_BACKEND == "pg" and not pg:
+        raise RuntimeError("SEARCH_BACKEND=pg pero faltan columnas de búsqueda (corre init_db.py)")
+    with _caps_lock:
+        _caps.update(pg=pg, trgm=trgm)
+    return _caps
+
+def _search_pg(db, q: str, filters: list, limit: int, cursor: Optional[tuple],
+               trgm: bool) -> list[tuple]:
+    toks = tokens(q)
+    vec = literal_column("invitaciones.search_vec")
+    txt = literal_column("invitaciones.search_txt")
+    # prefijo en cada término: "reuni" encuentra "reunión" mientras se escribe
+    tsq = func.to_tsquery(literal_column("'spanish'::regconfig"), " & ".join(t + ":*" for t in toks))
+
+    match = vec.op("@@")(tsq)
+    score = func.ts_rank_cd(vec, tsq, 32)           # 32: rank/(rank+1), en [0, 1)
+    if trgm:
+        qtxt = " ".join(toks)
+        db.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(FUZZY_THRESHOLD), True)))
+        match = or_(match, literal(qtxt).op("<%")(txt))
+        score = score + func.word_similarity(qtxt, txt)
+
+    ranked = (select(Invitacion.id.label("id"), score.cast(DOUBLE_PRECISION).label("score"))
+              .where(match, *filters)
+              .subquery())
+    stmt = select(ranked.c.id, ranked.c.score)
+    if cursor:
+        s, i = cursor
+        stmt = stmt.where(or_(ranked.c.score < s, and_(ranked.c.score == s, ranked.c.id < i)))
+    stmt = stmt.order_by(ranked.c.score.desc(), ranked.c.id.desc()).limit(limit + 1)
+    return [(r.id, r.score) for r in db.execute(stmt)]
+
+# -----------------------------------------------------------------------------
+# Backend en memoria (sin columnas de búsqueda)
+# -----------------------------------------------------------------------------
+class InvertedIndex:
+    """
+    token -> {id: peso}; prefijos con bisect sobre el vocabulario ordenado.
+    No se modifica una vez armado (lo leen varios hilos sin candado): updated() regresa
+    otro índice que comparte las listas de los términos que no tocó.
+    """
+
+    def __init__(self, docs=()):
+        self.postings: dict = {}
+        self.doc_terms: dict = {}      # id -> términos del documento (para sacarlo en updated)
+        for doc in docs:
+            self._add(doc, lambda t: self.postings.setdefault(t, {}))
+        self.vocab = sorted(self.postings)
+
+    def _add(self, doc, posting) -> None:
+        inv_id, *values = doc
+        terms = set()
+        for (_, _, weight), value in zip(FIELDS, values):
+            for t in tokens(value):
+                p = posting(t)
+                p[inv_id] = p.get(inv_id, 0.0) + weight
+                terms.add(t)
+        self.doc_terms[inv_id] = terms
+
+    def updated(self, ids, docs) -> "InvertedIndex":
+        """Copia con las invitaciones `ids` reindexadas desde `docs`; las que no vengan se quitan."""
+        new = InvertedIndex()
+        new.postings = dict(self.postings)
+        new.doc_terms = dict(self.doc_terms)
+        copied = set()
+
+        def posting(t: str) -> dict:
+            if t not in copied:
+                new.postings[t] = dict(new.postings.get(t, ()))
+                copied.add(t)
+            return new.postings[t]
+
+        for inv_id in ids:
+            for t in new.doc_terms.pop(inv_id, ()):
+                posting(t).pop(inv_id, None)
+        for doc in docs:
+            new._add(doc, posting)
+        for t in copied:
+            if not new.postings[t]:
+                del new.postings[t]
+        new.vocab = sorted(new.postings)
+        return new
+
+    def _terms(self, tok: str) -> list[str]:
+        lo = bisect_left(self.vocab, tok)
+        hi = bisect_left(self.vocab, tok + "\uffff")
+        if lo < hi:
+            return self.vocab[lo:hi]
+        # sin prefijo: candidatos parecidos (errores de dedo)
+        return get_close_matches(tok, self.vocab, n=3, cutoff=0.75)
+
+    def search(self, q: str) -> list[tuple]:
+        """[(id, score)] con todos los términos (AND), de mayor a menor relevancia."""
+        scores: Optional[dict] = None
+        for tok in tokens(q):
+            hits: dict = {}
+            for term in self._terms(tok):
+                exact = 1.0 if term == tok else 0.5
+                for inv_id, w in self.postings[term].items():
+                    hits[inv_id] = max(hits.get(inv_id, 0.0), w * exact)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {i: s + hits[i] for i, s in scores.items() if i in hits}
+            if not scores:
+                return []
+        return sorted((scores or {}).items(), key=lambda kv: (-kv[1], -kv[0]))
+
+
+_mem = {"version": None, "index": None}
+_mem_lock = threading.Lock()
+
+def _changed_since(db, since: int, version: int) -> Optional[list[int]]:
+    """Invitaciones anotadas en (since, version]; None si la bitácora ya no cubre `since`."""
+    oldest = db.execute(select(func.min(CambioInvitacion.version))).scalar()
+    if oldest is None or since < oldest - 1 or since > version:
+        return None
+    return list(db.execute(select(CambioInvitacion.invitacion_id).distinct()
+                           .where(CambioInvitacion.version > since,
+                                  CambioInvitacion.version <= version)).scalars())
+
+def memory_index(db) -> InvertedIndex:
+    # versión de la bitácora, no la de datos: altas de personas, etc. no tocan el índice
+    version = db.execute(select(func.max(CambioInvitacion.version))).scalar() or 0
+    with _mem_lock:
+        index, since = _mem["index"], _mem["version"]
+    if index is not None and since == version:
+        return index
+    # se arma fuera del candado (ver capabilities); dos requests simultáneos pueden
+    # hacerlo a la vez, se queda el último
+    docs = select(Invitacion.id, *[getattr(Invitacion, c) for c, _, _ in FIELDS])
+    changed = _changed_since(db, since, version) if index is not None else None
+    if changed is None:
+        index = InvertedIndex(db.execute(docs))
+    else:
+        index = index.updated(changed, db.execute(docs.where(Invitacion.id.in_(changed))))
+    with _mem_lock:
+        _mem.update(version=version, index=index)
+    return index
+
+def _search_memory(db, q: str, filters: list, limit: int, cursor: Optional[tuple]) -> list[tuple]:
+    ranked = memory_index(db).search(q)
+    if filters and ranked:
+        allowed = set(db.execute(select(Invitacion.id)
+                                 .where(Invitacion.id.in_([i for i, _ in ranked]), *filters)).scalars())
+        ranked = [r for r in ranked if r[0] in allowed]
+    if cursor:
+        s, i = cursor
+        ranked = [r for r in ranked if r[1] < s or (r[1] == s and r[0] < i)]
+    return ranked[:limit + 1]
+
+# -----------------------------------------------------------------------------
+# API
+# -----------------------------------------------------------------------------
+def search(db, q: str, filters: list, limit: int = 50,
+           cursor: Optional[tuple] = None) -> tuple[list[tuple], Optional[str], str]:
+    """([(id, score)] de la página, next_cursor, backend)."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not tokens(q):
+        return [], None, "none"
+    caps = capabilities(db)
+    if caps["pg"]:
+        rows, backend = _search_pg(db, q, filters, limit, cursor, caps["trgm"]), "pg"
+    else:
+        rows, backend = _search_memory(db, q, filters, limit, cursor), "memory"
+    nxt = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], nxt, backend
@@ -0,0 +1,191 @@
+# serializers.py
+"""
+Payload de invitaciones para listados, búsqueda, detalle y feed.
+
+Trabaja sobre Rows de un select de columnas (ver app.inv_select), nunca sobre el
+ORM. Cada campo público declara las columnas que necesita -> proyección en SQL.
+
+Un RowSerializer vive lo que dura una respuesta:
+  - `today` se calcula una vez (DiasParaEvento)
+  - cada fecha/hora distinta se formatea una vez (Fecha, FechaISO, FechaFmt salen
+    del mismo texto) y se reutiliza en todas las filas que la repiten
+
+Versiones de respuesta (?v=):
+  1  todas las llaves de siempre (default)
+  2  compacta: sin los alias FechaISO/HoraISO (mismo valor que Fecha/Hora)
+
+dumps() usa orjson si está instalado (opcional), si no json con separadores compactos.
+"""
+import json
+from datetime import date, datetime, time as dtime
+from typing import AsyncIterable, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:     # opcional: no está en requirements.txt
+    orjson = None
+
+# -----------------------------------------------------------------------------
+# Formatos
+# -----------------------------------------------------------------------------
+def fmt_date(d: Optional[date]) -> str:
+    return d.strftime("%d/%m/%y") if d else ""
+
+def fmt_time(t: Optional[dtime]) -> str:
+    return t.strftime("%H:%M") if t else ""
+
+def fmt_dt(dtobj: Optional[datetime]) -> str:
+    return dtobj.strftime("%d/%m/%y %H:%M") if dtobj else ""
+
+def iso(d: Optional[date]) -> Optional[str]:
+    return d.isoformat() if d else None
+
+def hhmm(t: Optional[dtime]) -> Optional[str]:
+    return t.strftime("%H:%M") if t else None
+
+# -----------------------------------------------------------------------------
+# Campos: llave pública -> (columnas, getter(row, serializer))
+# -----------------------------------------------------------------------------
+INV_FIELDS = {
+    "ID":                    (("id",),                lambda r, s: r.id),
+    "PersonaID":             (("persona_id",),        lambda r, s: r.persona_id),
+    "Evento":                (("evento",),            lambda r, s: r.evento or ""),
+    "Convoca Cargo":         (("convoca_cargo",),     lambda r, s: r.convoca_cargo or ""),
+    "Convoca":               (("convoca",),           lambda r, s: r.convoca or ""),
+    "Partido Político":      (("partido_politico",),  lambda r, s: r.partido_politico or ""),
+    "Fecha":                 (("fecha",),             lambda r, s: s.fecha(r.fecha)[0]),
+    "Hora":                  (("hora",),              lambda r, s: s.hora(r.hora)[0]),
+    "FechaISO":              (("fecha",),             lambda r, s: s.fecha(r.fecha)[0]),
+    "HoraISO":               (("hora",),              lambda r, s: s.hora(r.hora)[0]),
+    "FechaFmt":              (("fecha",),             lambda r, s: s.fecha(r.fecha)[1]),
+    "HoraFmt":               (("hora",),              lambda r, s: s.hora(r.hora)[1]),
+    "Municipio/Dependencia": (("municipio",),         lambda r, s: r.municipio or ""),
+    "Lugar":                 (("lugar",),             lambda r, s: r.lugar or ""),
+    "Estatus":               (("estatus",),           lambda r, s: r.estatus or "Pendiente"),
+    "Asignado A":            (("persona_nombre", "asignado_a"),
+                                                      lambda r, s: r.persona_nombre or r.asignado_a or ""),
+    "PersonaNombre":         (("persona_nombre",),    lambda r, s: r.persona_nombre),
+    "Rol":                   (("rol",),               lambda r, s: r.rol or ""),
+    "Observaciones":         (("observaciones",),     lambda r, s: r.observaciones or ""),
+    "Fecha Asignación":      (("fecha_asignacion",),  lambda r, s: fmt_dt(r.fecha_asignacion)),
+    "Última Modificación":   (("ultima_modificacion",), lambda r, s: fmt_dt(r.ultima_modificacion)),
+    "Modificado Por":        (("modificado_por",),    lambda r, s: r.modificado_por or ""),
+    "ArchivoURL":            (("archivo_url",),       lambda r, s: r.archivo_url or ""),
+    "ArchivoNombre":         (("archivo_nombre",),    lambda r, s: r.archivo_nombre or ""),
+    "ArchivoMime":           (("archivo_mime",),      lambda r, s: r.archivo_mime or ""),
+    "ArchivoTamano":         (("archivo_tamano",),    lambda r, s: r.archivo_tamano or 0),
+    "ArchivoTS":             (("archivo_ts",),        lambda r, s: fmt_dt(r.archivo_ts)),
+    "DiasParaEvento":        (("fecha",),             lambda r, s: s.fecha(r.fecha)[2]),
+    # versión de la fila: el cliente la regresa al escribir (If-Match / "version")
+    "Version":               (("version",),           lambda r, s: r.version),
+}
+
+# alias que la versión compacta no manda
+ALIASES = {"FechaISO": "Fecha", "HoraISO": "Hora"}
+VERSIONS = (1, 2)
+
+def default_fields(version: int = 1) -> list[str]:
+    return [f for f in INV_FIELDS if version < 2 or f not in ALIASES]
+
+def parse_version(raw: Optional[str]) -> int:
+    """?v=1|2 (vacío = 1). ValueError si no es una versión conocida."""
+    if not raw:
+        return 1
+    try:
+        v = int(raw)
+    except ValueError:
+        v = None
+    if v not in VERSIONS:
+        raise ValueError(f"Versión desconocida: {raw}")
+    return v
+
+def parse_fields(raw: Optional[str], version: int = 1) -> list[str]:
+    """?fields=ID,Evento,Fecha -> lista validada (vacío = todos). ValueError si hay desconocidos."""
+    if not raw:
+        return default_fields(version)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in INV_FIELDS]
+    if unknown:
+        raise ValueError("Campos desconocidos: " + ", ".join(unknown))
+    return fields
+
+def needed_columns(fields: Iterable[str]) -> set[str]:
+    needed = set()
+    for f in fields:
+        needed.update(INV_FIELDS[f][0])
+    return needed
+
+# -----------------------------------------------------------------------------
+# Serializador por respuesta
+# -----------------------------------------------------------------------------
+class RowSerializer:
+    """Callable Row -> dict; uno por respuesta (no compartir entre requests: `today`)."""
+
+    def __init__(self, fields: list[str], today: Optional[date] = None):
+        self.fields = fields
+        self.today = today or date.today()
+        self._getters = [(f, INV_FIELDS[f][1]) for f in fields]
+        self._fechas: dict = {}
+        self._horas: dict = {}
+
+    def fecha(self, d: Optional[date]) -> tuple:
+        """(ISO, dd/mm/aa, días hacia el evento), memoizado por fecha."""
+        v = self._fechas.get(d)
+        if v is None:
+            v = self._fechas[d] = ((d.isoformat(), d.strftime("%d/%m/%y"), (d - self.today).days)
+                                   if d else (None, "", None))
+        return v
+
+    def hora(self, t: Optional[dtime]) -> tuple:
+        """(HH:MM o None, HH:MM o '')"""
+        v = self._horas.get(t)
+        if v is None:
+            s = t.strftime("%H:%M") if t else None
+            v = self._horas[t] = (s, s or "")
+        return v
+
+    def __call__(self, r) -> dict:
+        return {f: g(r, self) for f, g in self._getters}
+
+def row_serializer(fields: list[str], today: Optional[date] = None) -> RowSerializer:
+    return RowSerializer(fields, today)
+
+# -----------------------------------------------------------------------------
+# JSON
+# -----------------------------------------------------------------------------
+if orjson is not None:
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    def dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+STREAM_CHUNK = 64 * 1024
+
+def stream_json_array(items: Iterable[dict], head: str = "[", tail=lambda: "]"):
+    """Genera un arreglo JSON por pedazos (~64KB); `tail` se evalúa al final (p.ej. next_cursor)."""
+    buf, size, first = [head], len(head), True
+    for it in items:
+        s = dumps(it) if first else "," + dumps(it)
+        first = False
+        buf.append(s)
+        size += len(s)
+        if size >= STREAM_CHUNK:
+            yield "".join(buf)
+            buf, size = [], 0
+    buf.append(tail())
+    yield "".join(buf)
+
+async def astream_json_array(items: AsyncIterable[dict], head: str = "[", tail=lambda: "]"):
+    """stream_json_array para un iterable asíncrono (asgi.py)."""
+    buf, size, first = [head], len(head), True
+    async for it in items:
+        s = dumps(it) if first else "," + dumps(it)
+        first = False
+        buf.append(s)
+        size += len(s)
+        if size >= STREAM_CHUNK:
+            yield "".join(buf)
+            buf, size = [], 0
+    buf.append(tail())
+    yield "".join(buf)
@@ -5,6 +5,7 @@ let catalogo = [];          // personas [{ID, Nombre, Cargo, ...}]
 let catalogIndex = {};      // índice por ID -> persona
 let currentStatus = "";     // filtro activo
 let currentId = null;       // invitación activa en modal gestionar
+let currentVersion = null;  // su versión al abrir el modal (el servidor responde 409 si cambió)
 let currentRange = { from: "", to: "" };
 let personaTS = null;
 // ===== Utils =====
@@ -35,12 +36,21 @@ async function fetchJSON(url, opts = {}) {
   const res = await fetch(u, { cache: 'no-store', credentials: 'same-origin', ...opts });
   if (!res.ok) {
     let msg = `${res.status} ${res.statusText}`;
-    try { const j = await res.json(); if (j && j.error) msg = j.error; } catch {}
-    throw new Error(msg);
+    let data = null;
+    try { data = await res.json(); if (data && data.error) msg = data.error; } catch {}
+    const err = new Error(msg);
+    err.response = { status: res.status, data };   // p.ej. 409 de conflicto de agenda
+    throw err;
   }
   return res.json();
 }
 const apiGet  = (url) => fetchJSON(url);
+// GET versionado (ETag): el navegador guarda la respuesta y revalida con If-None-Match (304)
+async function apiGetRevalidate(url) {
+  const res = await fetch(url, { cache: 'no-cache', credentials: 'same-origin' });
+  if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
+  return res.json();
+}
 const apiPost = (url, body={}) => fetchJSON(url, {
   method: 'POST',
   headers: { 'Content-Type': 'application/json' },
@@ -143,27 +153,140 @@ async function withBusy(btn, fn){
 }
 let uiToken = 0;
 
+// Campos que realmente pinta el tablero (proyección en /api/invitations)
+const BOARD_FIELDS = [
+  'ID','Evento','Convoca Cargo','Convoca','Partido Político','Fecha','FechaFmt','HoraFmt',
+  'Municipio/Dependencia','Lugar','Estatus','Asignado A','PersonaNombre','Rol',
+  'ArchivoURL','ArchivoNombre','DiasParaEvento'
+];
+const PAGE_SIZE = 200;
+
+// Descarga /api/invitations por páginas (cursor keyset).
+// onPage(listaAcumulada) se llama tras cada página; si regresa false se detiene.
+async function fetchInvitationsPaged(params, onPage){
+  let all = [];
+  let cursor = null;
+  do {
+    const qs = new URLSearchParams(params);
+    qs.set('fields', BOARD_FIELDS.join(','));
+    qs.set('limit', PAGE_SIZE);
+    if (cursor) qs.set('cursor', cursor);
+    const page = await apiGet('/api/invitations?' + qs.toString());
+    all = all.concat(page.items || []);
+    cursor = page.next_cursor;
+    if (onPage && onPage(all, page) === false) return null;
+  } while (cursor);
+  return all;
+}
+
 async function reloadUI(){
   const my = ++uiToken;
 
-  // 1) status activo
+  // 1) status activo + rango de fechas (filtrado en servidor)
   const status = document.querySelector('#statusBtns .btn.active')?.dataset.status || "";
-  let invs = await apiGet('/api/invitations' + (status ? `?status=${encodeURIComponent(status)}` : ''));
-  if (my !== uiToken) return;
-
-  // 2) filtrar por fechas
   const d1 = (document.getElementById('fDesde')?.value || '').trim(); // YYYY-MM-DD
   const d2 = (document.getElementById('fHasta')?.value || '').trim();
-  if (d1 || d2){
-    invs = invs.filter(inv => {
-      const iso = inv.Fecha;
-      if (!iso) return false;
-      if (d1 && iso < d1) return false;
-      if (d2 && iso > d2) return false;
-      return true;
-    });
+  const params = {};
+  if (status) params.status = status;
+  if (d1) params.date_from = d1;
+  if (d2) params.date_to = d2;
+
+  // 1b) con texto de búsqueda: resultados por relevancia (sin feed en vivo)
+  const q = (document.getElementById('fBuscar')?.value || '').trim();
+  if (q.length >= 2){
+    const qs = new URLSearchParams({ ...params, q, limit: PAGE_SIZE, fields: BOARD_FIELDS.join(',') });
+    const res = await apiGet('/api/invitations/search?' + qs.toString());
+    if (my !== uiToken) return;
+    if (feedSource) { feedSource.close(); feedSource = null; }
+    feedLive = false;
+    renderBoard(res.items || []);
+    return;
+  }
+
+  // 2) pinta conforme llegan las páginas; la versión de la 1a página es desde donde sigue el feed
+  let version = null;
+  const invs = await fetchInvitationsPaged(params, (list, page) => {
+    if (my !== uiToken) return false;
+    if (version === null) version = page.version;
+    renderBoard(list);
+  });
+  if (!invs || my !== uiToken) return;
+
+  boardFilters = { status, from: d1, to: d2 };
+  boardMap = new Map(invs.map(i => [i.ID, i]));
+  startFeed(version);
+}
+
+// ===== Feed en vivo (SSE /api/changes): parcha el tablero sin recargar =====
+let boardMap = new Map();     // ID -> invitación visible con los filtros actuales
+let boardFilters = { status: "", from: "", to: "" };
+let feedSource = null;
+let feedLive = false;
+let renderPending = false;
+
+function matchesFilters(inv){
+  const f = boardFilters;
+  if (f.status && (inv.Estatus || "Pendiente") !== f.status) return false;
+  if (f.from || f.to){
+    const iso = inv.Fecha;
+    if (!iso) return false;
+    if (f.from && iso < f.from) return false;
+    if (f.to && iso > f.to) return false;
   }
+  return true;
+}
+
+// mismo orden que el backend: Fecha DESC, Hora DESC (vacíos al final), ID DESC
+function boardSorted(){
+  const desc = (a, b) => (a === b ? 0 : (!a ? 1 : (!b ? -1 : (a < b ? 1 : -1))));
+  return Array.from(boardMap.values()).sort((a, b) =>
+    desc(a.Fecha, b.Fecha) || desc(a.HoraFmt, b.HoraFmt) || (b.ID - a.ID));
+}
 
+function scheduleRender(){
+  if (renderPending) return;
+  renderPending = true;
+  requestAnimationFrame(() => { renderPending = false; renderBoard(boardSorted()); });
+}
+
+function applyDelta(ev){
+  const msg = JSON.parse(ev.data);
+  if (msg.op === 'deleted' || !msg.inv || !matchesFilters(msg.inv)) boardMap.delete(msg.id);
+  else boardMap.set(msg.id, msg.inv);
+  scheduleRender();
+}
+
+function startFeed(version){
+  if (!window.EventSource || version == null) return;
+  if (feedSource) feedSource.close();
+  const es = new EventSource(`/api/changes?since=${version}`);
+  feedSource = es;
+  ['created', 'updated', 'deleted'].forEach(t => es.addEventListener(t, applyDelta));
+  es.addEventListener('reset', () => { es.close(); reloadUI(); });
+  es.onopen  = () => { feedLive = true; };
+  es.onerror = () => {
+    feedLive = false;
+    // CLOSED = el servidor no acepta más streams (503): recarga periódica como respaldo
+    if (es.readyState === EventSource.CLOSED && feedSource === es) setTimeout(reloadUI, 30000);
+  };
+}
+
+// Tras una acción propia: si el feed está vivo el cambio llega solo; si no, recarga
+async function refreshAfterAction(){
+  if (feedLive) return;
+  await reloadUI();
+}
+
+// 409 "stale": alguien más cambió la invitación desde que se abrió el modal
+async function handleStale(err, modalSel){
+  if (err?.response?.status !== 409 || !err.response.data?.stale) return false;
+  alert(err.response.data.error);
+  bootstrap.Modal.getInstance($(modalSel))?.hide();
+  await refreshAfterAction();
+  return true;
+}
+
+function renderBoard(invs){
   // 3) (NUEVO) poblar opciones de municipio según el set actual
   populateMunicipios(invs);
 
@@ -284,12 +407,44 @@ function msgConflicts(level, conflicts){
   const lines = conflicts.map(c => `• ${c.FechaFmt} ${c.HoraFmt} — ${c.Evento} (${c.Estatus}) @ ${c.Lugar}`).join('\n');
   return `${titulo}:\n${lines}\n\n¿Deseas continuar de todas formas?`;
 }
+// ===== Historial de la invitación (una línea por acción) =====
+async function loadHistory(invId, cursor){
+  const ul = $('#detailsHistory');
+  if (!ul) return;
+  const qs = new URLSearchParams({ compact: '1', limit: '20' });
+  if (cursor) qs.set('cursor', cursor);
+  try {
+    const { items, next_cursor } = await apiGet(`/api/invitation/${invId}/history?${qs}`);
+    if (!cursor) ul.innerHTML = '';
+    ul.querySelector('[data-more]')?.remove();
+    if (!items.length && !cursor) ul.innerHTML = '<li class="text-muted">Sin cambios registrados</li>';
+    ul.insertAdjacentHTML('beforeend', items.map(
+      h => `<li><span class="text-muted">${h.fecha}</span> — ${h.texto}</li>`
+    ).join(''));
+    if (next_cursor) {
+      ul.insertAdjacentHTML('beforeend', `<li data-more><a href="#">Ver más…</a></li>`);
+      ul.querySelector('[data-more] a').addEventListener('click', (e) => {
+        e.preventDefault();
+        loadHistory(invId, next_cursor);
+      }, { once: true });
+    }
+  } catch (err) {
+    console.error(err);
+    if (!cursor) ul.innerHTML = '<li class="text-muted">No se pudo cargar el historial</li>';
+  }
+}
 // ===== Carga catálogo (personas) =====
 // ===== Carga catálogo (personas) =====
+// Persona (de catálogo o de /api/persons/suggest) -> opción de TomSelect; se recuerda en catalogIndex
+function personaOption(p){
+  catalogIndex[p.ID] = { ...(catalogIndex[p.ID] || {}), ...p };
+  return { value: String(p.ID), text: p.Nombre || '' };
+}
+
 async function loadCatalog() {
   let data = [];
   try {
-    data = await apiGet('/api/catalog', { cache: 'no-store' });
+    data = await apiGetRevalidate('/api/catalog');
   } catch (e) {}
   if (!Array.isArray(data) || !data.length) {
     try { data = await apiGet('/api/persons', { cache: 'no-store' }); } catch (e) {}
@@ -297,22 +452,11 @@ async function loadCatalog() {
 
   catalogo = Array.isArray(data) ? data : [];
   catalogIndex = {};
+  for (const p of catalogo) catalogIndex[p.ID] = p;
 
+  // el combo del modal Gestionar ya no se llena con todo el catálogo: busca en /api/persons/suggest
   const sel = $('#selPersona');
-  if (sel) {
-    // opción vacía para permitir placeholder/escritura
-    sel.innerHTML = '<option value=""></option>';
-  }
-
-  for (const p of catalogo) {
-    catalogIndex[p.ID] = p;
-    if (sel) {
-      const opt = document.createElement('option');
-      opt.value = String(p.ID);
-      opt.textContent = p.Nombre || '';
-      sel.appendChild(opt);
-    }
-  }
+  if (sel && !personaTS) sel.innerHTML = '<option value=""></option>';
 
   // limpia cargo
   const rol = $('#inpRol'); if (rol) rol.value = '';
@@ -339,22 +483,21 @@ document.addEventListener('click', async (e)=>{
 // Handler: Abrir modal Gestionar (opción B: escribir directo en el control)
 if (btn.dataset.action === 'assign'){
   currentId = btn.dataset.id;
+  currentVersion = null;
 
   // limpia campos visibles
   $('#inpRol').value = '';
   $('#inpComentario').value = '';
 
-  // asegúrate de tener catálogo cargado
-  if (!window.catalogo || !window.catalogo.length) {
-    await loadCatalog();
-  }
-
   // trae invitación para preselección
   let preselectPersonaId = null;
+  let preselectNombre = '';
   try{
-    const inv = await apiGet(`/api/invitation/${currentId}`, { cache: 'no-store' });
+    const inv = await apiGet(`/api/invitation/${currentId}?v=2`, { cache: 'no-store' });
     $('#assignMeta').textContent = `${inv.Evento || ''} — ${getFecha(inv)} ${getHora(inv)}`;
     preselectPersonaId = inv.PersonaID || null;
+    preselectNombre = inv["Asignado A"] || '';
+    currentVersion = inv.Version ?? null;
   }catch{}
 
   const modalEl = $('#modalAssign');
@@ -365,14 +508,23 @@ if (btn.dataset.action === 'assign'){
     // destruye instancia previa
     if (personaTS) { try { personaTS.destroy(); } catch {} personaTS = null; }
 
-    // ⭐ NO limpies #selPersona aquí — ya tiene <option> del catálogo
-
+    // opciones bajo demanda: el servidor filtra y ordena (prefijo + frecuencia de asignación)
+    $('#selPersona').innerHTML = '<option value=""></option>';
     personaTS = new TomSelect('#selPersona', {
-      searchField: ['text'],
+      valueField: 'value',
+      labelField: 'text',
+      searchField: [],
+      score: () => () => 1,          // sin filtro local: se respeta el orden del servidor
       dropdownParent: modalEl.querySelector('.modal-content'), // dentro del modal
       openOnFocus: false,             // ⭐ NO abrir al enfocar
       allowEmptyOption: true,
-      maxOptions: 1000
+      maxOptions: 50,
+      loadThrottle: 120,
+      load: (query, callback) => {
+        apiGet('/api/persons/suggest?' + new URLSearchParams({ q: query, limit: 20 }))
+          .then(list => { personaTS.clearOptions(); callback(list.map(personaOption)); })
+          .catch(() => callback());
+      }
     });
 
     // al cambiar, actualiza cargo
@@ -392,6 +544,8 @@ if (btn.dataset.action === 'assign'){
 
     // preselección si aplica
     if (preselectPersonaId != null) {
+      const prev = catalogIndex[preselectPersonaId] || { ID: preselectPersonaId, Nombre: preselectNombre };
+      personaTS.addOption(personaOption(prev));
       personaTS.setValue(String(preselectPersonaId), true);
       const p = window.catalogIndex?.[preselectPersonaId];
       $('#inpRol').value = p?.Cargo || '';
@@ -414,7 +568,7 @@ if (btn.dataset.action === 'assign'){
 }
 // Detalles
 if (btn.dataset.action === 'details'){
-  const inv = await apiGet(`/api/invitation/${btn.dataset.id}`);
+  const inv = await apiGet(`/api/invitation/${btn.dataset.id}?v=2`);
 
   const lines = [
     `<div><strong>Evento:</strong> ${inv.Evento||'—'}</div>`,
@@ -444,7 +598,8 @@ if (btn.dataset.action === 'details'){
     const mime = (inv.ArchivoMime || '').toLowerCase();
     if (mime.startsWith('image/')) {
       lines.push(
-        `<div class="mt-2"><img src="${inv.ArchivoURL}" alt="${nombre}" style="max-width:100%;border:1px solid #eee;border-radius:8px"></div>`
+        // miniatura escalada en el servidor; el original queda en el link de arriba
+        `<div class="mt-2"><img src="${inv.ArchivoURL}?w=640" srcset="${inv.ArchivoURL}?w=640 1x, ${inv.ArchivoURL}?w=1280 2x" loading="lazy" alt="${nombre}" style="max-width:100%;border:1px solid #eee;border-radius:8px"></div>`
       );
     } else if (mime === 'application/pdf') {
       lines.push(
@@ -453,8 +608,11 @@ if (btn.dataset.action === 'details'){
     }
   }
 
+  lines.push(`<div class="mt-3"><strong>Historial:</strong><ul id="detailsHistory" class="list-unstyled mb-0 mt-1"><li class="text-muted">Cargando…</li></ul></div>`);
+
   $('#detailsBody').innerHTML = lines.filter(Boolean).join('');
   new bootstrap.Modal($('#modalDetails')).show();
+  loadHistory(inv.ID);
   return;
 }
 
@@ -480,7 +638,7 @@ if (btn.id === 'btnCrear'){
   try{
     await fetch('/api/invitation/create', { method:'POST', body: fd });
     bootstrap.Modal.getInstance($('#modalCreate')).hide();
-    await reloadUI();
+    await refreshAfterAction();
   }catch(err){
     alert('Error al crear: ' + (err.message || 'desconocido'));
   }
@@ -504,14 +662,16 @@ if (btn.id === 'btnAsignar') {
         id: currentId,
         persona_id: personaId,
         rol,
-        comentario: cmt
+        comentario: cmt,
+        version: currentVersion
       });
 
       // si todo bien
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
+      await refreshAfterAction();
 
     } catch (err) {
+      if (await handleStale(err, '#modalAssign')) return;
       // Detecta conflicto 409
       if (err.response && err.response.status === 409 && err.response.data?.conflict) {
         const conf = err.response.data;
@@ -528,15 +688,20 @@ if (btn.id === 'btnAsignar') {
 
         if (confirm(msg)) {
           // forzar la asignación si el usuario confirma
-          await apiPost('/api/assign', {
-            id: currentId,
-            persona_id: personaId,
-            rol,
-            comentario: cmt,
-            force: true
-          });
-          bootstrap.Modal.getInstance($('#modalAssign')).hide();
-          await reloadUI();
+          try {
+            await apiPost('/api/assign', {
+              id: currentId,
+              persona_id: personaId,
+              rol,
+              comentario: cmt,
+              force: true,
+              version: currentVersion
+            });
+            bootstrap.Modal.getInstance($('#modalAssign')).hide();
+            await refreshAfterAction();
+          } catch (err2) {
+            if (!(await handleStale(err2, '#modalAssign'))) alert('Error en asignación: ' + err2.message);
+          }
         } else {
           alert('Asignación cancelada.');
         }
@@ -558,10 +723,11 @@ if (btn.id === 'btnAsignar') {
 
     if (!personaId) { alert('Selecciona la nueva persona.'); return; }
     try{
-      await apiPost('/api/reassign', { id: currentId, persona_id: personaId, rol, comentario: cmt });
+      await apiPost('/api/reassign', { id: currentId, persona_id: personaId, rol, comentario: cmt,
+                                       version: currentVersion });
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
-    }catch(err){ alert('Error al sustituir, ya se encuentra asignado ' + err.message); }
+      await refreshAfterAction();
+    }catch(err){ if (await handleStale(err, '#modalAssign')) return; alert('Error al sustituir, ya se encuentra asignado ' + err.message); }
     return;
   }
 
@@ -569,10 +735,10 @@ if (btn.id === 'btnAsignar') {
   if (btn.id === 'btnCancelar'){
     const cmt = $('#inpComentario').value || 'Cancelado por indicación';
     try{
-      await apiPost('/api/cancel', { id: currentId, comentario: cmt });
+      await apiPost('/api/cancel', { id: currentId, comentario: cmt, version: currentVersion });
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
-    }catch(err){ alert('Error al cancelar: ' + err.message); }
+      await refreshAfterAction();
+    }catch(err){ if (await handleStale(err, '#modalAssign')) return; alert('Error al cancelar: ' + err.message); }
     return;
   }
 
@@ -580,10 +746,11 @@ if (btn.id === 'btnAsignar') {
   if (btn.id === 'btnReactivar'){
     const cmt = $('#inpComentario').value || 'Reactivado';
     try{
-      await apiPost('/api/status', { id: currentId, estatus:'Pendiente', comentario: cmt });
+      await apiPost('/api/status', { id: currentId, estatus:'Pendiente', comentario: cmt,
+                                     version: currentVersion });
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
-    }catch(err){ alert('Error al reactivar: ' + err.message); }
+      await refreshAfterAction();
+    }catch(err){ if (await handleStale(err, '#modalAssign')) return; alert('Error al reactivar: ' + err.message); }
     return;
   }
 
@@ -591,10 +758,10 @@ if (btn.id === 'btnAsignar') {
   if (btn.id === 'btnEliminar'){
     if (!confirm('¿Eliminar esta invitación? Esta acción no se puede deshacer.')) return;
     try{
-      await apiPost('/api/invitation/delete', { id: currentId });
+      await apiPost('/api/invitation/delete', { id: currentId, version: currentVersion });
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
-    }catch(err){ alert('Error al eliminar: ' + err.message); }
+      await refreshAfterAction();
+    }catch(err){ if (await handleStale(err, '#modalAssign')) return; alert('Error al eliminar: ' + err.message); }
     return;
   }
 
@@ -626,7 +793,11 @@ if (btn.id === 'btnAsignar') {
         Nombre: nombre, Cargo: cargo, 'Teléfono': tel, Correo: correo, 'Unidad/Región': unidad
       });
       await loadCatalog();
-      if ($('#selPersona')) {
+      if (personaTS) {
+        personaTS.addOption(personaOption({ ID: res.id, Nombre: nombre, Cargo: cargo }));
+        personaTS.setValue(String(res.id), true);
+        $('#inpRol').value = cargo;
+      } else if ($('#selPersona')) {
         $('#selPersona').value = String(res.id);
         $('#inpRol').value = cargo;
       }
@@ -650,7 +821,8 @@ if (btn.id === 'btnAsignar') {
   // Editar invitación (abrir modal)
   if (btn.dataset.action === 'edit-inv') {
     currentId = btn.dataset.id;
-    const inv = await apiGet(`/api/invitation/${currentId}`);
+    const inv = await apiGet(`/api/invitation/${currentId}?v=2`);
+    currentVersion = inv.Version ?? null;
 
     $('#eID').value = inv.ID;
     $('#eFecha').value = toInputDate(inv.Fecha || '');
@@ -679,6 +851,7 @@ if (btn.id === 'btnGuardarEditInv') {
   fd.append('municipio', ($('#eMuni').value || '').trim());
   fd.append('lugar', ($('#eLugar').value || '').trim());
   fd.append('observaciones', ($('#eObs').value || '').trim());
+  if (currentVersion != null) fd.append('version', currentVersion);
   if ($('#eQuitarArchivo').checked) fd.append('eliminar_archivo', 'true');
   const newFile = $('#eArchivo').files[0];
   if (newFile) fd.append('archivo', newFile);
@@ -690,10 +863,10 @@ if (btn.id === 'btnGuardarEditInv') {
   }
 
   try {
-    await fetch('/api/invitation/update', { method:'POST', body: fd });
+    await fetchJSON('/api/invitation/update', { method:'POST', body: fd });   // lanza en 4xx/5xx (p.ej. 409)
     bootstrap.Modal.getInstance($('#modalEditInv')).hide();
-    await reloadUI();
-  } catch (err) { alert('Error actualizando: ' + (err.message || 'desconocido')); }
+    await refreshAfterAction();
+  } catch (err) { if (await handleStale(err, '#modalEditInv')) return; alert('Error actualizando: ' + (err.message || 'desconocido')); }
   return;
 }
 
@@ -780,7 +953,7 @@ if (btn.id === 'btnGuardarEditInv') {
         }
         sel.dispatchEvent(new Event('change'));
       }
-      await reloadUI();
+      await refreshAfterAction();
       // opcional: await reloadUI();
       alert('Persona eliminada.');
     } catch (err) { alert('Error al eliminar: ' + err.message); }
@@ -816,11 +989,13 @@ if (btn.id === 'btnGuardarEditInv') {
       await apiPost('/api/status', {
         id: currentId,
         estatus: 'Pendiente',
-        comentario: 'Limpieza de asignación por corrección'
+        comentario: 'Limpieza de asignación por corrección',
+        version: currentVersion
       });
       bootstrap.Modal.getInstance($('#modalAssign')).hide();
-      await reloadUI();
+      await refreshAfterAction();
     } catch (err) {
+      if (await handleStale(err, '#modalAssign')) return;
       alert('No se pudo limpiar la asignación: ' + (err?.response?.data?.error || err.message));
     }
     return;
@@ -856,8 +1031,7 @@ document.addEventListener('DOMContentLoaded', async ()=>{
   }
   try { await loadCatalog(); } catch(e) { console.warn('No se pudo cargar catálogo', e); }
   
-  // (Opcional) Auto-refresh cada X segundos
-  // setInterval(reloadUI, 15000);
+  // Auto-refresh: lo hace el feed SSE (startFeed), con recarga de respaldo si no hay stream
 });
 
 document.getElementById('cArchivo').addEventListener('change', (e) => {
@@ -885,11 +1059,62 @@ window.addEventListener('resize', adjustMainPadding);
  // adjustMainPadding();
 //}
 
+// búsqueda: recarga al dejar de escribir (300 ms)
+let searchTimer = null;
+document.getElementById('fBuscar')?.addEventListener('input', () => {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(() => reloadUI(), 300);
+});
+
 document.addEventListener('click', (ev) => {
   const btn = ev.target.closest('button');
   if (!btn) return;
-  if (btn.id === 'btnExportXlsx') {
-    window.location.href = '/api/report/confirmados.xlsx';
+  if (btn.id === 'btnExportXlsx' || btn.id === 'btnExportCsv') {
+    // mismo rango de fechas que el tablero
+    const qs = new URLSearchParams();
+    const d1 = (document.getElementById('fDesde')?.value || '').trim();
+    const d2 = (document.getElementById('fHasta')?.value || '').trim();
+    if (d1) qs.set('date_from', d1);
+    if (d2) qs.set('date_to', d2);
+    const ext = btn.id === 'btnExportCsv' ? 'csv' : 'xlsx';
+    window.location.href = `/api/report/confirmados.${ext}` + (qs.toString() ? `?${qs}` : '');
+  }
+  if (btn.id === 'btnImport') document.getElementById('fileImport')?.click();
+});
+
+// importación masiva XLSX/CSV: primero en seco, se confirma y luego se inserta
+async function postImport(file, dryRun){
+  const fd = new FormData();
+  fd.append('archivo', file);
+  const res = await fetch('/api/invitations/import' + (dryRun ? '?dry_run=1' : ''), { method: 'POST', body: fd });
+  const data = await res.json().catch(() => ({}));
+  if (!res.ok || !data.ok) throw new Error(data.error || `HTTP ${res.status}`);
+  return data;
+}
+
+function importSummary(r){
+  const lineas = [`Filas leídas: ${r.total}`, `Nuevas: ${r.insertadas}`, `Duplicadas: ${r.duplicadas}`];
+  if (r.errores_total) {
+    lineas.push(`Con error u omitidas: ${r.errores_total}`);
+    r.errores.slice(0, 10).forEach(e => lineas.push(`  fila ${e.fila}: ${e.error}`));
+    if (r.errores_total > 10) lineas.push('  …');
+  }
+  return lineas.join('\n');
+}
+
+document.getElementById('fileImport')?.addEventListener('change', async (ev) => {
+  const file = ev.target.files?.[0];
+  ev.target.value = '';
+  if (!file) return;
+  try {
+    const previa = await postImport(file, true);
+    if (!previa.insertadas) { alert(importSummary(previa) + '\n\nNo hay filas nuevas para importar.'); return; }
+    if (!confirm(importSummary(previa) + `\n\n¿Importar ${previa.insertadas} invitaciones?`)) return;
+    const r = await postImport(file, false);
+    alert(importSummary(r));
+    await reloadUI();
+  } catch (err) {
+    alert('Error al importar: ' + (err.message || 'desconocido'));
   }
 });
 
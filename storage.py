@@ -0,0 +1,437 @@
+# storage.py
+"""
+Almacén de adjuntos direccionado por contenido.
+
+Cada archivo se guarda una sola vez bajo `ab/<sha256>.<ext>` (ab = dos primeros hex
+del hash). El hash se calcula mientras se copia el stream en bloques, sin cargar
+el archivo en memoria. Subir el mismo PDF a varias invitaciones reutiliza el
+mismo objeto.
+
+Conteo de referencias: un objeto está vivo mientras alguna invitación lo tenga en
+`archivo_url`. Al reemplazar o borrar un adjunto se llama release(); los que se
+escapen (caídas, archivos viejos con nombre uuid) los barre `python gc_uploads.py`.
+Para no borrar un archivo que otra petición acaba de volver a subir:
+  - put(lock=...) toma un advisory lock de transacción por key (lock_key) en la
+    sesión de la petición antes de ver si el objeto ya existe; se suelta con el
+    commit, cuando la invitación ya lo referencia.
+  - release() y el GC toman el mismo lock y, con él, vuelven a contar referencias
+    y a mirar la fecha antes de borrar.
+  - put() renueva la fecha del objeto y solo se borra lo que lleva más de
+    UPLOAD_GC_GRACE sin tocarse (cubre a quien suba sin lock).
+
+Backends (UPLOAD_BACKEND):
+  local  disco en UPLOAD_FOLDER (default)
+  s3     bucket S3 o compatible (MinIO…): S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL;
+         requiere boto3 (no está en requirements.txt: se instala solo si se usa)
+
+Las URLs son siempre `/uploads/<key>`, así `archivo_url` no depende del backend.
+
+Entrega (serve): los nombres por contenido nunca cambian de bytes, así que salen
+con ETag fuerte = sha256 y `Cache-Control: immutable` de un año; Range e
+If-None-Match los resuelve send_file. En S3 los objetos llevan ese Cache-Control y
+su ContentType guardados, y /uploads/ responde 302 a una URL firmada por
+S3_PRESIGN_TTL segundos; la redirección se cachea la mitad de ese plazo. Con un proxy delante (UPLOAD_ACCEL) Flask
+solo pone X-Accel-Redirect (nginx) o X-Sendfile (Apache/lighttpd) y no ocupa un
+hilo del worker durante la descarga. `?w=` entrega una miniatura JPEG/PNG
+(Pillow, opcional) cacheada en `_thumbs/<w>/<key>`.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from collections import namedtuple
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from flask import Response, redirect, request, send_file
+from sqlalchemy import func, select, text
+
+from db import Invitacion
+
+log = logging.getLogger("storage")
+
+URL_PREFIX = "/uploads/"
+CHUNK = 64 * 1024
+UPLOAD_GC_GRACE = int(os.getenv("UPLOAD_GC_GRACE", "3600"))   # segundos
+LOCK_NS = 7270015     # pg_advisory_xact_lock(LOCK_NS, <key>): dedup de put() vs borrado
+
+UPLOAD_ACCEL        = os.getenv("UPLOAD_ACCEL", "").lower()          # "", "nginx", "sendfile"
+UPLOAD_ACCEL_PREFIX = os.getenv("UPLOAD_ACCEL_PREFIX", "/_uploads/")  # location internal de nginx
+IMMUTABLE_MAX_AGE   = 365 * 24 * 3600
+S3_PRESIGN_TTL      = int(os.getenv("S3_PRESIGN_TTL", "3600"))        # segundos de la URL firmada
+
+THUMBS = "_thumbs"
+THUMB_WIDTHS = (160, 320, 640, 1280)   # ?w= se redondea hacia arriba a uno de estos
+THUMB_EXTS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG"}
+
+# ab/<sha>.<ext>, opcionalmente bajo _thumbs/<w>/
+_CONTENT_RE = re.compile(r"^(?:" + THUMBS + r"/(\d+)/)?[0-9a-f]{2}/([0-9a-f]{64})\.\w+$")
+
+StoredFile = namedtuple("StoredFile", "key url size sha256")
+StoredObject = namedtuple("StoredObject", "key size mtime")   # mtime: epoch
+
+def content_key(sha256: str, ext: str) -> str:
+    return f"{sha256[:2]}/{sha256}.{ext.lower()}"
+
+def url_for_key(key: str) -> str:
+    return URL_PREFIX + key
+
+def key_for_url(url: Optional[str]) -> Optional[str]:
+    """Key de una archivo_url propia; None si es externa o vacía."""
+    if url and url.startswith(URL_PREFIX):
+        return url[len(URL_PREFIX):]
+    return None
+
+def content_etag(key: str) -> Optional[str]:
+    """ETag fuerte para nombres por contenido (sha, o sha-w<ancho> en miniaturas)."""
+    m = _CONTENT_RE.match(key)
+    if not m:
+        return None
+    return m.group(2) + (f"-w{m.group(1)}" if m.group(1) else "")
+
+def thumb_key(key: str, width: int) -> str:
+    return f"{THUMBS}/{width}/{key}"
+
+def thumb_width(raw) -> Optional[int]:
+    """?w= -> ancho permitido (el menor >= pedido), o None si no aplica."""
+    try:
+        w = int(raw)
+    except (TypeError, ValueError):
+        return None
+    if w <= 0:
+        return None
+    return next((t for t in THUMB_WIDTHS if t >= w), THUMB_WIDTHS[-1])
+
+def _copy_hashing(src: BinaryIO, dst: BinaryIO) -> tuple[str, int]:
+    h, size = hashlib.sha256(), 0
+    while True:
+        chunk = src.read(CHUNK)
+        if not chunk:
+            break
+        h.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+# -----------------------------------------------------------------------------
+# Backends
+# -----------------------------------------------------------------------------
+class UploadStore:
+    """Interfaz común. `key` es la ruta relativa dentro del almacén."""
+
+    def put(self, stream: BinaryIO, ext: str,
+            lock: Optional[Callable[[str], None]] = None) -> StoredFile:
+        """Guarda el stream bajo su hash. lock(key) se llama con el key ya calculado,
+        antes de ver si el objeto existe (ver lock_key)."""
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def objects(self, derived: bool = False) -> Iterator[StoredObject]:
+        """Objetos originales; con derived=True solo las miniaturas (_thumbs/…)."""
+        raise NotImplementedError
+
+    def put_derived(self, key: str, data: bytes) -> None:
+        """Guarda un derivado (miniatura) con key fija, fuera del conteo de referencias."""
+        raise NotImplementedError
+
+    def serve(self, key: str):
+        """Respuesta Flask para GET /uploads/<key>."""
+        raise NotImplementedError
+
+
+class LocalDiskStore(UploadStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        p = os.path.abspath(os.path.join(self.root, key))
+        if not p.startswith(self.root + os.sep):
+            raise ValueError("key fuera del almacén")
+        return p
+
+    def put(self, stream: BinaryIO, ext: str,
+            lock: Optional[Callable[[str], None]] = None) -> StoredFile:
+        # temporal en el mismo disco: el rename final es atómico
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                sha, size = _copy_hashing(stream, out)
+            key = content_key(sha, ext)
+            if lock:
+                lock(key)
+            dest = self.path(key)
+            if os.path.exists(dest):
+                os.utime(dest)                 # dedup: renueva la gracia del GC
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp, dest)
+                tmp = None
+        finally:
+            if tmp:
+                os.unlink(tmp)
+        return StoredFile(key, url_for_key(key), size, sha)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            st = os.stat(self.path(key))
+        except (FileNotFoundError, ValueError):
+            return None
+        return StoredObject(key, st.st_size, st.st_mtime)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def put_derived(self, key: str, data: bytes) -> None:
+        dest = self.path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(dest))
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, dest)
+
+    def objects(self, derived: bool = False) -> Iterator[StoredObject]:
+        # se omiten temporales (.tmp-*); los derivados (_thumbs) solo con derived=True
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                if derived:
+                    dirnames[:] = [d for d in dirnames if d == THUMBS]
+                    continue
+                dirnames[:] = [d for d in dirnames if not d.startswith(("_", "."))]
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                full = os.path.join(dirpath, name)
+                st = os.stat(full)
+                yield StoredObject(os.path.relpath(full, self.root).replace(os.sep, "/"),
+                                   st.st_size, st.st_mtime)
+
+    def serve(self, key: str):
+        try:
+            path = self.path(key)
+        except ValueError:
+            return Response(status=404)
+        if not os.path.isfile(path):
+            return Response(status=404)
+
+        etag = content_etag(key)
+        mime = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        if UPLOAD_ACCEL in ("nginx", "sendfile"):
+            # el proxy lee el archivo y atiende Range; aquí solo cabeceras y 304
+            resp = Response(mimetype=mime)
+            if UPLOAD_ACCEL == "nginx":
+                resp.headers["X-Accel-Redirect"] = UPLOAD_ACCEL_PREFIX + key
+            else:
+                resp.headers["X-Sendfile"] = path
+            if etag:
+                resp.set_etag(etag)
+            resp.last_modified = os.path.getmtime(path)
+            resp = resp.make_conditional(request)
+        else:
+            resp = send_file(path, mimetype=mime, conditional=True, etag=etag or True,
+                             max_age=IMMUTABLE_MAX_AGE if etag else None)
+        if etag:
+            resp.cache_control.public = True
+            resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+            resp.cache_control.immutable = True
+        return resp
+
+
+class S3Store(UploadStore):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 client=None):
+        if client is None:
+            import boto3    # opcional: solo con UPLOAD_BACKEND=s3
+            client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.s3 = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _object_args(key: str) -> dict:
+        """ContentType (y CacheControl immutable si el nombre es por contenido) del objeto."""
+        args = {"ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        if content_etag(key):
+            args["CacheControl"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return args
+
+    def put(self, stream: BinaryIO, ext: str,
+            lock: Optional[Callable[[str], None]] = None) -> StoredFile:
+        # el key depende del hash: se hace spool a disco y luego se sube (si no existe)
+        with tempfile.TemporaryFile() as tmp:
+            sha, size = _copy_hashing(stream, tmp)
+            key = content_key(sha, ext)
+            if lock:
+                lock(key)
+            if self.stat(key):
+                # copia sobre sí mismo = "touch" de LastModified (gracia del GC); REPLACE
+                # reescribe los metadatos, así que van otra vez ContentType/CacheControl
+                self.s3.copy_object(Bucket=self.bucket, Key=self._k(key),
+                                    CopySource={"Bucket": self.bucket, "Key": self._k(key)},
+                                    MetadataDirective="REPLACE", **self._object_args(key))
+            else:
+                tmp.seek(0)
+                self.s3.upload_fileobj(tmp, self.bucket, self._k(key), ExtraArgs=self._object_args(key))
+        return StoredFile(key, url_for_key(key), size, sha)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.s3.get_object(Bucket=self.bucket, Key=self._k(key))["Body"]
+
+    def put_derived(self, key: str, data: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=self._k(key), Body=data, **self._object_args(key))
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            h = self.s3.head_object(Bucket=self.bucket, Key=self._k(key))
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(key, h["ContentLength"], h["LastModified"].timestamp())
+
+    def delete(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=self._k(key))
+
+    def objects(self, derived: bool = False) -> Iterator[StoredObject]:
+        prefix = self.prefix + (THUMBS + "/" if derived else "")
+        pages = self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix)
+        for page in pages:
+            for o in page.get("Contents", []):
+                key = o["Key"][len(self.prefix):]
+                if not derived and key.startswith(("_", ".")):
+                    continue
+                yield StoredObject(key, o["Size"], o["LastModified"].timestamp())
+
+    def serve(self, key: str):
+        url = self.s3.generate_presigned_url("get_object", Params={"Bucket": self.bucket, "Key": self._k(key)},
+                                             ExpiresIn=S3_PRESIGN_TTL)
+        resp = redirect(url, code=302)
+        # el navegador reutiliza la misma URL firmada (y con ella el objeto immutable de su
+        # caché) mientras la firma siga viva: la redirección caduca a la mitad del plazo
+        resp.cache_control.private = True
+        resp.cache_control.max_age = S3_PRESIGN_TTL // 2
+        return resp
+
+
+def from_env() -> UploadStore:
+    backend = os.getenv("UPLOAD_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3Store(os.environ["S3_BUCKET"], os.getenv("S3_PREFIX", ""),
+                       os.getenv("S3_ENDPOINT_URL"))
+    return LocalDiskStore(os.getenv("UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads")))
+
+# -----------------------------------------------------------------------------
+# Miniaturas
+# -----------------------------------------------------------------------------
+def make_thumbnail(src: BinaryIO, width: int, fmt: str) -> bytes:
+    from PIL import Image, ImageOps    # opcional: sin Pillow se entrega el original
+
+    with Image.open(src) as im:
+        if fmt == "JPEG":
+            im.draft("RGB", (width, width * 4))    # el decoder JPEG reduce en 1/2, 1/4, 1/8
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((width, width * 4), reducing_gap=2.0)
+        out = io.BytesIO()
+        if fmt == "JPEG":
+            im.convert("RGB").save(out, "JPEG", quality=80, optimize=True, progressive=True)
+        else:
+            im.save(out, "PNG", optimize=True)
+        return out.getvalue()
+
+def thumbnail(store: UploadStore, key: str, width: int) -> str:
+    """Key de la miniatura (generándola si falta); el original si no es imagen o no hay Pillow."""
+    fmt = THUMB_EXTS.get(key.rsplit(".", 1)[-1].lower())
+    if not fmt or key.startswith(THUMBS + "/"):
+        return key
+    tkey = thumb_key(key, width)
+    if store.stat(tkey):
+        return tkey
+    if store.stat(key) is None:
+        return key
+    try:
+        with store.open(key) as src:
+            data = make_thumbnail(src, width, fmt)
+    except ImportError:
+        return key
+    except Exception:
+        log.exception("No se pudo generar miniatura de %s", key)
+        return key
+    store.put_derived(tkey, data)
+    return tkey
+
+# -----------------------------------------------------------------------------
+# Referencias (archivo_url)
+# -----------------------------------------------------------------------------
+def ref_count(db, url: str) -> int:
+    return db.execute(select(func.count()).select_from(Invitacion)
+                      .where(Invitacion.archivo_url == url)).scalar_one()
+
+def referenced_keys(db) -> set:
+    rows = db.execute(select(Invitacion.archivo_url).distinct()
+                      .where(Invitacion.archivo_url.like(URL_PREFIX + "%")))
+    return {key_for_url(u) for (u,) in rows}
+
+def _expired(obj: StoredObject, grace: int) -> bool:
+    return time.time() - obj.mtime > grace
+
+def lock_key(db, key: str) -> None:
+    """Advisory lock de transacción sobre `key` en la sesión `db`; se suelta en commit/rollback."""
+    k = int.from_bytes(hashlib.sha256(key.encode()).digest()[:4], "big", signed=True)
+    db.execute(text("SELECT pg_advisory_xact_lock(:ns, :k)"), {"ns": LOCK_NS, "k": k})
+
+def _delete_unused(store: UploadStore, db, key: str, grace: int) -> bool:
+    """Con el lock del key: vuelve a contar referencias y a mirar la fecha; borra si sigue huérfano."""
+    lock_key(db, key)
+    try:
+        if ref_count(db, url_for_key(key)) > 0:
+            return False
+        obj = store.stat(key)
+        if obj is None or not _expired(obj, grace):
+            return False
+        store.delete(key)
+        return True
+    finally:
+        db.rollback()      # solo lectura: suelta el lock
+
+def release(store: UploadStore, db, url: Optional[str], grace: int = UPLOAD_GC_GRACE) -> bool:
+    """Borra el objeto de `url` si ya nadie lo referencia (llamar después del commit)."""
+    key = key_for_url(url)
+    if not key or ref_count(db, url) > 0:
+        return False
+    return _delete_unused(store, db, key, grace)
+
+def collect_garbage(store: UploadStore, db, grace: int = UPLOAD_GC_GRACE,
+                    dry_run: bool = False) -> list[StoredObject]:
+    """Objetos sin referencia y con más de `grace` segundos; los borra salvo dry_run."""
+    live = referenced_keys(db)
+    orphans = [o for o in store.objects() if o.key not in live and _expired(o, grace)]
+    # miniaturas cuyo original ya no está referenciado (se regeneran si hacen falta)
+    thumbs = [o for o in store.objects(derived=True)
+              if o.key.split("/", 2)[-1] not in live and _expired(o, grace)]
+    if dry_run:
+        return orphans + thumbs
+    # la lista se armó sin lock: cada original se vuelve a revisar antes de borrarlo
+    deleted = [o for o in orphans if _delete_unused(store, db, o.key, grace)]
+    for o in thumbs:
+        store.delete(o.key)
+    return deleted + thumbs
@@ -0,0 +1,145 @@
+# suggest.py
+"""
+Typeahead de personas (/api/persons/suggest).
+
+Trie en memoria por proceso con los nombres plegados (minúsculas, sin acentos):
+se indexa cada palabra del nombre, así "per" encuentra a "José Pérez". Cada nodo
+guarda las personas bajo ese prefijo ya ordenadas por frecuencia de asignación
+reciente y nombre, de modo que una búsqueda es bajar len(q) nodos y tomar las
+primeras N (con varias palabras se intersectan los conjuntos de cada prefijo).
+
+Coherencia entre workers: las escrituras de personas suben version_datos["personas"]
+(cache.py); cada petición compara esa versión (una lectura por PK) y reconstruye
+el trie si cambió. Las frecuencias se refrescan cada SUGGEST_FREQ_TTL segundos.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from typing import Optional
+
+from sqlalchemy import select, func
+
+from cache import current_data_version
+from db import Persona, Invitacion
+from search import tokens
+
+PERSONAS = "personas"     # clave en version_datos
+
+SUGGEST_LIMIT    = 10
+SUGGEST_MAX      = 50
+SUGGEST_FREQ_DAYS = int(os.getenv("SUGGEST_FREQ_DAYS", "90"))
+SUGGEST_FREQ_TTL  = int(os.getenv("SUGGEST_FREQ_TTL", "300"))
+
+
+class PrefixTrie:
+    """
+    Nodo = dict de hijos más, en llaves no alfanuméricas (tokens() nunca las produce):
+      ALL    ids con alguna palabra bajo este prefijo, ya en orden de ranking
+      FIRST  ids cuyo nombre EMPIEZA con este prefijo (mismo orden)
+      SET    frozenset(ALL), se arma la primera vez que una búsqueda de varias palabras lo pide
+    """
+    ALL, FIRST, SET = "\0", "\1", "\2"
+
+    def __init__(self, people: dict, freq: dict):
+        self.people = people             # id -> dict público
+        self.folded = {i: " ".join(tokens(p["Nombre"])) for i, p in people.items()}
+        self.root: dict = {}
+        rank = sorted(people, key=lambda i: (-freq.get(i, 0), self.folded[i], i))
+        self.order = tuple(rank)         # sin texto: los más asignados
+        self.pos = {i: n for n, i in enumerate(rank)}
+        buckets: dict = {}
+        for i in rank:
+            words = self.folded[i].split()
+            for n, word in enumerate(dict.fromkeys(words)):
+                node = self.root
+                for ch in word:
+                    node = node.setdefault(ch, {})
+                    b = buckets.setdefault(id(node), (node, [], []))
+                    b[1].append(i)
+                    if n == 0:
+                        b[2].append(i)
+        for node, all_ids, first_ids in buckets.values():
+            # un id puede llegar dos veces al mismo nodo ("ana anaya"): sin duplicados
+            node[self.ALL] = tuple(dict.fromkeys(all_ids))
+            node[self.FIRST] = tuple(first_ids)
+
+    def _node(self, word: str) -> dict:
+        node = self.root
+        for ch in word:
+            node = node.get(ch)
+            if node is None:
+                return {}
+        return node
+
+    def _set(self, node: dict) -> frozenset:
+        s = node.get(self.SET)
+        if s is None:
+            s = node[self.SET] = frozenset(node.get(self.ALL, ()))
+        return s
+
+    def lookup(self, q: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+        words = tokens(q)
+        if not words:
+            return [self.people[i] for i in self.order[:limit]]
+
+        nodes = [self._node(w) for w in dict.fromkeys(words)]
+        if not all(nodes):
+            return []
+        folded_q = " ".join(words)
+
+        if len(nodes) == 1:
+            # una palabra: las listas ya vienen ordenadas, se cortan en `limit`
+            node = nodes[0]
+            head = node.get(self.FIRST, ())[:limit]
+            seen = set(head)
+            tail = islice((i for i in node.get(self.ALL, ()) if i not in seen), limit - len(head))
+            return [self.people[i] for i in chain(head, tail)]
+
+        # varias palabras: intersección de conjuntos (en C) y orden por ranking
+        cand = frozenset.intersection(*(self._set(n) for n in nodes))
+        ordered = sorted(cand, key=self.pos.__getitem__)
+        head = [i for i in ordered if self.folded[i].startswith(folded_q)]
+        seen = set(head)
+        out = head + [i for i in ordered if i not in seen]
+        return [self.people[i] for i in out[:limit]]
+
+
+def _load_people(db) -> dict:
+    rows = db.execute(select(Persona.id, Persona.nombre, Persona.cargo, Persona.unidad_region)
+                      .where(Persona.activo == True))
+    return {r.id: {"ID": r.id, "Nombre": r.nombre or "", "Cargo": r.cargo or "",
+                   "Unidad/Región": r.unidad_region or ""} for r in rows}
+
+def _load_freq(db) -> dict:
+    since = datetime.utcnow() - timedelta(days=SUGGEST_FREQ_DAYS)
+    rows = db.execute(select(Invitacion.persona_id, func.count())
+                      .where(Invitacion.persona_id.isnot(None),
+                             Invitacion.fecha_asignacion >= since)
+                      .group_by(Invitacion.persona_id))
+    return dict(rows.all())
+
+
+class Suggester:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trie: Optional[PrefixTrie] = None
+        self._version: Optional[int] = None
+        self._freq_at = 0.0
+
+    def trie(self, db) -> PrefixTrie:
+        version = current_data_version(db, PERSONAS)
+        stale_freq = time.monotonic() - self._freq_at > SUGGEST_FREQ_TTL
+        if self._trie is not None and self._version == version and not stale_freq:
+            return self._trie
+        with self._lock:
+            if self._trie is None or self._version != version or \
+                    time.monotonic() - self._freq_at > SUGGEST_FREQ_TTL:
+                self._trie = PrefixTrie(_load_people(db), _load_freq(db))
+                self._version = version
+                self._freq_at = time.monotonic()
+            return self._trie
+
+    def suggest(self, db, q: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+        return self.trie(db).lookup(q, max(1, min(limit, SUGGEST_MAX)))
@@ -0,0 +1,76 @@
+# tests/conftest.py
+"""
+Pruebas: `python -m pytest -q` desde la raíz (pip install -r requirements-dev.txt).
+
+Las que necesitan PostgreSQL piden el fixture `pg` y corren solo si TEST_DATABASE_URL
+apunta a una BD de PRUEBA: al empezar se borra su esquema public y se recrea con
+init_db (tablas + migraciones). Sin esa variable se saltan; las de lógica pura corren
+siempre.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/asistencia_test DB_SSLMODE=disable \\
+        python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DB = os.getenv("TEST_DATABASE_URL")
+# db.py exige una URL al importarse; sin BD de prueba va una que nunca se conecta
+os.environ["DATABASE_URL"] = TEST_DB or "postgresql://localhost/sin_bd_de_prueba"
+os.environ.pop("DATABASE_DIRECT_URL", None)
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="uploads-test-"))
+
+from sqlalchemy import event, text   # noqa: E402  (después de fijar DATABASE_URL)
+
+# invitaciones_daily_stats la vacía el trigger de TRUNCATE de invitaciones (rollups.py)
+TABLES = ("personas", "invitaciones", "notificaciones", "cambios_invitaciones", "version_datos")
+
+@pytest.fixture(scope="session")
+def pg():
+    """Esquema recién creado en TEST_DATABASE_URL; regresa el engine."""
+    if not TEST_DB:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    from db import direct_engine, engine
+    import init_db
+    with direct_engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    init_db.init()
+    return engine
+
+@pytest.fixture
+def db(pg):
+    """Sesión sobre tablas vacías (y cachés en proceso limpias)."""
+    from db import SessionLocal
+    from cache import response_cache
+    with pg.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"))
+    response_cache.clear()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(db):
+    from app import app
+    return app.test_client()
+
+@pytest.fixture
+def sql_statements(pg):
+    """`with sql_statements() as stmts:` -> lista de sentencias que se ejecutaron en el bloque."""
+    @contextmanager
+    def capture():
+        stmts = []
+        def before(conn, cursor, statement, parameters, context, executemany):
+            stmts.append(statement)
+        event.listen(pg, "before_cursor_execute", before)
+        try:
+            yield stmts
+        finally:
+            event.remove(pg, "before_cursor_execute", before)
+    return capture
@@ -0,0 +1,50 @@
+# tests/test_assign.py
+"""
+Asignación en lote (/api/assign/bulk): resultados por item; force solo pasa por encima
+de los conflictos suaves, la misma hora exacta se reporta en su item sin tumbar el lote.
+"""
+from datetime import date, time
+
+from db import Invitacion, Persona
+
+D = date(2030, 3, 10)
+
+def test_bulk_force_reports_same_slot_per_item(db, client):
+    p = Persona(nombre="Ana", cargo="Diputada")
+    db.add(p)
+    db.flush()
+    ocupada = Invitacion(evento="Ya asignada", fecha=D, hora=time(10), estatus="Confirmado",
+                         persona_id=p.id, asignado_a=p.nombre)
+    misma_hora = Invitacion(evento="Misma hora", fecha=D, hora=time(10), estatus="Pendiente")
+    cerca = Invitacion(evento="Media hora después", fecha=D, hora=time(10, 30), estatus="Pendiente")
+    otro_dia = Invitacion(evento="Otro día", fecha=date(2030, 3, 11), hora=time(10), estatus="Pendiente")
+    db.add_all([ocupada, misma_hora, cerca, otro_dia])
+    db.commit()
+
+    items = [{"id": i.id, "persona_id": p.id} for i in (misma_hora, cerca, otro_dia)]
+    r = client.post("/api/assign/bulk", json={"items": items, "force": True})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["aplicadas"] == 2
+    dup, soft, free = body["results"]
+    assert dup["ok"] is False and dup["duplicate"] is True and dup["level"] == "hard"
+    assert soft["ok"] is True and soft["level"] == "tight1h"
+    assert free["ok"] is True and "level" not in free
+
+    db.expire_all()
+    assert db.get(Invitacion, misma_hora.id).estatus == "Pendiente"
+    assert db.get(Invitacion, cerca.id).persona_id == p.id
+    assert db.get(Invitacion, otro_dia.id).persona_id == p.id
+
+def test_bulk_without_force_reports_soft_conflict(db, client):
+    p = Persona(nombre="Luis", cargo="Regidor")
+    db.add(p)
+    db.flush()
+    db.add(Invitacion(evento="Ya asignada", fecha=D, hora=time(9), estatus="Confirmado", persona_id=p.id))
+    cerca = Invitacion(evento="Cerca", fecha=D, hora=time(9, 45), estatus="Pendiente")
+    db.add(cerca)
+    db.commit()
+
+    body = client.post("/api/assign/bulk", json={"items": [{"id": cerca.id, "persona_id": p.id}]}).get_json()
+    assert body["aplicadas"] == 0
+    assert body["results"][0]["conflict"] is True and "duplicate" not in body["results"][0]
@@ -0,0 +1,47 @@
+# tests/test_catalog.py
+"""/api/catalog: número fijo de sentencias SQL por request, sin importar cuántas personas haya."""
+from datetime import date, time, timedelta
+
+import pytest
+
+from db import Invitacion, Persona
+
+@pytest.fixture
+def personas(db):
+    hoy = date.today()
+    for i in range(20):
+        p = Persona(nombre=f"Persona {i:02d}", cargo="Diputado", activo=True)
+        db.add(p)
+        db.flush()
+        for d in range(3):
+            db.add(Invitacion(evento=f"Evento {i}-{d}", fecha=hoy + timedelta(days=d), hora=time(9 + d),
+                              estatus="Confirmado", persona_id=p.id, asignado_a=p.nombre))
+    db.add(Persona(nombre="Inactiva", activo=False))
+    db.commit()
+
+@pytest.mark.parametrize("path", ["/api/catalog", "/api/catalog?summary=1"])
+def test_catalog_statement_count(client, personas, sql_statements, path):
+    # fallo de caché: versión de datos + una sola consulta (nada de N+1 por persona)
+    with sql_statements() as stmts:
+        r = client.get(path)
+    assert r.status_code == 200
+    assert len(r.get_json()) == 20
+    assert len(stmts) == 2, stmts
+
+    # 304: solo la lectura de la versión
+    with sql_statements() as stmts:
+        r = client.get(path, headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+    assert len(stmts) == 1, stmts
+
+    # acierto en memoria: igual, solo la versión
+    with sql_statements() as stmts:
+        r = client.get(path)
+    assert r.status_code == 200
+    assert len(stmts) == 1, stmts
+
+def test_catalog_summary_fields(client, personas):
+    row = client.get("/api/catalog?summary=1").get_json()[0]
+    assert row["Nombre"] == "Persona 00"
+    assert row["Confirmadas Próximas"] == 3
+    assert row["Próximo Evento"] == date.today().isoformat()
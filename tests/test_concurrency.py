@@ -0,0 +1,127 @@
+# tests/test_concurrency.py
+"""
+Concurrencia optimista (Invitacion.version): `version` en el body / If-Match viejos
+-> 409 con el estado actual; en lote, el item viejo sale stale y el resto se aplica;
+una escritura que se cuela entre la lectura y el UPDATE (StaleDataError) -> 409.
+"""
+from datetime import date, time
+
+import pytest
+from sqlalchemy import text
+
+import app as app_module
+from db import Invitacion, Persona
+
+@pytest.fixture
+def inv(db):
+    i = Invitacion(evento="Evento", fecha=date(2030, 6, 1), hora=time(12), estatus="Pendiente")
+    db.add(i)
+    db.commit()
+    return i
+
+@pytest.fixture
+def concurrent_write(pg, monkeypatch):
+    """Otra conexión sube la versión de `ids` justo antes del commit del endpoint."""
+    def install(*ids):
+        original = app_module.publish_changes
+        def publish(db, op, inv_ids):
+            with pg.begin() as conn:
+                conn.execute(text("UPDATE invitaciones SET version = version + 1 WHERE id = ANY(:ids)"),
+                             {"ids": list(ids)})
+            original(db, op, inv_ids)
+        monkeypatch.setattr(app_module, "publish_changes", publish)
+    return install
+
+def set_status(client, inv_id, estatus, headers=None, **body):
+    return client.post("/api/status", json={"id": inv_id, "estatus": estatus, **body}, headers=headers)
+
+# -----------------------------------------------------------------------------
+# version en el body
+# -----------------------------------------------------------------------------
+def test_stale_version_returns_409_with_current_state(inv, client):
+    r = set_status(client, inv.id, "Confirmado", version=1)
+    assert r.status_code == 200 and r.get_json()["version"] == 2
+
+    r = set_status(client, inv.id, "Cancelado", version=1)
+    body = r.get_json()
+    assert r.status_code == 409 and body["stale"] is True
+    assert body["version"] == 2 and body["current"]["Version"] == 2
+    assert body["current"]["Estatus"] == "Confirmado"
+
+def test_stale_form_version_on_update(inv, client):
+    r = client.post("/api/invitation/update", data={"id": inv.id, "version": "7", "evento": "Otro"},
+                    content_type="multipart/form-data")
+    assert r.status_code == 409 and r.get_json()["version"] == 1
+
+def test_invalid_version_is_400(inv, client):
+    assert set_status(client, inv.id, "Confirmado", version="uno").status_code == 400
+
+def test_without_version_writes_unconditionally(inv, client):
+    # clientes viejos / el bot: sin versión no se compara
+    assert set_status(client, inv.id, "Confirmado").status_code == 200
+
+# -----------------------------------------------------------------------------
+# If-Match (ETag de /api/invitation/<id>)
+# -----------------------------------------------------------------------------
+def test_if_match_round_trip(inv, client):
+    etag = client.get(f"/api/invitation/{inv.id}").headers["ETag"]
+    assert etag == '"v1"'
+    assert set_status(client, inv.id, "Confirmado", headers={"If-Match": etag}).status_code == 200
+
+    r = set_status(client, inv.id, "Cancelado", headers={"If-Match": etag})
+    assert r.status_code == 409 and r.get_json()["current"]["Estatus"] == "Confirmado"
+    # If-Match gana sobre el body
+    r = set_status(client, inv.id, "Cancelado", headers={"If-Match": '"v1"'}, version=2)
+    assert r.status_code == 409
+
+@pytest.mark.parametrize("header, status", [('"abc"', 400), ("*", 200)])
+def test_if_match_malformed_or_star(inv, client, header, status):
+    assert set_status(client, inv.id, "Confirmado", headers={"If-Match": header}).status_code == status
+
+# -----------------------------------------------------------------------------
+# Escritura concurrente entre la lectura y el UPDATE
+# -----------------------------------------------------------------------------
+def test_write_sneaking_in_before_update_is_409(inv, client, concurrent_write):
+    concurrent_write(inv.id)
+    r = set_status(client, inv.id, "Confirmado", version=1)
+    body = r.get_json()
+    assert r.status_code == 409 and body["stale"] is True and body["version"] == 2
+    assert body["current"]["Estatus"] == "Pendiente"
+
+# -----------------------------------------------------------------------------
+# Lote
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def persona(db):
+    p = Persona(nombre="Ana", cargo="Diputada")
+    db.add(p)
+    db.commit()
+    return p
+
+def test_bulk_item_with_old_version_is_stale(db, client, persona):
+    a = Invitacion(evento="A", fecha=date(2030, 6, 2), hora=time(9), estatus="Pendiente")
+    b = Invitacion(evento="B", fecha=date(2030, 6, 3), hora=time(9), estatus="Pendiente")
+    db.add_all([a, b])
+    db.commit()
+    set_status(client, a.id, "Cancelado")                       # a ya va en la versión 2
+
+    items = [{"id": a.id, "persona_id": persona.id, "version": 1},
+             {"id": b.id, "persona_id": persona.id, "version": 1}]
+    body = client.post("/api/assign/bulk", json={"items": items}).get_json()
+    stale, applied = body["results"]
+    assert body["aplicadas"] == 1
+    assert stale["ok"] is False and stale["stale"] is True and stale["version"] == 2
+    assert applied["ok"] is True and applied["version"] == 2
+
+def test_bulk_concurrent_write_rolls_back_batch(db, client, persona, concurrent_write):
+    a = Invitacion(evento="A", fecha=date(2030, 6, 2), hora=time(9), estatus="Pendiente")
+    b = Invitacion(evento="B", fecha=date(2030, 6, 3), hora=time(9), estatus="Pendiente")
+    db.add_all([a, b])
+    db.commit()
+    concurrent_write(a.id)
+
+    items = [{"id": i.id, "persona_id": persona.id} for i in (a, b)]
+    r = client.post("/api/assign/bulk", json={"items": items})
+    assert r.status_code == 409 and r.get_json()["stale"] is True
+    db.expire_all()
+    assert db.get(Invitacion, b.id).persona_id is None         # nada del lote quedó
@@ -0,0 +1,95 @@
+# tests/test_conflicts.py
+"""Motor de conflictos (conflicts.py): ventanas de severidad con bisect, sin BD."""
+import logging
+from datetime import date, time
+
+import pytest
+
+import conflicts
+from conflicts import Entry, ScheduleIndex
+
+D = date(2030, 8, 1)
+WINDOWS = (("hard", 0), ("tight1h", 60), ("tight2h", 120))
+
+def entry(inv_id, hora, persona_id=1, fecha=D):
+    return Entry(inv_id, persona_id, fecha, hora, f"E{inv_id}", "Confirmado", "Lugar")
+
+@pytest.fixture
+def idx():
+    i = ScheduleIndex(WINDOWS)
+    i.add(entry(1, time(12, 0)))
+    return i
+
+@pytest.mark.parametrize("hora, level", [
+    (time(12, 0), "hard"),
+    (time(12, 0, 59), "hard"),        # |Δ| // 60 == 0
+    (time(11, 59, 1), "hard"),
+    (time(12, 1), "tight1h"),
+    (time(13, 0), "tight1h"),         # 60 min: dentro de tight1h
+    (time(13, 0, 59), "tight1h"),
+    (time(13, 1), "tight2h"),
+    (time(10, 0), "tight2h"),         # 120 min antes
+    (time(14, 0, 59), "tight2h"),
+    (time(14, 1), "none"),
+    (time(9, 59), "none"),
+])
+def test_window_boundaries(idx, hora, level):
+    c = idx.check(1, D, hora)
+    assert c.level == level
+    assert [e.id for e in c.entries] == ([] if level == "none" else [1])
+
+def test_other_persona_or_day_never_conflicts(idx):
+    assert idx.check(2, D, time(12)).level == "none"
+    assert idx.check(1, date(2030, 8, 2), time(12)).level == "none"
+    assert idx.check(1, D, None) == conflicts.NO_CONFLICT
+
+def test_exclude_id_skips_the_invitation_itself(idx):
+    assert idx.check(1, D, time(12), exclude_id=1).level == "none"
+    idx.add(entry(2, time(12, 30)))
+    c = idx.check(1, D, time(12), exclude_id=1)
+    assert c.level == "tight1h" and [e.id for e in c.entries] == [2]
+
+def test_most_severe_level_wins_and_all_entries_listed(idx):
+    idx.add(entry(2, time(10, 30)))
+    idx.add(entry(3, time(13, 30)))
+    idx.add(entry(4, time(18, 0)))
+    c = idx.check(1, D, time(12, 0, 30))
+    assert c.level == "hard"
+    assert sorted(e.id for e in c.entries) == [1, 2, 3]
+
+def test_add_moves_and_discard_removes(idx):
+    idx.add(entry(1, time(16, 0)))          # mismo id: se reubica
+    assert idx.check(1, D, time(12)).level == "none"
+    assert idx.check(1, D, time(16)).level == "hard"
+    idx.discard(1)
+    idx.discard(1)                          # idempotente
+    assert idx.check(1, D, time(16)).level == "none"
+
+def test_entries_without_hora_are_ignored():
+    i = ScheduleIndex(WINDOWS)
+    i.add(entry(1, None))
+    assert i.check(1, D, time(12)).level == "none"
+
+def test_custom_windows():
+    i = ScheduleIndex((("hard", 5), ("tight", 30)))
+    i.add(entry(1, time(12)))
+    assert i.check(1, D, time(12, 5)).level == "hard"
+    assert i.check(1, D, time(12, 6)).level == "tight"
+    assert i.check(1, D, time(12, 31)).level == "none"
+
+# -----------------------------------------------------------------------------
+# CONFLICT_WINDOWS
+# -----------------------------------------------------------------------------
+def test_parse_windows():
+    assert conflicts._parse_windows(" hard:0, tight:45 ") == (("hard", 0), ("tight", 45))
+
+@pytest.mark.parametrize("raw", ["hard", "hard:x", "none:5", "a:10,b:5", "a:0,a:10", ""])
+def test_parse_windows_rejects(raw):
+    with pytest.raises(ValueError):
+        conflicts._parse_windows(raw)
+
+def test_bad_env_falls_back_to_defaults(monkeypatch, caplog):
+    monkeypatch.setenv("CONFLICT_WINDOWS", "hard:10,tight:5")
+    with caplog.at_level(logging.WARNING, logger="conflicts"):
+        assert conflicts._windows_from_env() == conflicts._parse_windows(conflicts.DEFAULT_WINDOWS)
+    assert "CONFLICT_WINDOWS" in caplog.text
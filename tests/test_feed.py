@@ -0,0 +1,48 @@
+# tests/test_feed.py
+"""ChangeHub (feed.py): ningún commit se pierde entre el replay de un cliente y el reparto."""
+import queue
+
+import pytest
+
+import feed
+from db import Invitacion
+
+def fetch(db, ids):
+    return {i: {"ID": i} for i in ids}
+
+def publish(db, op="updated"):
+    inv = Invitacion(evento="Evento")
+    db.add(inv)
+    db.flush()
+    feed.publish_changes(db, op, [inv.id])
+    db.commit()
+    return inv.id
+
+def manual_hub():
+    hub = feed.ChangeHub(fetch)
+    hub._run = lambda: None          # sin hilo LISTEN: los polls se llaman a mano
+    return hub
+
+def test_commit_before_first_poll_is_broadcast(db):
+    first = publish(db)
+    hub = manual_hub()
+    q = hub.subscribe()
+    since = hub._version             # el cliente reanuda desde aquí (su replay ya no ve lo que sigue)
+    assert [ev["id"] for ev in hub.replay(db, since - 1)] == [first]
+
+    second = publish(db)             # commit antes de que el hilo haga su primer poll
+    hub._poll()
+    events = q.get_nowait()
+    assert [(ev["id"], ev["op"]) for ev in events] == [(second, "updated")]
+
+def test_restart_does_not_resend_old_changes(db):
+    publish(db)
+    hub = manual_hub()
+    q = hub.subscribe()
+    hub.unsubscribe(q)               # sin clientes el hilo termina (aquí ya terminó)
+    publish(db)                      # pasa sin nadie escuchando
+
+    q = hub.subscribe()              # arranca de nuevo desde la versión actual
+    hub._poll()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
@@ -0,0 +1,23 @@
+# tests/test_history.py
+"""Historial por invitación (/api/invitation/<id>/history): existencia con una lectura mínima."""
+from datetime import date
+
+from db import Invitacion, Persona
+
+def test_history_existence_check_reads_only_the_id(db, client, sql_statements):
+    p = Persona(nombre="Ana")
+    db.add(p)
+    db.flush()
+    inv = Invitacion(evento="Evento", fecha=date(2030, 5, 1), persona_id=p.id)
+    db.add(inv)
+    db.commit()
+
+    with sql_statements() as stmts:
+        r = client.get(f"/api/invitation/{inv.id}/history")
+    assert r.status_code == 200 and r.get_json()["items"] == []
+    first = stmts[0].lower()
+    assert first.startswith("select invitaciones.id") and "personas" not in first
+
+def test_history_of_missing_invitation_is_404(db, client):
+    r = client.get("/api/invitation/999999/history?compact=1")
+    assert r.status_code == 404 and r.get_json()["ok"] is False
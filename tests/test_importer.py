@@ -0,0 +1,156 @@
+# tests/test_importer.py
+"""
+Importación masiva (importer.py, /api/invitations/import): cada fila se normaliza con
+las mismas reglas que el alta manual (parse_date_flexible/parse_time_flexible), con
+fechas mal formadas y campos nulos; duplicados por (fecha, hora, evento, convoca) sin
+distinguir mayúsculas/espacios, dentro del archivo y contra la BD.
+"""
+import io
+from datetime import date, datetime, time
+
+import pytest
+from openpyxl import Workbook
+
+import importer
+from db import Invitacion
+from parsing import parse_date_flexible, parse_time_flexible
+
+HEADER = ["Fecha", "Hora", "Evento", "Quién convoca", "Convoca", "Partido", "Municipio", "Lugar",
+          "Notas"]
+INDEX = importer.map_headers(HEADER)
+
+def cells(fecha="01/11/2030", hora="10:30", evento="Foro", convoca="Ana", **kw):
+    base = {"convoca_cargo": "Diputado(a)", "partido_politico": None, "municipio": "Toluca",
+            "lugar": "Auditorio", "observaciones": None, **kw}
+    return [fecha, hora, evento, base["convoca_cargo"], convoca, base["partido_politico"],
+            base["municipio"], base["lugar"], base["observaciones"]]
+
+def as_dict(r) -> dict:
+    return dict(zip(importer.COLUMNS, r))
+
+# -----------------------------------------------------------------------------
+# Encabezados
+# -----------------------------------------------------------------------------
+def test_headers_fold_case_accents_and_spaces():
+    idx = importer.map_headers([" FECHA ", "hora", "Nombre del  Evento", "Cargo", "Nombre de quien convoca",
+                                "Partido Político", "Municipio/Dependencia", "LUGAR", "Observaciones", None])
+    assert idx == {"fecha": 0, "hora": 1, "evento": 2, "convoca_cargo": 3, "convoca": 4,
+                   "partido_politico": 5, "municipio": 6, "lugar": 7, "observaciones": 8}
+
+def test_missing_headers():
+    with pytest.raises(importer.ImportFormatError, match="convoca, municipio"):
+        importer.map_headers(["Fecha", "Hora", "Evento", "Cargo", "Lugar"])
+
+# -----------------------------------------------------------------------------
+# Normalización: mismas reglas que /api/invitation/create
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("raw", ["2030-11-01", " 01/11/2030 ", "1/11/30", "31/12/69", "31/02/2030",
+                                 "2030/11/01", "abc", "00/01/2030"])
+def test_dates_like_manual_create(raw):
+    r = importer.normalize(cells(fecha=raw), INDEX)
+    expected = parse_date_flexible(raw)
+    if expected is None:
+        assert r == f"Fecha inválida: {raw.strip()}"
+    else:
+        assert as_dict(r)["fecha"] == expected
+
+@pytest.mark.parametrize("raw", ["10:30", "9:5", "10:30:15", "3 pm", "12 am", "13 pm", "10:75", "10h30"])
+def test_times_like_manual_create(raw):
+    r = importer.normalize(cells(hora=raw), INDEX)
+    expected = parse_time_flexible(raw)
+    if expected is None:
+        assert r == f"Hora inválida: {raw}"
+    else:
+        assert as_dict(r)["hora"] == expected
+
+def test_native_excel_cells():
+    r = as_dict(importer.normalize(cells(fecha=datetime(2030, 11, 1, 0, 0), hora=time(18, 45),
+                                         evento=2030.0, convoca=7), INDEX))
+    assert r["fecha"] == date(2030, 11, 1) and r["hora"] == time(18, 45)
+    assert r["evento"] == "2030" and r["convoca"] == "7"
+    r = as_dict(importer.normalize(cells(hora=datetime(2030, 1, 1, 9, 15)), INDEX))
+    assert r["hora"] == time(9, 15)
+
+def test_none_and_blank_fields():
+    r = as_dict(importer.normalize(cells(evento="  Foro   de  prensa ", observaciones="  ",
+                                         partido_politico=None), INDEX))
+    assert r["evento"] == "Foro de prensa"
+    assert r["observaciones"] is None and r["partido_politico"] is None
+
+    assert importer.normalize(cells(evento=None, lugar="   "), INDEX) == "Faltan: evento, lugar"
+    assert importer.normalize(cells(fecha=None, hora=""), INDEX) == "Faltan: fecha, hora"
+    assert importer.normalize(cells()[:3], INDEX) == "Faltan: convoca_cargo, convoca, municipio, lugar"
+
+# -----------------------------------------------------------------------------
+# Duplicados (BD)
+# -----------------------------------------------------------------------------
+def csv_file(rows, sep=";") -> io.BytesIO:
+    lines = [sep.join(HEADER)] + [sep.join("" if c is None else str(c) for c in r) for r in rows]
+    return io.BytesIO(("\ufeff" + "\n".join(lines) + "\n").encode())
+
+def upload(client, f, name, dry_run):
+    return client.post("/api/invitations/import" + ("?dry_run=1" if dry_run else ""),
+                       data={"archivo": (f, name)}, content_type="multipart/form-data").get_json()
+
+@pytest.fixture
+def existing(db, client):
+    """Alta manual por el endpoint de siempre."""
+    r = client.post("/api/invitation/create", data={
+        "fecha": "2030-11-02", "hora": "17:00", "evento": "Informe Anual", "convoca_cargo": "Presidente(a)",
+        "convoca": "Luis", "municipio": "Metepec", "lugar": "Plaza"}, content_type="multipart/form-data")
+    return db.get(Invitacion, r.get_json()["id"])
+
+ROWS = [
+    cells(),                                                            # 2 ok
+    cells(evento=" FORO ", convoca="ana  "),                            # 3 = fila 2
+    cells(fecha="2/11/30", hora="5 pm", evento="informe   anual", convoca="LUIS"),   # 4 ya existe
+    cells(fecha="31/02/2030"),                                          # 5 fecha inválida
+    cells(convoca=None),                                                # 6 falta convoca
+    cells(hora="10:31"),                                                # 7 otra hora: ok
+    cells(hora="10:30:00", evento="Foro"),                              # 8 = fila 2 (misma hora)
+]
+EXPECTED_ERRORS = [
+    {"fila": 3, "error": "Duplicada en el archivo (igual a la fila 2)"},
+    {"fila": 4, "error": "Ya existe una invitación con la misma fecha, hora, evento y convoca"},
+    {"fila": 5, "error": "Fecha inválida: 31/02/2030"},
+    {"fila": 6, "error": "Faltan: convoca"},
+    {"fila": 8, "error": "Duplicada en el archivo (igual a la fila 2)"},
+]
+
+def test_dry_run_reports_and_inserts_nothing(db, client, existing):
+    body = upload(client, csv_file(ROWS), "convocatorias.csv", dry_run=True)
+    assert body["ok"] and body["dry_run"]
+    assert (body["total"], body["insertadas"], body["duplicadas"], body["errores_total"]) == (7, 2, 3, 5)
+    assert body["errores"] == EXPECTED_ERRORS
+    assert db.query(Invitacion).count() == 1
+
+def test_import_inserts_like_manual_create(db, client, existing):
+    body = upload(client, csv_file(ROWS, sep=","), "convocatorias.csv", dry_run=False)
+    assert body["insertadas"] == 2 and body["errores"] == EXPECTED_ERRORS
+
+    new = db.query(Invitacion).filter(Invitacion.id != existing.id).order_by(Invitacion.id).all()
+    assert [(i.fecha, i.hora, i.evento, i.convoca) for i in new] == [
+        (date(2030, 11, 1), time(10, 30), "Foro", "Ana"), (date(2030, 11, 1), time(10, 31), "Foro", "Ana")]
+    assert all(i.estatus == "Pendiente" and i.partido_politico is None for i in new)
+
+    # una segunda vez todo es duplicado contra la BD
+    again = upload(client, csv_file(ROWS[:1]), "otra.csv", dry_run=False)
+    assert again["insertadas"] == 0 and again["duplicadas"] == 1
+
+def test_xlsx_with_native_dates(db, client, existing):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(HEADER)
+    ws.append(cells(fecha=datetime(2030, 11, 2), hora=time(17), evento="INFORME ANUAL", convoca="Luis"))
+    ws.append(cells(fecha=datetime(2030, 11, 3), hora="9:00"))
+    f = io.BytesIO()
+    wb.save(f)
+    f.seek(0)
+    body = upload(client, f, "convocatorias.xlsx", dry_run=True)
+    assert (body["total"], body["insertadas"], body["duplicadas"]) == (2, 1, 1)
+    assert body["errores"][0]["fila"] == 2
+
+def test_bad_format_is_400(db, client):
+    r = client.post("/api/invitations/import", data={"archivo": (io.BytesIO(b"x"), "a.txt")},
+                    content_type="multipart/form-data")
+    assert r.status_code == 400
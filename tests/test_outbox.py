@@ -0,0 +1,73 @@
+# tests/test_outbox.py
+"""
+Outbox (outbox.py): claim() llena el lote con pendientes fuera de la ventana de
+OUTBOX_LOOKBACK_DAYS en vez de dejarlos sin enviar para siempre, pero ese barrido
+de particiones viejas no corre en cada poll de un bot ocioso.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import outbox
+import partitions
+from db import Notificacion
+
+@pytest.fixture(autouse=True)
+def sweep_due(monkeypatch):
+    monkeypatch.setattr(outbox, "_sweep", {"next": 0.0})
+
+def notif(db, evento: str, days_ago: int, enviado: bool = False) -> Notificacion:
+    n = Notificacion(evento=evento, ts=datetime.now() - timedelta(days=days_ago), enviado=enviado)
+    db.add(n)
+    db.flush()
+    return n
+
+def test_claim_falls_back_to_rows_older_than_window(db):
+    partitions.ensure_partitions(db.connection(), since=datetime.now() - timedelta(days=90))
+    old = notif(db, "Atrasada", 60)
+    notif(db, "Enviada hace mucho", 70, enviado=True)
+    recent = notif(db, "Reciente", 1)
+    db.commit()
+
+    # el lote lo llena la ventana: la vieja espera al siguiente
+    rows = outbox.claim(db, "bot-1", limit=1)
+    assert [r["id"] for r in rows] == [recent.id]
+    # lote sin llenar: se completa con la vieja, en orden (ts, id)
+    db.execute(text("UPDATE notificaciones SET lease_until = NULL, lease_owner = NULL"))
+    rows = outbox.claim(db, "bot-1", limit=10)
+    assert [r["evento"] for r in rows] == ["Atrasada", "Reciente"]
+    # ya con lease: otro bot no las vuelve a tomar
+    outbox._sweep["next"] = 0.0
+    assert outbox.claim(db, "bot-2", limit=10) == []
+
+    assert outbox.ack(db, [old.id, recent.id], "bot-1") == 2
+    db.commit()
+    cutoff = partitions.month_start(datetime.now() - timedelta(days=60))
+    ready, blocked = partitions.archivable(db.connection(), retain=0)
+    assert partitions.partition_name(cutoff) in ready and not blocked
+
+def test_idle_polls_skip_old_partitions_until_sweep_is_due(db, sql_statements):
+    partitions.ensure_partitions(db.connection(), since=datetime.now() - timedelta(days=90))
+    db.commit()
+
+    assert outbox.claim(db, "bot-1") == []          # barrido vacío: el siguiente en un rato
+    notif(db, "Atrasada", 60)
+    db.commit()
+    with sql_statements() as stmts:
+        assert outbox.claim(db, "bot-1") == []
+    assert len(stmts) == 1                           # solo la ventana reciente
+
+    outbox._sweep["next"] = 0.0
+    assert [r["evento"] for r in outbox.claim(db, "bot-1")] == ["Atrasada"]
+
+def test_sweep_repeats_while_it_finds_rows(db):
+    partitions.ensure_partitions(db.connection(), since=datetime.now() - timedelta(days=90))
+    for n in range(3):
+        notif(db, f"Atrasada {n}", 60 - n)
+    db.commit()
+
+    assert [r["evento"] for r in outbox.claim(db, "bot-1", limit=2)] == ["Atrasada 0", "Atrasada 1"]
+    # el barrido llenó el lote: puede haber más, se vuelve a barrer sin esperar
+    assert [r["evento"] for r in outbox.claim(db, "bot-1", limit=2)] == ["Atrasada 2"]
+    assert outbox._sweep["next"] > 0
@@ -0,0 +1,75 @@
+# tests/test_pagination.py
+"""
+Paginación keyset de /api/invitations (fecha DESC NULLS LAST, hora DESC NULLS LAST, id DESC):
+cursor de ida y vuelta, cursor inválido y páginas sin huecos ni repetidos con llaves iguales.
+"""
+import json
+from collections import namedtuple
+from datetime import date, time
+
+import pytest
+
+from app import decode_cursor, encode_cursor
+from db import Invitacion
+
+Row = namedtuple("Row", "fecha hora id")
+
+@pytest.mark.parametrize("row", [
+    Row(date(2030, 1, 31), time(9, 30), 42),
+    Row(date(2030, 1, 31), None, 7),
+    Row(None, None, 1),
+])
+def test_cursor_round_trip(row):
+    assert decode_cursor(encode_cursor(row)) == tuple(row)
+
+@pytest.mark.parametrize("raw", ["zzz", "", "W10", "WyIyMDMwLTEzLTAxIiwgbnVsbCwgMV0"])
+def test_bad_cursor_raises(raw):
+    # W10 = "[]"; el último es una fecha inexistente (mes 13)
+    with pytest.raises(ValueError):
+        decode_cursor(raw)
+
+def test_bad_cursor_is_400(db, client):
+    r = client.get("/api/invitations?limit=5&cursor=zzz")
+    assert r.status_code == 400 and r.get_json()["error"] == "Cursor inválido"
+
+@pytest.fixture
+def board(db):
+    """Muchas filas con la misma (fecha, hora), horas y fechas nulas mezcladas."""
+    d1, d2 = date(2030, 7, 1), date(2030, 7, 2)
+    specs = ([(d2, time(10))] * 5 + [(d2, None)] * 3 + [(d1, time(10))] * 4 + [(d1, time(8))] * 2
+             + [(None, time(10))] * 2 + [(None, None)] * 3)
+    invs = [Invitacion(evento=f"E{n}", fecha=f, hora=h, estatus="Confirmado" if n % 2 else "Pendiente")
+            for n, (f, h) in enumerate(specs)]
+    db.add_all(invs)
+    db.commit()
+    return invs
+
+def pages(client, qs: str, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        url = f"/api/invitations?fields=ID&limit={limit}{qs}" + (f"&cursor={cursor}" if cursor else "")
+        body = json.loads(client.get(url).get_data())
+        assert len(body["items"]) <= limit
+        ids += [it["ID"] for it in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 50])
+@pytest.mark.parametrize("qs", ["", "&status=Confirmado"])
+def test_pages_have_no_gaps_or_duplicates(board, client, limit, qs):
+    everything = [it["ID"] for it in json.loads(client.get("/api/invitations?fields=ID" + qs).get_data())]
+    paged = pages(client, qs, limit)
+    assert paged == everything and len(set(paged)) == len(paged)
+    if not qs:
+        assert len(paged) == len(board)
+
+def test_order_within_equal_keys_is_id_desc(board, client):
+    ids = pages(client, "", 2)
+    by_id = {i.id: i for i in board}
+    keys = [(by_id[i].fecha, by_id[i].hora) for i in ids]
+    # dentro de cada (fecha, hora) los ids bajan; nulos al final
+    for (k1, i1), (k2, i2) in zip(zip(keys, ids), zip(keys[1:], ids[1:])):
+        if k1 == k2:
+            assert i1 > i2
+    assert keys[-1] == (None, None)
@@ -0,0 +1,58 @@
+# tests/test_parsing.py
+"""
+parsing.py contra la implementación anterior (bench/bench_parsing.py, copiada de app.py):
+mismo resultado en formatos comunes, raros y mal formados; columnas con su máscara de errores.
+"""
+from datetime import date, time
+
+import pytest
+
+import parsing
+from bench.bench_parsing import _old_time_safe, old_parse_date_flexible
+
+DATES = [
+    "2026-11-01", " 2026-11-01 ", "01/11/2026", "1/11/2026", "1/2/26", "01/11/26",
+    "31/12/69", "01/01/68", "29/02/2028", "20261101",
+    # mal formadas
+    "31/02/2026", "2026-02-30", "13/13/2026", "00/01/2026", "2026/11/01", "01-11-2026",
+    "1/11/226", "abc", " ", "", None,
+]
+TIMES = [
+    "10:30", "10:30:15", " 9:5 ", "00:00", "23:59:59", "10:30:15:99",
+    "3 pm", "3:05 PM", "12 am", "12 pm", "12:30am", "11:59:59 pm", "3pm",
+    # mal formadas
+    "13 pm", "10:75", "25:00", "10:30:61", "10", "abc", "10h30", " ", "", None,
+]
+
+@pytest.mark.parametrize("s", DATES)
+def test_date_matches_previous_parser(s):
+    assert parsing.parse_date_flexible(s) == old_parse_date_flexible(s)
+
+@pytest.mark.parametrize("s", TIMES)
+def test_time_matches_previous_parser(s):
+    # la anterior lanzaba ValueError con '13 pm'; _old_time_safe lo cuenta como None
+    assert parsing.parse_time_flexible(s) == _old_time_safe(s)
+
+def test_known_values():
+    assert parsing.parse_date_flexible("1/2/26") == date(2026, 2, 1)
+    assert parsing.parse_date_flexible("31/12/69") == date(1969, 12, 31)
+    assert parsing.parse_date_flexible("31/02/2026") is None
+    assert parsing.parse_time_flexible("12 am") == time(0)
+    assert parsing.parse_time_flexible("3:05 PM") == time(15, 5)
+    assert parsing.parse_time_flexible("13 pm") is None
+
+def test_date_iso_is_strict():
+    assert parsing.parse_date_iso("2026-11-01") == date(2026, 11, 1)
+    assert parsing.parse_date_iso("01/11/2026") is None
+    assert parsing.parse_date_iso(None) is None
+
+def test_columns_match_one_by_one_with_error_mask():
+    dates, errors = parsing.parse_dates(DATES)
+    assert dates == [parsing.parse_date_flexible(s) for s in DATES]
+    # vacío/None no es error; lleno y sin fecha sí
+    assert errors == [bool(s) and d is None for s, d in zip(DATES, dates)]
+    assert errors[DATES.index("")] is False and errors[DATES.index("abc")] is True
+
+    times, errors = parsing.parse_times(TIMES)
+    assert times == [parsing.parse_time_flexible(s) for s in TIMES]
+    assert errors == [bool(s) and t is None for s, t in zip(TIMES, times)]
@@ -0,0 +1,36 @@
+# tests/test_reports.py
+"""Reporte de confirmados (/api/report/confirmados.csv|.xlsx): filtro de estatus por omisión."""
+import csv
+import io
+from datetime import date, time
+
+import openpyxl
+import pytest
+
+from db import Invitacion
+
+@pytest.fixture
+def invs(db):
+    db.add_all([
+        Invitacion(evento="Confirmada", fecha=date(2030, 4, 1), hora=time(9), estatus="Confirmado",
+                   municipio="Toluca", asignado_a="Ana"),
+        Invitacion(evento="Pendiente", fecha=date(2030, 4, 2), hora=time(9), estatus="Pendiente",
+                   municipio="Metepec"),
+    ])
+    db.commit()
+
+def csv_municipios(client, qs: str) -> list:
+    body = client.get("/api/report/confirmados.csv" + qs).get_data(as_text=True).lstrip("\ufeff")
+    return [r[0] for r in list(csv.reader(io.StringIO(body)))[1:]]
+
+@pytest.mark.parametrize("qs", ["", "?status=", "?status=Confirmado"])
+def test_report_defaults_to_confirmed(invs, client, qs):
+    assert csv_municipios(client, qs) == ["Toluca"]
+
+def test_report_other_status(invs, client):
+    assert csv_municipios(client, "?status=Pendiente") == ["Metepec"]
+
+def test_xlsx_empty_status_is_confirmed(invs, client):
+    wb = openpyxl.load_workbook(io.BytesIO(client.get("/api/report/confirmados.xlsx?status=").get_data()))
+    rows = list(wb.active.iter_rows(min_row=2, values_only=True))
+    assert [r[0] for r in rows] == ["Toluca"]
@@ -0,0 +1,121 @@
+# tests/test_search.py
+"""
+Índice invertido en memoria (search.py): relevancia, paginación con cursor y
+actualización incremental desde la bitácora de cambios.
+"""
+from datetime import date
+
+import pytest
+
+import search
+from cache import bump_data_version
+from feed import publish_changes
+
+# (id, evento, convoca, municipio, lugar, observaciones)
+DOCS = [
+    (1, "Reunión de cabildo", "Presidencia", "Toluca", "Palacio municipal", ""),
+    (2, "Informe anual", "Reunión regional", "Metepec", "Auditorio", ""),
+    (3, "Foro juvenil", "Juventud", "Toluca", "Casa de cultura", "Reunión previa"),
+    (4, "Reuniones vecinales", "Colonos", "Lerma", "Plaza", ""),
+    (5, "Informe de gobierno", "Gobernación", "Toluca", "Teatro Morelos", ""),
+]
+
+@pytest.fixture
+def index():
+    return search.InvertedIndex(DOCS)
+
+def ids(ranked):
+    return [i for i, _ in ranked]
+
+# -----------------------------------------------------------------------------
+# Relevancia
+# -----------------------------------------------------------------------------
+def test_field_weights_order_results(index):
+    # evento (1) > convoca (2) > observaciones (3); "reuniones" es solo prefijo (4)
+    assert ids(index.search("reunion")) == [1, 4, 2, 3]
+
+def test_exact_term_beats_prefix(index):
+    ranked = dict(index.search("reunion"))
+    assert ranked[1] == 1.0 and ranked[4] == 0.5
+
+def test_all_terms_required_and_scores_add_up(index):
+    assert ids(index.search("informe toluca")) == [5]
+    assert index.search("informe toluca")[0][1] == pytest.approx(1.0 + 0.2)
+    assert index.search("informe lerma") == []
+
+def test_accents_and_case_are_folded(index):
+    assert ids(index.search("REUNIÓN Cabildo")) == [1]
+
+def test_typo_falls_back_to_close_matches(index):
+    assert ids(index.search("cabilod")) == [1]
+
+def test_ties_break_by_id_desc(index):
+    assert ids(index.search("toluca")) == [5, 3, 1]
+
+# -----------------------------------------------------------------------------
+# Paginación
+# -----------------------------------------------------------------------------
+def test_cursor_pages_cover_ranking_once(index, monkeypatch):
+    monkeypatch.setattr(search, "capabilities", lambda db: {"pg": False, "trgm": False})
+    monkeypatch.setattr(search, "memory_index", lambda db: index)
+    seen, cursor = [], None
+    while True:
+        page, nxt, backend = search.search(None, "reunion", [], limit=2, cursor=cursor)
+        assert backend == "memory" and len(page) <= 2
+        seen += page
+        if not nxt:
+            break
+        cursor = search.decode_cursor(nxt)
+    assert seen == index.search("reunion")
+    assert len(seen) == 4
+
+def test_cursor_round_trip_and_invalid():
+    assert search.decode_cursor(search.encode_cursor(0.75, 42)) == (0.75, 42)
+    with pytest.raises(ValueError):
+        search.decode_cursor("no-es-un-cursor")
+
+def test_empty_query_and_limit_bounds(index, monkeypatch):
+    monkeypatch.setattr(search, "capabilities", lambda db: {"pg": False, "trgm": False})
+    monkeypatch.setattr(search, "memory_index", lambda db: index)
+    assert search.search(None, "  ¿? ", []) == ([], None, "none")
+    page, nxt, _ = search.search(None, "toluca", [], limit=0)
+    assert len(page) == 1 and nxt
+
+# -----------------------------------------------------------------------------
+# Actualización incremental
+# -----------------------------------------------------------------------------
+def test_updated_matches_full_rebuild(index):
+    changed = [(3, "Foro de cabildo", "Juventud", "Lerma", "Casa de cultura", "")]
+    new = index.updated([3, 5], changed)          # 3 cambia, 5 se borró
+    rebuilt = search.InvertedIndex([d for d in DOCS if d[0] not in (3, 5)] + changed)
+    assert new.postings == rebuilt.postings and new.vocab == rebuilt.vocab
+    # el original sigue intacto para las búsquedas en curso
+    assert ids(index.search("informe")) == [5, 2]
+    assert ids(new.search("cabildo")) == [3, 1]
+
+def test_memory_index_follows_change_log(db, monkeypatch):
+    from db import Invitacion
+    monkeypatch.setattr(search, "_mem", {"version": None, "index": None})
+    a = Invitacion(evento="Reunión de cabildo", fecha=date(2030, 1, 1))
+    b = Invitacion(evento="Informe anual", fecha=date(2030, 1, 2))
+    db.add_all([a, b])
+    db.flush()
+    publish_changes(db, "created", [a.id, b.id])
+    db.commit()
+    first = search.memory_index(db)
+    assert ids(first.search("informe")) == [b.id]
+
+    # escrituras sin invitaciones (p. ej. personas) no tocan el índice
+    bump_data_version(db)
+    db.commit()
+    assert search.memory_index(db) is first
+
+    b.evento = "Foro juvenil"
+    publish_changes(db, "updated", [b.id])
+    db.delete(a)
+    publish_changes(db, "deleted", [a.id])
+    db.commit()
+    second = search.memory_index(db)
+    assert second.search("informe") == [] and second.search("cabildo") == []
+    assert ids(second.search("foro")) == [b.id]
+    assert first.search("cabildo")           # el anterior no se modificó
@@ -0,0 +1,115 @@
+# tests/test_serializers.py
+"""
+serializers.RowSerializer contra el payload anterior (inv_to_dict sobre el ORM y el
+serializador por columnas, en bench/bench_serializers.py): mismas llaves y valores,
+con fechas/horas/campos nulos; v2 = v1 sin alias; dumps/stream = json de siempre.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import serializers
+from bench.bench_serializers import (FakeRow, old_dumps, old_inv_to_dict, old_row_serializer,
+                                     sample, to_orm, OLD_FIELDS)
+from db import Invitacion, Persona
+
+# las anteriores no conocían "Version": se comparan los campos en común
+LEGACY = [f for f in serializers.default_fields(1) if f in OLD_FIELDS]
+
+def row(i, **kw):
+    base = dict(id=i, persona_id=None, evento=None, convoca_cargo=None, convoca=None,
+                partido_politico=None, fecha=None, hora=None, municipio=None, lugar=None,
+                estatus=None, asignado_a=None, rol=None, observaciones=None,
+                fecha_asignacion=None, ultima_modificacion=None, modificado_por=None,
+                archivo_url=None, archivo_nombre=None, archivo_mime=None, archivo_tamano=None,
+                archivo_ts=None, version=1, persona_nombre=None)
+    return FakeRow(**{**base, **kw})
+
+EDGE = [
+    row(1),                                                     # todo nulo
+    row(2, fecha=date.today(), hora=time(0)),                   # medianoche, hoy
+    row(3, fecha=date.today() - timedelta(days=1), hora=time(23, 59, 59)),
+    row(4, fecha=date(1999, 12, 31), evento="", estatus="", asignado_a="Texto libre"),
+    row(5, persona_id=9, persona_nombre="Ana Ñandú", asignado_a="Otro", evento="Informe «anual»",
+        fecha=date(2030, 2, 28), hora=time(9, 5), archivo_tamano=0, archivo_ts=datetime(2030, 1, 1, 7, 3),
+        fecha_asignacion=datetime(2029, 12, 31, 23, 59), ultima_modificacion=datetime(2030, 1, 1)),
+    row(6, fecha=date(2030, 2, 28)),                            # fecha repetida: sale del memo
+    row(7, hora=time(9, 5)),
+]
+ROWS = EDGE + sample(300)
+
+def test_same_payload_as_previous_column_serializer():
+    old, new = old_row_serializer(LEGACY), serializers.row_serializer(LEGACY)
+    for r in ROWS:
+        assert new(r) == old(r)
+
+def test_same_payload_as_inv_to_dict():
+    new = serializers.row_serializer(LEGACY)
+    for r in ROWS:
+        assert new(r) == old_inv_to_dict(to_orm(r))
+
+def test_v1_keeps_key_order_and_adds_version():
+    d = serializers.row_serializer(serializers.default_fields(1))(EDGE[4])
+    assert list(d) == LEGACY + ["Version"] and d["Version"] == 1
+
+def test_v2_is_v1_without_aliases():
+    v1 = serializers.row_serializer(serializers.default_fields(1))
+    v2 = serializers.row_serializer(serializers.default_fields(2))
+    for r in ROWS:
+        full = v1(r)
+        assert v2(r) == {k: v for k, v in full.items() if k not in serializers.ALIASES}
+        assert full["FechaISO"] == full["Fecha"] and full["HoraISO"] == full["Hora"]
+
+def test_field_subset():
+    new = serializers.row_serializer(["ID", "DiasParaEvento", "Asignado A"])
+    assert new(EDGE[0]) == {"ID": 1, "DiasParaEvento": None, "Asignado A": ""}
+    assert new(EDGE[1])["DiasParaEvento"] == 0
+    assert new(EDGE[4])["Asignado A"] == "Ana Ñandú"
+
+@pytest.mark.parametrize("raw, error", [("3", "Versión"), ("x", "Versión"), (None, None), ("2", None)])
+def test_parse_version(raw, error):
+    if error:
+        with pytest.raises(ValueError, match=error):
+            serializers.parse_version(raw)
+    else:
+        assert serializers.parse_version(raw) in serializers.VERSIONS
+
+def test_parse_fields():
+    assert serializers.parse_fields(" ID, Evento ,") == ["ID", "Evento"]
+    assert serializers.parse_fields("", 2) == serializers.default_fields(2)
+    with pytest.raises(ValueError, match="Nope"):
+        serializers.parse_fields("ID,Nope")
+
+# -----------------------------------------------------------------------------
+# JSON
+# -----------------------------------------------------------------------------
+def test_dumps_and_stream_match_stdlib_json():
+    items = list(map(serializers.row_serializer(serializers.default_fields(1)), ROWS))
+    for d in items[:len(EDGE)]:
+        assert serializers.dumps(d) == old_dumps(d)
+    streamed = "".join(serializers.stream_json_array(iter(items)))
+    assert json.loads(streamed) == items
+    assert "".join(serializers.stream_json_array(iter([]))) == "[]"
+
+# -----------------------------------------------------------------------------
+# Endpoint: Rows de inv_select contra inv_to_dict sobre el ORM
+# -----------------------------------------------------------------------------
+def test_endpoint_matches_inv_to_dict(db, client):
+    p = Persona(nombre="Ana")
+    db.add(p)
+    db.flush()
+    invs = [
+        Invitacion(evento="Con persona", fecha=date(2030, 3, 1), hora=time(0), persona_id=p.id,
+                   asignado_a="Ana", estatus="Confirmado", fecha_asignacion=datetime(2030, 2, 1, 8)),
+        Invitacion(evento="Sin fecha ni hora"),
+        Invitacion(evento="", fecha=date(2030, 3, 1), asignado_a="Texto libre"),
+    ]
+    db.add_all(invs)
+    db.commit()
+
+    got = {d["ID"]: d for d in client.get("/api/invitations").get_json()}
+    for inv in invs:
+        db.refresh(inv)
+        expected = old_inv_to_dict(inv)
+        assert {k: got[inv.id][k] for k in expected} == expected
@@ -0,0 +1,150 @@
+# tests/test_storage.py
+"""
+Almacén de adjuntos (storage.py): la misma interfaz contra disco local y contra S3
+(moto, en memoria), y release()/put() concurrentes sobre el mismo objeto.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import storage
+from db import Invitacion, SessionLocal
+
+PDF = b"%PDF-1.4 adjunto de prueba\n" * 100
+OLD = time.time() - 2 * storage.UPLOAD_GC_GRACE
+
+@pytest.fixture(params=["local", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        yield storage.LocalDiskStore(str(tmp_path))
+        return
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="adjuntos")
+        yield storage.S3Store("adjuntos", prefix="pruebas", client=s3)
+
+def age(store, key: str, mtime: float) -> None:
+    """Envejece un objeto (para probar la gracia del GC)."""
+    if isinstance(store, storage.LocalDiskStore):
+        os.utime(store.path(key), (mtime, mtime))
+    else:
+        from moto.s3.models import s3_backends
+        from datetime import datetime, timezone
+        backend = s3_backends["123456789012"]["global"]
+        obj = backend.get_object(store.bucket, store._k(key))
+        obj.last_modified = datetime.fromtimestamp(mtime, timezone.utc)
+
+# -----------------------------------------------------------------------------
+# Interfaz común
+# -----------------------------------------------------------------------------
+def test_put_is_content_addressed(store):
+    sha = hashlib.sha256(PDF).hexdigest()
+    stored = store.put(io.BytesIO(PDF), "PDF")
+    assert stored == storage.StoredFile(f"{sha[:2]}/{sha}.pdf", f"/uploads/{sha[:2]}/{sha}.pdf",
+                                        len(PDF), sha)
+    with store.open(stored.key) as f:
+        assert f.read() == PDF
+    assert store.stat(stored.key).size == len(PDF)
+    assert store.stat("00/no-existe.pdf") is None
+
+def test_put_dedup_refreshes_and_calls_lock(store):
+    first = store.put(io.BytesIO(PDF), "pdf")
+    age(store, first.key, OLD)
+    locked = []
+    again = store.put(io.BytesIO(PDF), "pdf", lock=locked.append)
+    assert again.key == first.key and locked == [first.key]
+    assert [o.key for o in store.objects()] == [first.key]
+    assert time.time() - store.stat(first.key).mtime < 60      # gracia renovada
+
+def test_s3_objects_keep_type_and_cache_headers(store):
+    if not isinstance(store, storage.S3Store):
+        pytest.skip("solo S3")
+    stored = store.put(io.BytesIO(PDF), "pdf")
+    store.put(io.BytesIO(PDF), "pdf")                # dedup: copy_object con REPLACE
+    tkey = storage.thumb_key(stored.key, 160)
+    store.put_derived(tkey, b"mini")
+    for key in (stored.key, tkey):
+        head = store.s3.head_object(Bucket=store.bucket, Key=store._k(key))
+        assert head["CacheControl"] == "public, max-age=31536000, immutable"
+    assert store.s3.head_object(Bucket=store.bucket, Key=store._k(stored.key))["ContentType"] == "application/pdf"
+
+def test_serve_is_cacheable(store):
+    from flask import Flask
+    stored = store.put(io.BytesIO(PDF), "pdf")
+    with Flask(__name__).test_request_context(storage.url_for_key(stored.key)):
+        resp = store.serve(stored.key)
+    if isinstance(store, storage.S3Store):
+        # 302 a la URL firmada, cacheable menos tiempo que la firma
+        assert resp.status_code == 302 and store.bucket in resp.location
+        assert 0 < resp.cache_control.max_age < storage.S3_PRESIGN_TTL
+        assert resp.cache_control.private
+    else:
+        assert resp.status_code == 200 and resp.get_etag()[0] == stored.sha256
+        assert resp.cache_control.immutable and resp.cache_control.max_age == storage.IMMUTABLE_MAX_AGE
+        resp.close()
+
+def test_derived_and_delete(store):
+    stored = store.put(io.BytesIO(PDF), "pdf")
+    tkey = storage.thumb_key(stored.key, 160)
+    store.put_derived(tkey, b"mini")
+    assert [o.key for o in store.objects()] == [stored.key]
+    assert [o.key for o in store.objects(derived=True)] == [tkey]
+    store.delete(stored.key)
+    store.delete(stored.key)                                     # idempotente
+    assert store.stat(stored.key) is None
+    assert [o.key for o in store.objects()] == []
+
+# -----------------------------------------------------------------------------
+# Conteo de referencias (BD)
+# -----------------------------------------------------------------------------
+def test_release_and_gc_respect_references_and_grace(store, db):
+    live = store.put(io.BytesIO(PDF), "pdf")
+    orphan = store.put(io.BytesIO(b"otro"), "png")
+    fresh = store.put(io.BytesIO(b"reciente"), "jpg")
+    age(store, live.key, OLD)
+    age(store, orphan.key, OLD)
+    db.add(Invitacion(evento="Con adjunto", fecha=date(2030, 1, 1), archivo_url=live.url))
+    db.commit()
+
+    assert storage.release(store, db, live.url) is False
+    assert storage.release(store, db, fresh.url) is False
+    assert [o.key for o in storage.collect_garbage(store, db, dry_run=True)] == [orphan.key]
+    assert [o.key for o in storage.collect_garbage(store, db)] == [orphan.key]
+    assert store.stat(orphan.key) is None
+    assert store.stat(live.key) and store.stat(fresh.key)
+
+def test_release_waits_for_upload_that_reuses_object(store, db):
+    old = store.put(io.BytesIO(PDF), "pdf")
+    age(store, old.key, OLD)
+
+    # petición A: vuelve a subir el mismo PDF (dedup) y aún no hace commit
+    a = SessionLocal()
+    stored = store.put(io.BytesIO(PDF), "pdf", lock=lambda key: storage.lock_key(a, key))
+    age(store, old.key, OLD)          # peor caso: la renovación de fecha no alcanza
+    a.add(Invitacion(evento="Reuso", fecha=date(2030, 1, 2), archivo_url=stored.url))
+
+    # petición B: suelta la última referencia vieja a ese objeto
+    result = []
+    def release():
+        b = SessionLocal()
+        try:
+            result.append(storage.release(store, b, old.url))
+        finally:
+            b.close()
+    t = threading.Thread(target=release)
+    t.start()
+    t.join(0.5)
+    assert t.is_alive()               # espera el lock de A
+
+    a.commit()
+    a.close()
+    t.join(10)
+    assert result == [False]
+    assert store.stat(old.key) is not None
@@ -0,0 +1,104 @@
+# tests/test_versions.py
+"""Versión de datos (cache.py) y bitácora del feed: el bump va tras el commit, en su propia transacción."""
+from datetime import datetime, timedelta
+
+import psycopg
+from sqlalchemy import event, select, text
+
+import feed
+from cache import DATA, current_data_version
+from db import CONNECT_ARGS, DIRECT_DB_URL, CambioInvitacion, Invitacion, SessionLocal
+
+def versions(db) -> list:
+    db.rollback()     # snapshot nuevo
+    return list(db.execute(select(CambioInvitacion.version).order_by(CambioInvitacion.id)).scalars())
+
+def test_bump_after_commit_stamps_changes(db):
+    inv = Invitacion(evento="Evento", estatus="Pendiente")
+    db.add(inv)
+    db.flush()
+    feed.publish_changes(db, "created", [inv.id])
+    db.commit()
+    assert current_data_version(db) == 1
+    assert versions(db) == [1]
+
+    inv.estatus = "Cancelado"
+    feed.publish_changes(db, "updated", [inv.id])
+    db.commit()
+    assert current_data_version(db) == 2
+    assert versions(db) == [1, 2]
+
+def test_rollback_does_not_bump(db):
+    inv = Invitacion(evento="Evento")
+    db.add(inv)
+    db.flush()
+    feed.publish_changes(db, "created", [inv.id])
+    db.rollback()
+    db.commit()                       # sesión reutilizada: no queda nada pendiente
+    assert current_data_version(db) == 0
+    assert versions(db) == []
+
+def test_write_transaction_does_not_lock_version_row(db, pg):
+    feed.publish_changes(db, "updated", [])
+    db.commit()                       # la fila "datos" ya existe
+
+    inv = Invitacion(evento="Evento")
+    db.add(inv)
+    db.flush()
+    feed.publish_changes(db, "created", [inv.id])
+    # con la escritura abierta, otra conexión puede tomar la fila sin esperar
+    with pg.connect() as other:
+        other.execute(text("SET lock_timeout = '200ms'"))
+        other.execute(text("SELECT version FROM version_datos WHERE clave = :c FOR UPDATE"), {"c": DATA})
+        other.rollback()
+    db.commit()
+    assert versions(db) == [2]
+
+def test_bump_reuses_the_request_connection(db, pg):
+    db.close()
+    peak = []
+    def checkout(*_):
+        peak.append(pg.pool.checkedout())
+    event.listen(pg.pool, "checkout", checkout)
+    try:
+        s = SessionLocal()
+        inv = Invitacion(evento="Evento")
+        s.add(inv)
+        s.flush()
+        feed.publish_changes(s, "created", [inv.id])
+        s.commit()
+        s.close()
+    finally:
+        event.remove(pg.pool, "checkout", checkout)
+    assert len(peak) == 2 and max(peak) == 1      # escritura y luego bump, nunca a la vez
+    assert versions(db) == [1]
+
+def test_savepoint_commit_waits_for_root(db):
+    db.execute(text("SELECT 1"))
+    with db.begin_nested():           # el SAVEPOINT también dispara after_commit
+        feed.publish_changes(db, "updated", [])
+    db.rollback()
+    assert current_data_version(db) == 0
+
+def test_notify_after_stamp(db):
+    conninfo = DIRECT_DB_URL.replace("postgresql+psycopg://", "postgresql://", 1)
+    with psycopg.connect(conninfo, autocommit=True, **CONNECT_ARGS) as listener:
+        listener.execute(f"LISTEN {feed.CHANNEL}")
+        inv = Invitacion(evento="Evento")
+        db.add(inv)
+        db.flush()
+        feed.publish_changes(db, "created", [inv.id])
+        assert not list(listener.notifies(timeout=0.2))    # nada antes del commit
+        db.commit()
+        got = [n.payload for n in listener.notifies(timeout=2, stop_after=1)]
+    assert got == [str(current_data_version(db))]
+
+def test_orphan_changes_are_swept(db):
+    # commit cuyo bump nunca corrió (p.ej. el proceso murió): filas sin sellar
+    db.add(CambioInvitacion(version=None, invitacion_id=7, op="updated",
+                            ts=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    hub = feed.ChangeHub(lambda db, ids: {})
+    hub._version = 0
+    hub._poll()
+    assert versions(db) == [current_data_version(db)]
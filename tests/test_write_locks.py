@@ -0,0 +1,54 @@
+# tests/test_write_locks.py
+"""
+Alta y cambio de estatus con la misma llave del rollup (fecha, estatus, municipio, partido)
+al mismo tiempo: no deben bloquearse en orden cruzado (rollup <-> version_datos).
+"""
+import threading
+from datetime import date
+
+from sqlalchemy import text
+
+import feed
+from db import Invitacion, SessionLocal
+
+KEY = dict(fecha=date(2030, 5, 1), municipio="Toluca", partido_politico="")
+
+def test_create_and_status_change_same_rollup_key(db, pg):
+    existing = Invitacion(evento="Existente", estatus="Pendiente", **KEY)
+    db.add(existing)
+    db.commit()
+
+    # A: alta (INSERT -> el trigger bloquea la fila Confirmado del rollup), sin commit aún
+    a = SessionLocal()
+    created = Invitacion(evento="Nueva", estatus="Confirmado", **KEY)
+    a.add(created)
+    a.flush()
+
+    # B: publica y luego su UPDATE entra a la misma fila del rollup (espera a A)
+    errors = []
+    def change_status():
+        b = SessionLocal()
+        try:
+            b.execute(text("SET lock_timeout = '5s'"))
+            inv = b.get(Invitacion, existing.id)
+            inv.estatus = "Confirmado"
+            feed.publish_changes(b, "updated", [inv.id])
+            b.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            b.close()
+    t = threading.Thread(target=change_status)
+    t.start()
+    t.join(0.5)                      # B ya está esperando la fila del rollup
+
+    # A publica después: antes tomaba version_datos, que B ya tenía -> deadlock
+    feed.publish_changes(a, "created", [created.id])
+    a.commit()
+    a.close()
+    t.join(10)
+
+    assert not errors, errors
+    total = db.execute(text("SELECT total FROM invitaciones_daily_stats WHERE fecha = :f "
+                            "AND estatus = 'Confirmado'"), {"f": KEY["fecha"]}).scalar()
+    assert total == 2